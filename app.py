@@ -3,47 +3,238 @@ Hades - Servidor Flask para el Frontend
 ========================================
 
 Servidor simple que conecta el frontend con el backend del chatbot.
+
+La aplicación se construye con create_app(). Importar este módulo no crea
+nada: ``app`` se construye la primera vez que se pide (``from app import
+app``, ``gunicorn app:app``). El SDK del proveedor de LLM se importa y su
+cliente se crea en un hilo de calentamiento; /api/ready responde 503 hasta
+que termina, mientras que /api/health solo indica que el proceso responde.
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import (
+    Blueprint, Flask, Response, abort, current_app, g, request, jsonify, stream_with_context
+)
 from flask_cors import CORS
-from hades_chatbot import create_hades_instance, create_openai_integration
+from hades_chatbot import create_hades_instance
+from hades_fastpath import FastPath
+from hades_metrics import (
+    METRICS, REJECTED_TOTAL, REQUEST_SECONDS, SERIALIZATION_SECONDS, chatbot_collector
+)
+from hades_ratelimit import (
+    create_concurrency_limiter, create_rate_limiter, get_client_id, load_api_keys
+)
+from hades_scheduler import BATCH, INTERACTIVE, scheduling
+from hades_sessions import issue_session_id, load_session_secret, verify_session_id
+from hades_snapshot import reloader_stats, start_reloader
+from hades_static import compress_response, create_static_assets
+from hades_tracing import TRACER, span
+from hades_providers import USAGE
+from hades_router import create_llm_callback_from_env
+from config import CHATBOT_CONFIG
+from typing import Optional
+import json
+import logging
+import math
 import os
+import threading
+import uuid
+from time import perf_counter
 
-app = Flask(__name__, static_folder='.', static_url_path='')
-CORS(app)
 
-# Inicializar Hades
-print("🔥 Inicializando Hades...")
+logger = logging.getLogger("hades.app")
 
-# Intentar usar OpenAI si está disponible
-llm_callback = None
-api_key = os.getenv('OPENAI_API_KEY')
+bp = Blueprint('hades', __name__)
+
+
+class Services:
+    """Componentes de Hades de una aplicación (``app.extensions['hades']``)."""
+    
+    def __init__(self, config: dict = CHATBOT_CONFIG):
+        """
+        Args:
+            config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        """
+        self.config = config
+        # Usar los proveedores de LLM configurados (OpenAI, Anthropic, Azure).
+        # Aquí solo se validan las credenciales: el SDK se importa en warmup()
+        try:
+            self.llm_callback = create_llm_callback_from_env(config=config)
+        except Exception as e:
+            self.llm_callback = None
+            logger.warning("No se pudo configurar el proveedor de LLM: %s. "
+                           "El chatbot funcionará solo con validación de queries", e)
+        self.hades = create_hades_instance(llm_callback=self.llm_callback, config=config)
+        self.fast_path = FastPath(self.hades)
+        self.rate_limiter = create_rate_limiter(config)
+        self.api_keys = load_api_keys(config)
+        self.session_secret = load_session_secret(config)
+        self.concurrency = create_concurrency_limiter(config)
+        self.static_assets = create_static_assets(
+            os.path.dirname(os.path.abspath(__file__)), config)
+        self.ready = threading.Event()
+        self.warmup_seconds = None
+        self.warmup_error = None
+        METRICS.add_collector(chatbot_collector(self.hades), "chatbot")
+    
+    def warmup(self):
+        """Importa el SDK del proveedor y construye su cliente."""
+        started = perf_counter()
+        try:
+            warmup = getattr(self.llm_callback, 'warmup', None)
+            if warmup is not None:
+                warmup()
+        except Exception as e:
+            # El error se repetirá (y se informará) en la primera consulta
+            self.warmup_error = str(e)
+            logger.warning("Falló el calentamiento del proveedor de LLM: %s", e)
+        finally:
+            self.warmup_seconds = round(perf_counter() - started, 3)
+            self.ready.set()
+    
+    def start_warmup(self):
+        """Lanza warmup() en un hilo en segundo plano."""
+        threading.Thread(target=self.warmup, name='hades-warmup', daemon=True).start()
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que termine el calentamiento; retorna False si se agota el plazo."""
+        return self.ready.wait(timeout)
+
+
+def services() -> Services:
+    """Componentes de Hades de la aplicación en curso."""
+    return current_app.extensions['hades']
+
+
+def get_session_id(data: dict) -> str:
+    """
+    Obtiene el id de sesión de la petición o genera uno nuevo.
+    
+    Se acepta en el cuerpo JSON ('session_id') o en la cabecera X-Session-Id,
+    pero solo si lo emitió este servidor; si no, se emite uno nuevo.
+    """
+    secret = services().session_secret
+    session_id = data.get('session_id') or request.headers.get('X-Session-Id')
+    if verify_session_id(session_id, secret):
+        return session_id
+    return issue_session_id(secret)
+
+
+def get_request_id() -> str:
+    """Obtiene el id de la petición de la cabecera X-Request-Id o genera uno nuevo."""
+    request_id = request.headers.get('X-Request-Id')
+    if request_id and len(request_id) <= 128:
+        return request_id
+    return uuid.uuid4().hex
+
+
+def too_many_requests(message: str, retry_after: float, reason: str):
+    """Respuesta 429 con la cabecera Retry-After."""
+    REJECTED_TOTAL.inc(reason)
+    response = jsonify({'success': False, 'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
 
-if api_key:
-    try:
-        llm_callback = create_openai_integration(api_key)
-        print("✅ Integración con OpenAI configurada")
-    except Exception as e:
-        print(f"⚠️  No se pudo configurar OpenAI: {e}")
-        print("   El chatbot funcionará solo con validación de queries")
 
-hades = create_hades_instance(llm_callback=llm_callback)
-print("✅ Hades está listo!\n")
+def current_client_id() -> str:
+    """API key admitida o IP del cliente de la petición en curso."""
+    state = services()
+    return get_client_id(request.headers, request.remote_addr,
+                         state.config.get('rate_limit', {}).get('trust_proxy', False),
+                         state.api_keys)
+
+
+def check_rate_limit(cost: int = 1):
+    """
+    Aplica el límite de peticiones del cliente.
+    
+    Returns:
+        Response: 429 si el cliente superó su límite, o None
+    """
+    rate_limiter = services().rate_limiter
+    if rate_limiter is None:
+        return None
+    allowed, retry_after = rate_limiter.check(current_client_id(), cost)
+    if allowed:
+        return None
+    return too_many_requests(
+        'Has superado el límite de peticiones. Inténtalo de nuevo más tarde.',
+        retry_after, 'rate_limit'
+    )
+
+
+def acquire_slot():
+    """
+    Reserva un hueco en el límite global de peticiones hacia el LLM.
+    
+    Returns:
+        Response: 429 si el servidor está saturado, o None (hay que llamar
+                  a release_slot al terminar)
+    """
+    concurrency = services().concurrency
+    if concurrency is None or concurrency.acquire():
+        return None
+    return too_many_requests(
+        'El servidor está saturado. Inténtalo de nuevo en unos segundos.',
+        concurrency.retry_after, 'overloaded'
+    )
 
 
-@app.route('/')
-def index():
-    """Ruta principal que sirve el HTML."""
-    return app.send_static_file('index.html')
+def release_slot(concurrency=None):
+    concurrency = concurrency or services().concurrency
+    if concurrency is not None:
+        concurrency.release()
 
 
-@app.route('/api/chat', methods=['POST'])
+@bp.before_app_request
+def assign_request_id():
+    g.request_id = get_request_id()
+
+
+@bp.after_app_request
+def return_request_id(response):
+    response.headers['X-Request-Id'] = g.get('request_id', '')
+    return response
+
+
+def start_timer():
+    g.started = perf_counter()
+
+
+def record_latency(response):
+    started = g.get('started')
+    if started is not None:
+        # Las mismas etiquetas que asgi.py: el nombre de la vista, sin el blueprint
+        endpoint = (request.endpoint or 'not_found').rpartition('.')[2]
+        REQUEST_SECONDS.observe(perf_counter() - started, endpoint)
+    return response
+
+
+def compress_json(response):
+    """Comprime las respuestas JSON grandes si el cliente lo acepta."""
+    if (response.mimetype != 'application/json' or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    min_size = services().config['static'].get('compress_min_size', 1024)
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    body, encoding = compress_response(body, request.headers.get('Accept-Encoding', ''),
+                                       min_size)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@bp.route('/api/chat', methods=['POST'])
 def chat():
     """Endpoint para recibir mensajes del chat."""
     try:
         data = request.get_json()
         message = data.get('message', '').strip()
+        session_id = get_session_id(data)
         
         if not message:
             return jsonify({
@@ -51,14 +242,41 @@ def chat():
                 'error': 'Por favor, envía un mensaje válido.'
             }), 400
         
-        # Procesar mensaje con Hades
-        response = hades.handle_query(message)
-        
-        return jsonify({
-            'success': True,
-            'response': response
-        })
+        rejected = check_rate_limit()
+        if rejected is not None:
+            return rejected
         
+        state = services()
+        with TRACER.trace('POST /api/chat', g.request_id, session_id=session_id):
+            # Saludos y consultas fuera de tema: respuesta preserializada
+            body = state.fast_path.lookup(message, session_id)
+            if body is not None:
+                return Response(body, mimetype='application/json')
+            
+            # Procesar mensaje con Hades
+            rejected = acquire_slot()
+            if rejected is not None:
+                return rejected
+            # Tamaño original y reducido de la consulta ('input')
+            metadata = {}
+            try:
+                with scheduling(INTERACTIVE, tenant=current_client_id()):
+                    response = state.hades.handle_query(message, session_id=session_id,
+                                                        metadata=metadata, intent=None)
+            finally:
+                release_slot()
+            
+            with span('serialize'):
+                started = perf_counter()
+                result = jsonify({
+                    'success': True,
+                    'response': response,
+                    'session_id': session_id,
+                    **metadata
+                })
+                SERIALIZATION_SECONDS.observe(perf_counter() - started)
+            return result
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -66,23 +284,274 @@ def chat():
         }), 500
 
 
-@app.route('/api/health', methods=['GET'])
+@bp.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Endpoint para procesar varias consultas independientes en una petición.
+    
+    Recibe {"messages": [...]} y retorna {"responses": [...]} en el mismo
+    orden. Las consultas del lote no usan el historial de ninguna sesión.
+    """
+    data = request.get_json(silent=True) or {}
+    messages = data.get('messages')
+    max_size = services().config.get('batch', {}).get('max_size', 100)
+    
+    if not isinstance(messages, list) or not messages:
+        return jsonify({
+            'success': False,
+            'error': 'Por favor, envía una lista de mensajes en "messages".'
+        }), 400
+    if len(messages) > max_size:
+        return jsonify({
+            'success': False,
+            'error': f'El lote admite como máximo {max_size} mensajes.'
+        }), 413
+    
+    rejected = check_rate_limit(cost=len(messages)) or acquire_slot()
+    if rejected is not None:
+        return rejected
+    
+    try:
+        with TRACER.trace('POST /api/chat/batch', g.request_id, size=len(messages)), \
+                scheduling(BATCH, tenant=current_client_id()):
+            responses = services().hades.handle_batch(
+                [str(message).strip() for message in messages])
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error al procesar el lote: {str(e)}'
+        }), 500
+    finally:
+        release_slot()
+    
+    return jsonify({
+        'success': True,
+        'responses': responses
+    })
+
+
+def sse_event(payload: dict, event: str = None) -> str:
+    """Serializa un evento Server-Sent Events."""
+    data = json.dumps(payload, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {data}\n\n"
+    return f"data: {data}\n\n"
+
+
+@bp.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Endpoint de chat con respuesta por fragmentos (Server-Sent Events).
+    
+    Emite un evento por fragmento ({"token": ...}) y un evento final
+    'done' con el id de sesión.
+    """
+    data = request.get_json(silent=True) or {}
+    message = data.get('message', '').strip()
+    session_id = get_session_id(data)
+    
+    if not message:
+        return jsonify({
+            'success': False,
+            'error': 'Por favor, envía un mensaje válido.'
+        }), 400
+    
+    rejected = check_rate_limit() or acquire_slot()
+    if rejected is not None:
+        return rejected
+    request_id = g.request_id
+    client_id = current_client_id()
+    hades = services().hades
+    
+    def generate():
+        metadata = {}
+        try:
+            with TRACER.trace('POST /api/chat/stream', request_id, session_id=session_id), \
+                    scheduling(INTERACTIVE, tenant=client_id):
+                for token in hades.handle_query_stream(message, session_id=session_id,
+                                                       metadata=metadata):
+                    yield sse_event({'token': token})
+            yield sse_event({'success': True, 'session_id': session_id, **metadata},
+                            event='done')
+        except Exception as e:
+            yield sse_event({
+                'success': False,
+                'error': f'Error al procesar el mensaje: {str(e)}'
+            }, event='error')
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    # El hueco se libera cuando termina de enviarse la respuesta
+    concurrency = services().concurrency
+    response.call_on_close(lambda: release_slot(concurrency))
+    return response
+
+
+@bp.route('/api/history/<session_id>', methods=['GET'])
+def history(session_id):
+    """
+    Historial persistente de una sesión, paginado.
+    
+    Parámetros: offset (primer intercambio, 0 es el más antiguo) y limit.
+    """
+    log = services().hades.conversation_log
+    if log is None:
+        return jsonify({'success': False,
+                        'error': 'El registro de conversaciones está desactivado'}), 404
+    if not verify_session_id(session_id, services().session_secret):
+        return jsonify({'success': False, 'error': 'Sesión no encontrada'}), 404
+    max_page = services().config.get('conversation_log', {}).get('max_page_size', 200)
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(max_page, max(1, int(request.args.get('limit', 50))))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset y limit deben ser enteros'}), 400
+    
+    rejected = check_rate_limit()
+    if rejected is not None:
+        return rejected
+    
+    total, messages = log.read(session_id, offset, limit)
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'messages': messages
+    })
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas en formato de texto de Prometheus."""
+    if not METRICS.enabled:
+        return jsonify({'success': False, 'error': 'Las métricas están desactivadas'}), 404
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/api/health', methods=['GET'])
 def health():
-    """Endpoint de salud del servidor."""
+    """Endpoint de salud del servidor (el proceso responde)."""
+    state = services()
+    hades = state.hades
+    llm_callback = state.llm_callback
     return jsonify({
         'status': 'ok',
         'name': 'Hades',
-        'llm_configured': llm_callback is not None
+        'ready': state.ready.is_set(),
+        'llm_configured': llm_callback is not None,
+        'llm': llm_callback.stats() if llm_callback is not None else None,
+        'usage': USAGE.stats(),
+        'sessions': hades.sessions.stats(),
+        'fast_path_hits': state.fast_path.hits,
+        'rate_limit': state.rate_limiter.stats() if state.rate_limiter is not None else None,
+        'concurrency': state.concurrency.stats() if state.concurrency is not None else None,
+        'cache': hades.cache.stats() if hades.cache is not None else None,
+        'semantic_cache': (hades.semantic_cache.stats()
+                           if hades.semantic_cache is not None else None),
+        'coalescing': hades.flights.stats() if hades.flights is not None else None,
+        'static': state.static_assets.stats(),
+        'config': reloader_stats(),
+        'conversation_log': (hades.conversation_log.stats()
+                             if hades.conversation_log is not None else None)
     })
 
 
+@bp.route('/api/ready', methods=['GET'])
+def ready():
+    """
+    Endpoint de disponibilidad: 503 hasta que termina el calentamiento.
+    
+    Pensado para el readiness probe del orquestador; /api/health es el de
+    liveness.
+    """
+    state = services()
+    if not state.ready.is_set():
+        return jsonify({'ready': False}), 503
+    return jsonify({
+        'ready': True,
+        'warmup_seconds': state.warmup_seconds,
+        'warmup_error': state.warmup_error
+    })
+
+
+@bp.route('/', defaults={'filename': ''})
+@bp.route('/<path:filename>', methods=['GET'])
+def static_file(filename):
+    """Sirve los archivos del frontend (precomprimidos, con ETag y caché)."""
+    result = services().static_assets.respond(filename,
+                                              request.headers.get('Accept-Encoding', ''),
+                                              request.headers.get('If-None-Match', ''))
+    if result is None:
+        abort(404)
+    status, headers, body = result
+    return Response(body, status=status, headers=headers)
+
+
+def create_app(config: dict = CHATBOT_CONFIG, warmup: bool = True) -> Flask:
+    """
+    Crea la aplicación Flask de Hades.
+    
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        warmup: Si es True se lanza el calentamiento en segundo plano; si es
+               False hay que llamar a ``app.extensions['hades'].warmup()``
+               para que /api/ready responda 200
+    
+    Returns:
+        Flask: Aplicación lista para servir
+    """
+    app = Flask(__name__, static_folder=None)
+    CORS(app)
+    app.extensions['hades'] = state = Services(config)
+    if METRICS.enabled:
+        app.before_request(start_timer)
+        app.after_request(record_latency)
+    if config.get('static', {}).get('compress_responses', True):
+        app.after_request(compress_json)
+    app.register_blueprint(bp)
+    start_reloader(config)
+    if warmup:
+        state.start_warmup()
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # ``app`` se crea en el primer acceso, no al importar el módulo
+    global _app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+    return _app
+
+
 if __name__ == '__main__':
+    # Servidor de desarrollo; en producción usa: python serve.py
+    server = CHATBOT_CONFIG.get('server', {})
+    debug = os.getenv('HADES_DEBUG', str(server.get('debug', False))).lower() in ('1', 'true', 'yes')
+    port = server.get('port', 5000)
+    
+    print("🔥 Inicializando Hades...")
+    app = create_app()
+    print("✅ Hades está listo!\n")
     print("=" * 60)
     print("🚀 Servidor Hades iniciado")
     print("=" * 60)
-    print(f"📍 Abre tu navegador en: http://localhost:5000")
+    print(f"📍 Abre tu navegador en: http://localhost:{port}")
     print("=" * 60)
     print()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
-
+    app.run(debug=debug, host=server.get('host', '0.0.0.0'), port=port, threaded=True)
@@ -0,0 +1,549 @@
+"""
+Hades - Punto de entrada ASGI
+=============================
+
+Aplicación ASGI sin dependencias adicionales que expone la misma API que
+app.py sobre un único bucle de eventos. Sírvela con cualquier servidor ASGI:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+El SDK del proveedor de LLM no se importa al cargar el módulo: se importa
+en segundo plano al arrancar (evento lifespan) y /api/ready responde 503
+hasta que termina.
+"""
+
+from hades_async import create_async_hades_instance
+from hades_fastpath import FastPath
+from hades_metrics import (
+    METRICS, REJECTED_TOTAL, REQUEST_SECONDS, SERIALIZATION_SECONDS, chatbot_collector
+)
+from hades_ratelimit import (
+    create_concurrency_limiter, create_rate_limiter, get_client_id, load_api_keys
+)
+from hades_scheduler import BATCH, INTERACTIVE, scheduling
+from hades_sessions import issue_session_id, load_session_secret, verify_session_id
+from hades_snapshot import reloader_stats, start_reloader
+from hades_static import compress_response, create_static_assets
+from hades_tracing import TRACER, span
+from hades_providers import USAGE
+from hades_router import create_llm_callback_from_env
+from config import CHATBOT_CONFIG
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import urllib.parse
+import uuid
+from time import perf_counter
+
+
+logger = logging.getLogger("hades.asgi")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPRESSION = CHATBOT_CONFIG.get('static', {})
+
+# Inicializar Hades (el SDK del proveedor se importa en warmup())
+try:
+    llm_callback = create_llm_callback_from_env(asynchronous=True)
+except Exception as e:
+    llm_callback = None
+    logger.warning("No se pudo configurar el proveedor de LLM: %s. "
+                   "El chatbot funcionará solo con validación de queries", e)
+
+hades = create_async_hades_instance(llm_callback=llm_callback)
+fast_path = FastPath(hades)
+METRICS.add_collector(chatbot_collector(hades), "chatbot")
+rate_limiter = create_rate_limiter()
+api_keys = load_api_keys()
+session_secret = load_session_secret()
+concurrency = create_concurrency_limiter(asynchronous=True)
+static_assets = create_static_assets(BASE_DIR)
+start_reloader()
+
+# Estado del calentamiento (ver warmup() y /api/ready)
+READY = threading.Event()
+WARMUP = {'started': False, 'seconds': None, 'error': None}
+
+
+def warmup():
+    """Importa el SDK del proveedor fuera del camino de las peticiones."""
+    started = perf_counter()
+    try:
+        callback_warmup = getattr(llm_callback, 'warmup', None)
+        if callback_warmup is not None:
+            callback_warmup()
+    except Exception as e:
+        # El error se repetirá (y se informará) en la primera consulta
+        WARMUP['error'] = str(e)
+        logger.warning("Falló el calentamiento del proveedor de LLM: %s", e)
+    finally:
+        WARMUP['seconds'] = round(perf_counter() - started, 3)
+        READY.set()
+
+
+def start_warmup():
+    """Lanza warmup() en un hilo del ejecutor por defecto (una sola vez)."""
+    if not WARMUP['started']:
+        WARMUP['started'] = True
+        asyncio.get_running_loop().run_in_executor(None, warmup)
+
+
+async def read_json(receive) -> dict:
+    """Lee el cuerpo completo de la petición y lo decodifica como JSON."""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def send_json(send, payload: dict, status: int = 200, headers: list = ()):
+    """Envía una respuesta JSON completa."""
+    with span('serialize'):
+        started = perf_counter()
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        SERIALIZATION_SECONDS.observe(perf_counter() - started)
+    await send_json_bytes(send, body, status, headers)
+
+
+async def send_json_bytes(send, body: bytes, status: int = 200, headers: list = ()):
+    """Envía un cuerpo JSON ya serializado."""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json; charset=utf-8'),
+            (b'content-length', str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def sse_event(payload: dict, event: str = None) -> bytes:
+    """Serializa un evento Server-Sent Events."""
+    data = json.dumps(payload, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {data}\n\n".encode('utf-8')
+    return f"data: {data}\n\n".encode('utf-8')
+
+
+def get_session_id(data: dict, headers: dict) -> str:
+    """Obtiene el id de sesión de la petición si lo emitió este servidor, o emite uno."""
+    session_id = data.get('session_id') or headers.get('x-session-id')
+    if verify_session_id(session_id, session_secret):
+        return session_id
+    return issue_session_id(session_secret)
+
+
+def get_request_id(headers: dict) -> str:
+    """Obtiene el id de la petición de la cabecera X-Request-Id o genera uno nuevo."""
+    request_id = headers.get('x-request-id')
+    if request_id and len(request_id) <= 128:
+        return request_id
+    return uuid.uuid4().hex
+
+
+def with_request_id(send, request_id: str):
+    """Envuelve send para añadir la cabecera X-Request-Id a la respuesta."""
+    header = (b'x-request-id', request_id.encode('latin-1'))
+
+    async def send_with_id(message):
+        if message['type'] == 'http.response.start':
+            message = {**message, 'headers': [*message.get('headers', []), header]}
+        await send(message)
+    return send_with_id
+
+
+def with_compression(send, accept_encoding: str, min_size: int = 1024):
+    """
+    Envuelve send para comprimir las respuestas JSON grandes.
+
+    Solo se comprimen las respuestas enviadas en un único mensaje; el
+    streaming SSE pasa sin cambios.
+    """
+    pending = None
+
+    async def send_compressed(message):
+        nonlocal pending
+        if message['type'] == 'http.response.start':
+            content_type = dict(message.get('headers', [])).get(b'content-type', b'')
+            if content_type.startswith(b'application/json'):
+                pending = message
+                return
+        elif pending is not None:
+            start, pending = pending, None
+            body = message.get('body', b'')
+            if not message.get('more_body', False) and len(body) >= min_size:
+                body, encoding = compress_response(body, accept_encoding, min_size)
+                headers = [(name, value) for name, value in start['headers']
+                           if name != b'content-length']
+                headers.append((b'vary', b'Accept-Encoding'))
+                if encoding:
+                    headers.append((b'content-encoding', encoding.encode()))
+                headers.append((b'content-length', str(len(body)).encode()))
+                start = {**start, 'headers': headers}
+                message = {**message, 'body': body}
+            await send(start)
+        await send(message)
+    return send_compressed
+
+
+async def too_many_requests(send, message: str, retry_after: float, reason: str):
+    """Envía una respuesta 429 con la cabecera Retry-After."""
+    REJECTED_TOTAL.inc(reason)
+    await send_json(send, {'success': False, 'error': message}, 429,
+                    [(b'retry-after', str(max(1, math.ceil(retry_after))).encode())])
+
+
+def current_client_id(scope) -> str:
+    """API key admitida o IP del cliente de la petición."""
+    client = scope.get('client') or (None,)
+    return get_client_id(scope['headers_dict'], client[0],
+                         CHATBOT_CONFIG.get('rate_limit', {}).get('trust_proxy', False),
+                         api_keys)
+
+
+async def check_rate_limit(scope, send, cost: int = 1) -> bool:
+    """
+    Aplica el límite de peticiones del cliente.
+
+    Returns:
+        bool: True si la petición puede seguir; si no, ya se respondió 429
+    """
+    if rate_limiter is None:
+        return True
+    allowed, retry_after = await rate_limiter.acheck(current_client_id(scope), cost)
+    if not allowed:
+        await too_many_requests(
+            send, 'Has superado el límite de peticiones. Inténtalo de nuevo más tarde.',
+            retry_after, 'rate_limit'
+        )
+    return allowed
+
+
+async def acquire_slot(send) -> bool:
+    """
+    Reserva un hueco en el límite global de peticiones hacia el LLM.
+
+    Returns:
+        bool: True si hay hueco (hay que llamar a release_slot al terminar);
+              si no, ya se respondió 429
+    """
+    if concurrency is None or await concurrency.acquire():
+        return True
+    await too_many_requests(
+        send, 'El servidor está saturado. Inténtalo de nuevo en unos segundos.',
+        concurrency.retry_after, 'overloaded'
+    )
+    return False
+
+
+def release_slot():
+    if concurrency is not None:
+        concurrency.release()
+
+
+async def chat(scope, receive, send):
+    """Endpoint para recibir mensajes del chat."""
+    data = await read_json(receive)
+    message = str(data.get('message', '')).strip()
+    session_id = get_session_id(data, scope['headers_dict'])
+
+    if not message:
+        await send_json(send, {
+            'success': False,
+            'error': 'Por favor, envía un mensaje válido.'
+        }, 400)
+        return
+
+    if not await check_rate_limit(scope, send):
+        return
+
+    body = fast_path.lookup(message, session_id)
+    if body is not None:
+        await send_json_bytes(send, body)
+        return
+
+    if not await acquire_slot(send):
+        return
+    # Tamaño original y reducido de la consulta ('input')
+    metadata = {}
+    try:
+        with scheduling(INTERACTIVE, tenant=current_client_id(scope)):
+            response = await hades.ahandle_query(message, session_id=session_id,
+                                                 metadata=metadata, intent=None)
+    except Exception as e:
+        await send_json(send, {
+            'success': False,
+            'error': f'Error al procesar el mensaje: {str(e)}'
+        }, 500)
+        return
+    finally:
+        release_slot()
+
+    await send_json(send, {
+        'success': True,
+        'response': response,
+        'session_id': session_id,
+        **metadata
+    })
+
+
+async def chat_batch(scope, receive, send):
+    """Endpoint para procesar varias consultas independientes en una petición."""
+    data = await read_json(receive)
+    messages = data.get('messages')
+    max_size = CHATBOT_CONFIG.get('batch', {}).get('max_size', 100)
+
+    if not isinstance(messages, list) or not messages:
+        await send_json(send, {
+            'success': False,
+            'error': 'Por favor, envía una lista de mensajes en "messages".'
+        }, 400)
+        return
+    if len(messages) > max_size:
+        await send_json(send, {
+            'success': False,
+            'error': f'El lote admite como máximo {max_size} mensajes.'
+        }, 413)
+        return
+
+    if not await check_rate_limit(scope, send, cost=len(messages)):
+        return
+    if not await acquire_slot(send):
+        return
+    try:
+        with scheduling(BATCH, tenant=current_client_id(scope)):
+            responses = await hades.ahandle_batch([str(message).strip() for message in messages])
+    except Exception as e:
+        await send_json(send, {
+            'success': False,
+            'error': f'Error al procesar el lote: {str(e)}'
+        }, 500)
+        return
+    finally:
+        release_slot()
+
+    await send_json(send, {
+        'success': True,
+        'responses': responses
+    })
+
+
+async def chat_stream(scope, receive, send):
+    """Endpoint de chat con respuesta por fragmentos (Server-Sent Events)."""
+    data = await read_json(receive)
+    message = str(data.get('message', '')).strip()
+    session_id = get_session_id(data, scope['headers_dict'])
+
+    if not message:
+        await send_json(send, {
+            'success': False,
+            'error': 'Por favor, envía un mensaje válido.'
+        }, 400)
+        return
+
+    if not await check_rate_limit(scope, send):
+        return
+    if not await acquire_slot(send):
+        return
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        metadata = {}
+        try:
+            with scheduling(INTERACTIVE, tenant=current_client_id(scope)):
+                async for token in hades.ahandle_query_stream(message, session_id=session_id,
+                                                              metadata=metadata):
+                    await send({'type': 'http.response.body',
+                                'body': sse_event({'token': token}), 'more_body': True})
+            final = sse_event({'success': True, 'session_id': session_id, **metadata},
+                              event='done')
+        except Exception as e:
+            final = sse_event({
+                'success': False,
+                'error': f'Error al procesar el mensaje: {str(e)}'
+            }, event='error')
+        await send({'type': 'http.response.body', 'body': final})
+    finally:
+        release_slot()
+
+
+async def health(scope, receive, send):
+    """Endpoint de salud del servidor (el proceso responde)."""
+    await send_json(send, {
+        'status': 'ok',
+        'name': 'Hades',
+        'ready': READY.is_set(),
+        'llm_configured': llm_callback is not None,
+        'llm': llm_callback.stats() if llm_callback is not None else None,
+        'usage': USAGE.stats(),
+        'sessions': hades.sessions.stats(),
+        'fast_path_hits': fast_path.hits,
+        'rate_limit': rate_limiter.stats() if rate_limiter is not None else None,
+        'concurrency': concurrency.stats() if concurrency is not None else None,
+        'cache': hades.cache.stats() if hades.cache is not None else None,
+        'semantic_cache': (hades.semantic_cache.stats()
+                           if hades.semantic_cache is not None else None),
+        'coalescing': hades.flights.stats() if hades.flights is not None else None,
+        'static': static_assets.stats(),
+        'config': reloader_stats(),
+        'conversation_log': (hades.conversation_log.stats()
+                             if hades.conversation_log is not None else None)
+    })
+
+
+async def ready(scope, receive, send):
+    """Endpoint de disponibilidad: 503 hasta que termina el calentamiento."""
+    if not READY.is_set():
+        await send_json(send, {'ready': False}, 503)
+        return
+    await send_json(send, {
+        'ready': True,
+        'warmup_seconds': WARMUP['seconds'],
+        'warmup_error': WARMUP['error']
+    })
+
+
+async def metrics(scope, receive, send):
+    """Métricas en formato de texto de Prometheus."""
+    if not METRICS.enabled:
+        await send_json(send, {'success': False, 'error': 'Las métricas están desactivadas'}, 404)
+        return
+    body = METRICS.render().encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/plain; version=0.0.4; charset=utf-8'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def static_file(scope, receive, send):
+    """Sirve los archivos del frontend (precomprimidos, con ETag y caché)."""
+    headers = scope['headers_dict']
+    result = static_assets.respond(scope['path'], headers.get('accept-encoding', ''),
+                                   headers.get('if-none-match', ''))
+    if result is None:
+        await send_json(send, {'success': False, 'error': 'No encontrado'}, 404)
+        return
+
+    status, response_headers, body = result
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode(), value.encode('latin-1'))
+                    for name, value in response_headers],
+    })
+    await send({'type': 'http.response.body',
+                'body': b'' if scope['method'] == 'HEAD' else body})
+
+
+async def history(scope, receive, send):
+    """Historial persistente de una sesión, paginado (offset y limit)."""
+    session_id = urllib.parse.unquote(scope['path'][len('/api/history/'):])
+    log = hades.conversation_log
+    if log is None:
+        await send_json(send, {'success': False,
+                               'error': 'El registro de conversaciones está desactivado'}, 404)
+        return
+    if not verify_session_id(session_id, session_secret):
+        await send_json(send, {'success': False, 'error': 'Sesión no encontrada'}, 404)
+        return
+    params = urllib.parse.parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    max_page = CHATBOT_CONFIG.get('conversation_log', {}).get('max_page_size', 200)
+    try:
+        offset = max(0, int(params.get('offset', ['0'])[0]))
+        limit = min(max_page, max(1, int(params.get('limit', ['50'])[0])))
+    except ValueError:
+        await send_json(send, {'success': False, 'error': 'offset y limit deben ser enteros'}, 400)
+        return
+
+    if not await check_rate_limit(scope, send):
+        return
+
+    total, messages = log.read(session_id, offset, limit)
+    await send_json(send, {
+        'success': True,
+        'session_id': session_id,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'messages': messages
+    })
+
+
+ROUTES = {
+    ('POST', '/api/chat'): chat,
+    ('POST', '/api/chat/batch'): chat_batch,
+    ('POST', '/api/chat/stream'): chat_stream,
+    ('GET', '/api/health'): health,
+    ('GET', '/api/ready'): ready,
+    ('GET', '/metrics'): metrics,
+}
+
+
+async def app(scope, receive, send):
+    """Aplicación ASGI de Hades."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # El servidor acepta conexiones mientras tanto; /api/ready
+                # indica cuándo ha terminado
+                start_warmup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+    # Servidores sin eventos lifespan
+    start_warmup()
+
+    scope['headers_dict'] = {
+        key.decode('latin-1').lower(): value.decode('latin-1')
+        for key, value in scope.get('headers', [])
+    }
+    request_id = get_request_id(scope['headers_dict'])
+    send = with_request_id(send, request_id)
+    handler = ROUTES.get((scope['method'], scope['path']))
+    if handler is None and scope['method'] == 'GET' and scope['path'].startswith('/api/history/'):
+        handler = history
+    if handler is None and scope['method'] in ('GET', 'HEAD'):
+        handler = static_file
+    elif scope['path'].startswith('/api/') and COMPRESSION.get('compress_responses', True):
+        send = with_compression(send, scope['headers_dict'].get('accept-encoding', ''),
+                                COMPRESSION.get('compress_min_size', 1024))
+    if handler is None:
+        await send_json(send, {'success': False, 'error': 'No encontrado'}, 404)
+        return
+    with TRACER.trace(f"{scope['method']} {scope['path']}", request_id):
+        if not METRICS.enabled:
+            await handler(scope, receive, send)
+            return
+        started = perf_counter()
+        try:
+            await handler(scope, receive, send)
+        finally:
+            REQUEST_SECONDS.observe(perf_counter() - started, handler.__name__)
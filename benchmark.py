@@ -0,0 +1,593 @@
+"""
+Hades - Benchmarks y pruebas de carga
+=====================================
+
+Mide el rendimiento de Hades y guarda los resultados en JSON para comparar
+entre commits:
+
+    python benchmark.py micro                 # validación de consultas
+    python benchmark.py load --concurrency 32 # /api/chat contra un LLM falso
+    python benchmark.py load --stream         # /api/chat/stream (tiempo al primer fragmento)
+    python benchmark.py memory                # crecimiento de memoria por sesión
+    python benchmark.py startup --import-budget-ms 400  # arranque en frío
+    python benchmark.py all --output resultados.json --compare anteriores.json
+
+La prueba de carga levanta un servidor falso compatible con la API de
+OpenAI (con latencia y streaming configurables) y sirve app.py con el
+servidor WSGI multihilo de Werkzeug, ambos en el propio proceso.
+
+La prueba de arranque mide en procesos nuevos cuánto tarda ``import app``
+(con ``-X importtime``), create_app() y el calentamiento. Termina con código
+1 si la importación supera ``--import-budget-ms`` o empeora más de
+``--max-regression`` por ciento respecto a los resultados de ``--compare``.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import argparse
+import gc
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+
+
+# ---------------------------------------------------------------------------
+# Corpus de consultas
+# ---------------------------------------------------------------------------
+
+SHORT_QUERIES = [
+    "¿Cómo optimizo una consulta SQL?",
+    "¿Qué es un closure en JavaScript?",
+    "Diferencia entre una clase abstracta y una interfaz en Java",
+    "¿Cómo hago deploy de una app Flask con Docker?",
+    "Hola",
+    "¿Cuál es tu opinión sobre el cambio climático?",
+    "¿Qué receta de cocina me recomiendas?",
+    "Mi test de React falla de forma intermitente",
+]
+
+_TRACEBACK_FRAME = '  File "/srv/app/{module}.py", line {line}, in {function}\n    {code}\n'
+
+
+def make_stack_trace(frames: int = 40) -> str:
+    """Genera un traceback de Python pegado por un usuario."""
+    lines = ["Tengo este error y no sé por qué:\n", "Traceback (most recent call last):\n"]
+    for i in range(frames):
+        lines.append(_TRACEBACK_FRAME.format(
+            module=f"module_{i % 7}", line=10 + i, function=f"handler_{i % 5}",
+            code=f"result = process(item_{i})"))
+    lines.append("KeyError: 'user_id'\n")
+    return "".join(lines)
+
+
+def make_code_dump(lines: int = 400) -> str:
+    """Genera un volcado largo de código sin palabras clave al principio."""
+    body = "\n".join(
+        f"    total_{i} = sum(value * {i} for value in values if value > {i % 10})"
+        for i in range(lines)
+    )
+    return f"Revisa esto:\ndef compute(values):\n{body}\n    return total_0\n¿Hay algún bug?"
+
+
+def build_corpora() -> dict:
+    """Corpus representativos del tráfico real."""
+    return {
+        "short_questions": SHORT_QUERIES,
+        "stack_traces": [make_stack_trace(frames) for frames in (10, 40, 120)],
+        "code_dumps": [make_code_dump(lines) for lines in (50, 400, 2000)],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Microbenchmarks
+# ---------------------------------------------------------------------------
+
+def legacy_validate(query: str) -> bool:
+    """
+    Validación original (búsqueda de subcadenas), como referencia para
+    comparar con el clasificador de hades_matcher.
+    """
+    from hades_matcher import GREETINGS, TOPIC_KEYWORDS
+
+    query_lower = query.lower().strip()
+    if any(greeting in query_lower for greeting in GREETINGS):
+        return True
+    query_lower = query.lower()
+    return any(keyword.lower() in query_lower for keyword in TOPIC_KEYWORDS)
+
+
+def bench_micro(repeat: int = 5, number: int = 200) -> dict:
+    """
+    Mide validate_query e is_software_development_related sobre cada corpus,
+    junto a la validación original por subcadenas (``legacy_validate``).
+
+    Returns:
+        dict: Microsegundos por consulta (mejor de ``repeat`` rondas) y, en
+              validate_query, la relación con la validación original
+    """
+    from hades_chatbot import create_hades_instance
+    from hades_prompt import is_software_development_related
+
+    hades = create_hades_instance()
+    results = {}
+    for name, queries in build_corpora().items():
+        for label, func in (("legacy_validate", legacy_validate),
+                            ("validate_query", hades.validate_query),
+                            ("is_software_development_related", is_software_development_related)):
+            timer = timeit.Timer(lambda: [func(query) for query in queries])
+            best = min(timer.repeat(repeat=repeat, number=number))
+            results[f"{label}.{name}"] = {
+                "us_per_query": round(best / (number * len(queries)) * 1e6, 3),
+                "queries": len(queries),
+                "avg_chars": round(sum(map(len, queries)) / len(queries)),
+            }
+        legacy = results[f"legacy_validate.{name}"]["us_per_query"]
+        current = results[f"validate_query.{name}"]
+        current["vs_legacy"] = round(current["us_per_query"] / legacy, 2) if legacy else None
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Servidor de LLM falso
+# ---------------------------------------------------------------------------
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Imita POST /v1/chat/completions de OpenAI, con y sin streaming."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.2        # segundos hasta el primer token
+    token_delay = 0.005  # segundos entre tokens en streaming
+    tokens = 50          # tokens por respuesta
+    cached_tokens = 0    # tokens del prompt leídos de la caché del proveedor
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, b'{"error": "not found"}')
+            return
+
+        model = request.get("model", "fake")
+        usage = {"prompt_tokens": 100, "completion_tokens": self.tokens, "total_tokens": 100 + self.tokens,
+                 "prompt_tokens_details": {"cached_tokens": self.cached_tokens}}
+        time.sleep(self.latency)
+        if not request.get("stream"):
+            self._send(200, json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                    "role": "assistant", "content": "token " * self.tokens}}],
+                "usage": usage,
+            }).encode())
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(payload: str):
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for i in range(self.tokens):
+            if i:
+                time.sleep(self.token_delay)
+            chunk(json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0,
+                "model": model, "choices": [{"index": 0, "delta": {"content": "token "},
+                                             "finish_reason": None}],
+            }))
+        if request.get("stream_options", {}).get("include_usage"):
+            chunk(json.dumps({"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                              "created": 0, "model": model, "choices": [], "usage": usage}))
+        chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_fake_llm(latency: float, token_delay: float, tokens: int) -> ThreadingHTTPServer:
+    """Arranca el servidor falso en un puerto libre de localhost."""
+    handler = type("Handler", (FakeLLMHandler,), {
+        "latency": latency, "token_delay": token_delay, "tokens": tokens})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------------------------------------------------------------------------
+# Prueba de carga
+# ---------------------------------------------------------------------------
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {"p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99),
+            "max_ms": round(ordered[-1] * 1000, 2),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 2)}
+
+
+def _start_app(llm_port: int):
+    """Sirve app.py apuntando a OpenAI en el servidor falso."""
+    os.environ["OPENAI_API_KEY"] = "sk-benchmark"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{llm_port}/v1"
+    for name in ("ANTHROPIC_API_KEY", "AZURE_OPENAI_ENDPOINT"):
+        os.environ.pop(name, None)
+
+    from werkzeug.serving import make_server
+    from config import CHATBOT_CONFIG
+
+    # Todo el tráfico sale de la misma IP: sin límite por cliente
+    CHATBOT_CONFIG.setdefault("rate_limit", {})["enabled"] = False
+    from app import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    application = create_app()
+    services = application.extensions["hades"]
+    if services.llm_callback is None:
+        raise RuntimeError("No se pudo configurar el LLM falso (¿está instalado openai?)")
+    services.wait_ready()
+    server = make_server("127.0.0.1", 0, application, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_query(i: int, repeat_ratio: float) -> str:
+    """Mezcla de tráfico: saludos, fuera de tema, repetidas y únicas."""
+    roll = random.random()
+    if roll < 0.1:
+        return "Hola"
+    if roll < 0.2:
+        return "¿Qué tiempo hará mañana?"
+    if roll < 0.2 + repeat_ratio:
+        return random.choice(SHORT_QUERIES[:4])
+    return f"¿Cómo depuro el error {i} en mi aplicación Python?"
+
+
+def _request(port: int, path: str, query: str, stream: bool) -> tuple[float, Optional[float], bool]:
+    """Envía una petición y retorna (latencia, tiempo al primer fragmento, éxito)."""
+    body = json.dumps({"message": query}).encode()
+    started = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        connection.request("POST", path, body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        first = None
+        if stream:
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                if first is None and line.startswith(b"data:"):
+                    first = time.perf_counter() - started
+        else:
+            response.read()
+        return time.perf_counter() - started, first, response.status == 200
+    except OSError:
+        return time.perf_counter() - started, None, False
+    finally:
+        connection.close()
+
+
+def bench_load(requests: int = 500, concurrency: int = 32, stream: bool = False,
+               latency: float = 0.2, token_delay: float = 0.005, tokens: int = 50,
+               repeat_ratio: float = 0.2) -> dict:
+    """
+    Mide throughput y latencia de /api/chat (o /api/chat/stream) con carga concurrente.
+
+    Returns:
+        dict: Peticiones por segundo, errores y percentiles de latencia
+    """
+    llm = start_fake_llm(latency, token_delay, tokens)
+    server = _start_app(llm.server_address[1])
+    port = server.server_port
+    path = "/api/chat/stream" if stream else "/api/chat"
+    queries = [_make_query(i, repeat_ratio) for i in range(requests)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda query: _request(port, path, query, stream), queries))
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+    llm.shutdown()
+
+    latencies = [latency for latency, _, ok in results if ok]
+    first_tokens = [first for _, first, ok in results if ok and first is not None]
+    result = {
+        "endpoint": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "llm_latency_ms": latency * 1000,
+        "errors": sum(1 for _, _, ok in results if not ok),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "latency": _percentiles(latencies),
+    }
+    if stream:
+        result["time_to_first_token"] = _percentiles(first_tokens)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Memoria
+# ---------------------------------------------------------------------------
+
+def bench_memory(sessions: int = 2000, turns: int = 50, checkpoints: int = 5) -> dict:
+    """
+    Mide el crecimiento de memoria con muchas sesiones largas.
+
+    El almacén de sesiones limita los turnos por sesión, así que la memoria
+    por sesión debería estabilizarse aunque las conversaciones sigan.
+
+    Returns:
+        dict: Memoria tras cada bloque de turnos y bytes por sesión
+    """
+    from hades_chatbot import HadesChatbot
+    from hades_cache import ResponseCache
+
+    answer = "Puedes usar un índice compuesto. " * 20
+    hades = HadesChatbot(llm_callback=lambda query, **kwargs: answer,
+                         cache=ResponseCache(max_entries=1000))
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    samples = []
+    step = max(1, turns // checkpoints)
+    for turn in range(1, turns + 1):
+        for session in range(sessions):
+            hades.handle_query(f"¿Cómo optimizo la consulta SQL {session}-{turn}?",
+                               session_id=f"s{session}")
+        if turn % step == 0 or turn == turns:
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0] - baseline
+            samples.append({"turns": turn, "bytes": current,
+                            "bytes_per_session": round(current / sessions)})
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "max_turns": hades.sessions.max_messages // 2,
+        "peak_bytes": peak,
+        "growth": samples,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Arranque en frío
+# ---------------------------------------------------------------------------
+
+# Mide create_app() y el calentamiento en un proceso nuevo (tras importar app)
+_STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+application = create_app()
+created = time.perf_counter()
+application.extensions["hades"].wait_ready()
+ready = time.perf_counter()
+print(json.dumps({"create_app_ms": (created - imported) * 1000,
+                  "warmup_ms": (ready - created) * 1000}))
+"""
+
+
+def _parse_importtime(output: str, module: str) -> tuple[float, dict]:
+    """
+    Lee la salida de ``-X importtime``.
+
+    Args:
+        output: Salida de error del proceso
+        module: Módulo importado por el proceso
+
+    Returns:
+        tuple: (milisegundos acumulados de ``module``, {dependencia directa:
+               milisegundos acumulados})
+    """
+    children = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # cabecera
+        # La salida va en postorden: un módulo aparece tras sus dependencias,
+        # con dos espacios más de sangría por nivel
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            children[name] = int(cumulative) / 1000
+        elif depth == 0:
+            if name == module:
+                return int(cumulative) / 1000, children
+            children = {}
+    raise ValueError(f"{module} no aparece en la salida de -X importtime")
+
+
+def bench_startup(runs: int = 5, module: str = "app", top: int = 10) -> dict:
+    """
+    Mide el arranque en frío de la aplicación en procesos nuevos.
+
+    Args:
+        runs: Procesos a lanzar (se toma la mediana)
+        module: Módulo cuya importación se mide
+        top: Dependencias directas más lentas a incluir en el resultado
+
+    Returns:
+        dict: Tiempos de importación, de create_app() y del calentamiento
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    imports, factory = [], []
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                   capture_output=True, text=True, cwd=cwd)
+        if completed.returncode != 0:
+            raise RuntimeError(f"No se pudo importar {module}:\n{completed.stderr[-2000:]}")
+        imports.append(_parse_importtime(completed.stderr, module))
+        if module == "app":
+            completed = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT],
+                                       capture_output=True, text=True, cwd=cwd)
+            if completed.returncode == 0:
+                factory.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    totals = [total for total, _ in imports]
+    # Desglose de la ejecución mediana: lo primero que mirar si se supera el presupuesto
+    _, children = imports[totals.index(statistics.median_low(totals))]
+    slowest = sorted(children.items(), key=lambda item: -item[1])[:top]
+    result = {
+        "runs": runs,
+        "import_ms": round(statistics.median(totals), 2),
+        "import_min_ms": round(min(totals), 2),
+        "slowest_imports_ms": {name: round(ms, 2) for name, ms in slowest},
+    }
+    if factory:
+        result["create_app_ms"] = round(statistics.median(run["create_app_ms"] for run in factory), 2)
+        result["warmup_ms"] = round(statistics.median(run["warmup_ms"] for run in factory), 2)
+    return result
+
+
+def check_startup(result: dict, budget_ms: Optional[float], previous: Optional[dict],
+                  max_regression: float) -> list[str]:
+    """
+    Compara el tiempo de importación con el presupuesto y con otra ejecución.
+
+    Returns:
+        list: Mensajes de los límites superados (vacía si todo está bien)
+    """
+    failures = []
+    import_ms = result["import_ms"]
+    if budget_ms is not None and import_ms > budget_ms:
+        failures.append(f"import app tarda {import_ms} ms (presupuesto: {budget_ms} ms)")
+    before = (previous or {}).get("results", {}).get("startup", {}).get("import_ms")
+    if before and import_ms > before * (1 + max_regression / 100):
+        failures.append(f"import app pasó de {before} ms a {import_ms} ms "
+                        f"(más del {max_regression}% de regresión)")
+    return failures
+
+
+# ---------------------------------------------------------------------------
+# Resultados
+# ---------------------------------------------------------------------------
+
+def environment() -> dict:
+    """Commit y entorno en el que se ejecutó el benchmark."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _flatten(data, prefix: str = "") -> dict:
+    if isinstance(data, dict):
+        flat = {}
+        for key, value in data.items():
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        return flat
+    if isinstance(data, (int, float)) and not isinstance(data, bool):
+        return {prefix[:-1]: data}
+    return {}
+
+
+def compare(current: dict, previous: dict):
+    """Imprime la variación de cada métrica numérica respecto a otra ejecución."""
+    before = _flatten(previous.get("results", {}))
+    after = _flatten(current.get("results", {}))
+    print(f"\nComparación con {previous.get('environment', {}).get('commit')}:")
+    for key in sorted(after):
+        if key in before and before[key]:
+            change = (after[key] - before[key]) / before[key] * 100
+            print(f"  {key:70} {before[key]:>12} → {after[key]:>12} ({change:+.1f}%)")
+
+
+def main(argv: Optional[list[str]] = None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(description="Benchmarks de Hades.")
+    parser.add_argument("suite", choices=("micro", "load", "memory", "startup", "all"))
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="Archivo JSON de resultados")
+    parser.add_argument("--compare", help="Resultados anteriores con los que comparar")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--stream", action="store_true", help="Usa /api/chat/stream")
+    parser.add_argument("--llm-latency", type=float, default=0.2,
+                        help="Segundos del LLM falso hasta el primer token")
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Procesos de la prueba de arranque")
+    parser.add_argument("--import-budget-ms", type=float,
+                        help="Tiempo máximo de import app; si se supera, código de salida 1")
+    parser.add_argument("--max-regression", type=float, default=20,
+                        help="Empeoramiento máximo (%%) de import app respecto a --compare")
+    args = parser.parse_args(argv)
+
+    results = {}
+    if args.suite in ("micro", "all"):
+        results["micro"] = bench_micro()
+    if args.suite in ("memory", "all"):
+        results["memory"] = bench_memory(args.sessions, args.turns)
+    if args.suite in ("load", "all"):
+        results["load"] = bench_load(args.requests, args.concurrency, args.stream,
+                                     args.llm_latency, args.token_delay, args.tokens)
+    if args.suite in ("startup", "all"):
+        results["startup"] = bench_startup(args.runs)
+
+    report = {"environment": environment(), "results": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    json.dump(results, sys.stdout, indent=2, ensure_ascii=False)
+    print(f"\n\n✅ Resultados guardados en {args.output}")
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        compare(report, previous)
+
+    if "startup" in results:
+        failures = check_startup(results["startup"], args.import_budget_ms, previous,
+                                 args.max_regression)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -38,6 +38,192 @@ CHATBOT_CONFIG = {
         "provide_resources": True
     },
     
+    # Parámetros de las peticiones al LLM
+    "llm": {
+        "temperature": 0.7,
+        "max_tokens": 1500
+    },
+    
+    # Cliente HTTP compartido por todos los proveedores de LLM
+    "http_client": {
+        "max_connections": 100,
+        "max_keepalive_connections": 20,
+        "keepalive_expiry": 30,  # segundos
+        "connect_timeout": 5,    # segundos
+        "timeout": 60,           # segundos
+        "http2": False           # requiere: pip install httpx[http2]
+    },
+    
+    # Plazos, reintentos y circuit breaker de las llamadas al LLM
+    "resilience": {
+        "timeout": 30,            # plazo total por petición (segundos)
+        "max_retries": 2,         # reintentos ante 429, 5xx y timeouts
+        "backoff_base": 0.5,      # espera base del backoff exponencial
+        "backoff_max": 8,         # espera máxima entre reintentos
+        "failure_threshold": 5,   # fallos seguidos que abren el circuito
+        "reset_timeout": 30,      # segundos con el circuito abierto
+        "hedge_delay": None       # segundos antes de duplicar la petición
+    },
+    
+    # Enrutador entre varios proveedores de LLM
+    "router": {
+        "alpha": 0.2,              # peso de la última medida en las EWMA
+        "error_threshold": 0.5,    # tasa de errores que marca un backend como no sano
+        "error_half_life": 30,     # segundos en los que la tasa de errores se reduce a la mitad
+        "max_concurrency": {       # peticiones simultáneas por backend
+            "default": 16
+        }
+    },
+    
+    # Servidor de producción (serve.py)
+    "server": {
+        "host": "0.0.0.0",
+        "port": 5000,
+        "workers": 1,             # procesos; con más de 1 el estado (sesiones, cachés,
+                                  # límites) es por proceso: usar sesiones persistentes
+        "threads": 8,             # hilos por proceso (solo WSGI)
+        "backlog": 2048,          # conexiones pendientes de aceptar
+        "keepalive": 5,           # segundos que se mantiene viva una conexión
+        "timeout": 120,           # segundos antes de reiniciar un worker bloqueado
+        "graceful_timeout": 30,   # segundos para terminar peticiones al recargar
+        "preload": True,          # cargar la aplicación antes de crear los workers
+        "debug": False
+    },
+    
+    # Métricas en formato Prometheus (/metrics)
+    "metrics": {
+        "enabled": True
+    },
+    
+    # Trazas por petición (hades_tracing.py)
+    "tracing": {
+        "enabled": False,
+        "sample_rate": 0.01,      # fracción de peticiones trazadas (0-1)
+        "exporter": "jsonl",      # "jsonl" u "otlp"
+        "path": "hades_traces.jsonl",
+        "endpoint": "http://localhost:4318/v1/traces",  # colector OTLP/HTTP
+        "queue_size": 1000        # trazas pendientes de exportar (las demás se descartan)
+    },
+    
+    # Control de admisión: token bucket por cliente y límite global de
+    # peticiones en curso hacia el LLM (responden 429 con Retry-After)
+    "rate_limit": {
+        "enabled": False,         # desactivado por defecto (ver README, "Límite de peticiones")
+        "rate": 1.0,              # peticiones por segundo recuperadas por cliente
+        "burst": 20,              # ráfaga máxima por cliente
+        "backend": "memory",      # "memory" (por proceso) o "redis" (compartido)
+        "redis_url": "redis://localhost:6379/0",
+        "max_clients": 100000,    # clientes recordados por el backend en memoria
+        "trust_proxy": False,     # identificar por X-Forwarded-For
+        "api_keys": [],           # API keys que identifican a un cliente (también HADES_API_KEYS);
+                                  # las demás se ignoran y el cliente se identifica por su IP
+        "max_concurrency": 64,    # peticiones en curso hacia el LLM por proceso
+        "max_queue": 256,         # peticiones esperando un hueco
+        "queue_timeout": 10       # segundos máximos de espera en la cola
+    },
+    
+    # Planificador de llamadas al LLM por prioridad (hades_scheduler.py)
+    "scheduler": {
+        "enabled": True,
+        "max_concurrency": 32,    # llamadas simultáneas al proveedor por proceso
+        "timeouts": {             # plazo por defecto de cada clase (segundos)
+            "interactive": 30,
+            "batch": 600,
+            "background": 3600
+        },
+        "tenant_weights": {}      # peso relativo por tenant, p. ej. {"key:equipo-a": 2}
+    },
+    
+    # Archivos estáticos y compresión de respuestas (hades_static.py)
+    "static": {
+        "min_size": 512,          # bytes mínimos para precomprimir un archivo
+        "gzip_level": 9,
+        "brotli": True,           # variantes brotli si el paquete está instalado
+        "brotli_quality": 11,
+        "max_age": 31536000,      # caché de los nombres con huella (1 año)
+        # Archivos del directorio raíz que se sirven; ninguno más
+        "files": ["index.html", "style.css", "styles.css", "app.js", "script.js",
+                  "hades_prompt.txt"],
+        "compress_responses": True,
+        "compress_min_size": 1024 # bytes mínimos para comprimir una respuesta JSON
+    },
+    
+    # Registro persistente de conversaciones (hades_conversations.py)
+    "conversation_log": {
+        "enabled": False,
+        "path": "hades_conversations.jsonl",
+        "queue_size": 10000,      # intercambios pendientes de escribir
+        "batch_size": 256,        # intercambios por escritura (group commit)
+        "fsync_interval": 1.0,    # segundos máximos entre fsync (0 = cada lote)
+        "put_timeout": 0.05,      # espera máxima si la cola está llena
+        "max_sessions": 100000,   # sesiones en el índice (se olvidan las más inactivas)
+        "max_page_size": 200      # límite de /api/history/<session_id>
+    },
+    
+    # Recarga en caliente del prompt, las palabras clave y las respuestas
+    # (hades_snapshot.py); también con: kill -HUP <pid>
+    "hot_reload": {
+        "enabled": True,
+        "path": "hades_overrides.json",  # ajustes JSON que se superponen a esta configuración
+        "prompt_path": None,             # archivo con el prompt del sistema (p. ej. "hades_prompt.txt")
+        "interval": 2.0                  # segundos entre comprobaciones (0 = solo SIGHUP)
+    },
+    
+    # Reducción de consultas largas (logs, trazas, código) antes de enviarlas
+    # al LLM (hades_reduce.py)
+    "input_reduction": {
+        "enabled": True,
+        "min_chars": 2000,        # las consultas más cortas se envían tal cual
+        "max_tokens": 4000,       # techo de tokens de la consulta reducida
+        "head_ratio": 0.4,        # parte del techo para el principio; el resto, para el final
+        "max_period": 8,          # líneas máximas de un bloque repetido (marcos de una traza)
+        "min_repeats": 3          # apariciones seguidas para colapsar un bloque
+    },
+    
+    # Procesamiento de consultas por lotes (/api/chat/batch y hades_batch.py)
+    "batch": {
+        "max_size": 100,        # consultas por petición a /api/chat/batch
+        "max_concurrency": 8    # llamadas simultáneas al LLM por lote
+    },
+    
+    # Historial de conversaciones por sesión
+    "sessions": {
+        "max_sessions": 10000,  # sesiones en memoria (desalojo LRU)
+        "max_turns": 20,        # turnos (pregunta + respuesta) por sesión
+        "ttl_seconds": 1800,    # expiración por inactividad
+        "secret": None          # firma de los ids de sesión (también HADES_SESSION_SECRET);
+                                # sin él se genera uno al arrancar y las sesiones no
+                                # sobreviven a un reinicio
+    },
+    
+    # Historial enviado al LLM en cada petición
+    "context": {
+        "max_tokens": 2000,     # presupuesto de tokens para el historial
+        "summary_tokens": 200   # tokens para resumir los turnos descartados
+    },
+    
+    # Caché de respuestas del LLM
+    "cache": {
+        "enabled": True,
+        "max_entries": 1000,    # respuestas en memoria (desalojo LRU)
+        "ttl_seconds": 3600,    # validez de cada respuesta
+        "path": None            # archivo SQLite para persistir la caché
+    },
+    
+    # Agrupar consultas idénticas en curso en una sola llamada al LLM
+    "coalescing": {
+        "enabled": True
+    },
+    
+    # Caché semántica para consultas parecidas (requiere numpy)
+    "semantic_cache": {
+        "enabled": False,
+        "threshold": 0.85,      # similitud coseno mínima (0-1)
+        "max_entries": 5000,
+        "dimensions": 1024,
+        "ttl_seconds": 3600
+    },
+    
     # Lenguajes de programación soportados
     "supported_languages": [
         "Python", "JavaScript", "TypeScript", "Java", "C++", "C#", "Go", 
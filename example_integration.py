@@ -6,12 +6,57 @@ Este archivo muestra ejemplos de cómo integrar el prompt de Hades
 con diferentes proveedores de modelos de lenguaje.
 """
 
-from hades_prompt import get_system_prompt
 from hades_chatbot import HadesChatbot
-import os
+from hades_providers import create_llm_integration
+from hades_resilience import with_resilience
 from typing import Optional
 
 
+# Validador compartido: no guarda estado por consulta, así que no hace falta
+# crear un HadesChatbot nuevo en cada llamada.
+hades_validator = HadesChatbot()
+
+
+def build_chat_function(provider: str, model: Optional[str] = None):
+    """
+    Crea una función de chat que valida la consulta y la envía al proveedor.
+    
+    El cliente del proveedor (y su pool de conexiones HTTP) se crea una
+    sola vez y se reutiliza en todas las llamadas, que llevan plazo,
+    reintentos y circuit breaker (hades_resilience).
+    
+    Args:
+        provider: "openai", "anthropic" o "azure"
+        model: Modelo (o deployment de Azure) a usar
+    
+    Returns:
+        Callable: Función que recibe la pregunta y retorna la respuesta
+    """
+    llm_callback = with_resilience(create_llm_integration(provider, model=model))
+    
+    def chat_with_hades(user_query: str, model: str = llm_callback.model) -> str:
+        """
+        Envía una consulta a Hades usando el proveedor configurado.
+        
+        Args:
+            user_query: La pregunta del usuario
+            model: El modelo a usar
+        
+        Returns:
+            str: La respuesta de Hades
+        """
+        # Validar primero con el chatbot
+        is_valid, validation_message = hades_validator.validate_query(user_query)
+        
+        if not is_valid:
+            return validation_message
+        
+        # Si es válida, enviar al modelo
+        return llm_callback(user_query, model=model)
+    
+    return chat_with_hades
+
+
 def example_with_openai():
     """
     Ejemplo de integración con OpenAI GPT.
@@ -19,41 +64,8 @@ def example_with_openai():
     Requiere: pip install openai
     """
     try:
-        from openai import OpenAI
-        
-        # Configurar el cliente (asegúrate de tener OPENAI_API_KEY en tu .env)
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        def chat_with_hades(user_query: str, model: str = "gpt-4") -> str:
-            """
-            Envía una consulta a Hades usando OpenAI.
-            
-            Args:
-                user_query: La pregunta del usuario
-                model: El modelo a usar (gpt-4, gpt-3.5-turbo, etc.)
-            
-            Returns:
-                str: La respuesta de Hades
-            """
-            # Validar primero con el chatbot
-            hades = HadesChatbot()
-            is_valid, validation_message = hades.validate_query(user_query)
-            
-            if not is_valid:
-                return validation_message
-            
-            # Si es válida, enviar al modelo
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": get_system_prompt()},
-                    {"role": "user", "content": user_query}
-                ],
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            return response.choices[0].message.content
+        # Usa OPENAI_API_KEY de tu entorno
+        chat_with_hades = build_chat_function("openai", model="gpt-4")
         
         # Ejemplo de uso
         print("=== Ejemplo con OpenAI ===")
@@ -74,37 +86,8 @@ def example_with_anthropic():
     Requiere: pip install anthropic
     """
     try:
-        import anthropic
-        
-        client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-        
-        def chat_with_hades(user_query: str, model: str = "claude-3-5-sonnet-20241022") -> str:
-            """
-            Envía una consulta a Hades usando Anthropic Claude.
-            
-            Args:
-                user_query: La pregunta del usuario
-                model: El modelo a usar
-            
-            Returns:
-                str: La respuesta de Hades
-            """
-            hades = HadesChatbot()
-            is_valid, validation_message = hades.validate_query(user_query)
-            
-            if not is_valid:
-                return validation_message
-            
-            message = client.messages.create(
-                model=model,
-                max_tokens=1500,
-                system=get_system_prompt(),
-                messages=[
-                    {"role": "user", "content": user_query}
-                ]
-            )
-            
-            return message.content[0].text
+        # Usa ANTHROPIC_API_KEY de tu entorno
+        chat_with_hades = build_chat_function("anthropic", model="claude-3-5-sonnet-20241022")
         
         # Ejemplo de uso
         print("=== Ejemplo con Anthropic ===")
@@ -125,46 +108,10 @@ def example_with_azure_openai():
     Requiere: pip install openai azure-identity
     """
     try:
-        from openai import AzureOpenAI
-        from azure.identity import DefaultAzureCredential
-        
-        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-        deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-        
-        client = AzureOpenAI(
-            azure_endpoint=endpoint,
-            api_version=api_version,
-            azure_ad_token_provider=DefaultAzureCredential().get_token
-        )
-        
-        def chat_with_hades(user_query: str) -> str:
-            """
-            Envía una consulta a Hades usando Azure OpenAI.
-            
-            Args:
-                user_query: La pregunta del usuario
-            
-            Returns:
-                str: La respuesta de Hades
-            """
-            hades = HadesChatbot()
-            is_valid, validation_message = hades.validate_query(user_query)
-            
-            if not is_valid:
-                return validation_message
-            
-            response = client.chat.completions.create(
-                model=deployment_name,
-                messages=[
-                    {"role": "system", "content": get_system_prompt()},
-                    {"role": "user", "content": user_query}
-                ],
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            return response.choices[0].message.content
+        # Usa AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION y
+        # AZURE_OPENAI_DEPLOYMENT_NAME; sin AZURE_OPENAI_API_KEY se
+        # autentica con Azure AD (DefaultAzureCredential)
+        chat_with_hades = build_chat_function("azure")
         
         print("=== Ejemplo con Azure OpenAI ===")
         respuesta = chat_with_hades("¿Cómo optimizo una consulta SQL?")
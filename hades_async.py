@@ -0,0 +1,356 @@
+"""
+Hades - Versión asíncrona del chatbot
+=====================================
+
+Permite usar callbacks de LLM asíncronos para que un único bucle de eventos
+mantenga cientos de llamadas al proveedor en curso sin bloquear hilos.
+"""
+
+from hades_chatbot import UNCLASSIFIED, HadesChatbot, _error_message
+from hades_providers import collect_usage, create_async_llm_integration
+from hades_resilience import with_resilience
+from hades_snapshot import pinned
+from hades_sessions import DEFAULT_SESSION
+from hades_tracing import span
+from config import CHATBOT_CONFIG
+from typing import AsyncIterator, Iterator, Optional, Callable
+import asyncio
+import inspect
+import threading
+
+
+_END = object()
+
+# Bucle de eventos de cada hilo para los envoltorios síncronos
+_loops = threading.local()
+
+
+def _is_async_callable(func: Callable) -> bool:
+    """Indica si una función (u objeto invocable) es una corrutina."""
+    return (inspect.iscoroutinefunction(func)
+            or inspect.iscoroutinefunction(getattr(func, "__call__", None)))
+
+
+def _thread_loop() -> asyncio.AbstractEventLoop:
+    """
+    Retorna el bucle de eventos de los envoltorios síncronos del hilo actual.
+
+    Se reutiliza entre llamadas: los clientes HTTP asíncronos pertenecen a un
+    bucle, así que con un bucle nuevo por llamada (asyncio.run) cada consulta
+    abriría un cliente y sus conexiones sin llegar a cerrarlos.
+
+    Raises:
+        RuntimeError: Si ya hay un bucle en ejecución en este hilo
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("Los métodos síncronos no pueden usarse dentro de un bucle "
+                           "de eventos; usa sus versiones asíncronas con await")
+    loop = getattr(_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _loops.loop = asyncio.new_event_loop()
+    return loop
+
+
+async def call_llm(callback: Callable, query: str, **kwargs) -> str:
+    """
+    Invoca un callback de LLM síncrono o asíncrono.
+
+    Los callbacks síncronos se ejecutan en un hilo para no bloquear el bucle.
+
+    Args:
+        callback: Callback de LLM
+        query: La consulta del usuario
+        **kwargs: Argumentos extra del callback (por ejemplo ``history``)
+
+    Returns:
+        str: Respuesta del LLM
+    """
+    if _is_async_callable(callback):
+        return await callback(query, **kwargs)
+    result = await asyncio.to_thread(callback, query, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def iterate_stream(stream: Callable, query: str, **kwargs) -> AsyncIterator[str]:
+    """
+    Recorre el stream de un callback, sea un generador síncrono o asíncrono.
+
+    Args:
+        stream: Función que recibe la consulta y retorna los fragmentos
+        query: La consulta del usuario
+        **kwargs: Argumentos extra del callback (por ejemplo ``history``)
+
+    Yields:
+        str: Fragmentos de la respuesta
+    """
+    chunks = stream(query, **kwargs)
+    if inspect.isawaitable(chunks):
+        chunks = await chunks
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            yield chunk
+        return
+    iterator = iter(chunks)
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+class AsyncHadesChatbot(HadesChatbot):
+    """
+    Chatbot Hades con ruta de peticiones asíncrona.
+
+    Acepta callbacks de LLM definidos con ``async def`` (y, opcionalmente, un
+    atributo ``stream`` que sea un generador asíncrono). Los métodos síncronos
+    heredados siguen funcionando como envoltorios de los asíncronos.
+
+    Las operaciones que pueden tocar el disco (caché en SQLite, registro de
+    conversaciones) se ejecutan en un hilo para no bloquear el bucle.
+    """
+
+    async def _offload(self, func: Callable, *args, **kwargs):
+        """Ejecuta ``func`` en un hilo si puede bloquear en disco; si no, directamente."""
+        if (self.conversation_log is not None
+                or (self.cache is not None and self.cache.persistent)):
+            return await asyncio.to_thread(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    @pinned
+    async def ahandle_query(self, query: str, session_id: str = DEFAULT_SESSION,
+                            metadata: Optional[dict] = None,
+                            intent=UNCLASSIFIED) -> str:
+        """
+        Procesa una consulta del usuario de forma asíncrona.
+
+        Args:
+            query: La consulta del usuario
+            session_id: Identificador de la sesión de conversación
+            metadata: Diccionario opcional para el tamaño de la consulta y
+                     el uso de tokens (ver HadesChatbot.handle_query)
+            intent: Intención ya calculada (ver HadesChatbot.handle_query)
+
+        Returns:
+            str: La respuesta del chatbot
+        """
+        canned = self._precheck(query, intent)
+        if canned is not None:
+            return canned
+
+        query = self._reduce(query, metadata)
+
+        llm_kwargs, cache_key, cached = await self._offload(self._prepare, query, session_id)
+        if cached is not None:
+            await self._offload(self._record, session_id, query, cached)
+            return cached
+
+        try:
+            with span("llm", model=getattr(self.llm_callback, "model", "")), \
+                    collect_usage() as usage:
+                if self.flights is None or llm_kwargs:
+                    response = await call_llm(self.llm_callback, query, **llm_kwargs)
+                else:
+                    response = await self.flights.ado(
+                        self._flight_key(query), lambda: call_llm(self.llm_callback, query)
+                    )
+        except Exception as e:
+            return _error_message(e)
+        self._add_usage(metadata, usage)
+
+        await self._offload(self._remember, session_id, query, response, cache_key,
+                            cacheable=not llm_kwargs)
+        return response
+
+    @pinned
+    async def ahandle_query_stream(self, query: str, session_id: str = DEFAULT_SESSION,
+                                   metadata: Optional[dict] = None,
+                                   intent=UNCLASSIFIED) -> AsyncIterator[str]:
+        """
+        Procesa una consulta y genera la respuesta por fragmentos.
+
+        Args:
+            query: La consulta del usuario
+            session_id: Identificador de la sesión de conversación
+            metadata: Diccionario opcional para el tamaño de la consulta y
+                     el uso de tokens (ver HadesChatbot.handle_query_stream)
+            intent: Intención ya calculada (ver HadesChatbot.handle_query)
+
+        Yields:
+            str: Fragmentos de la respuesta del chatbot
+        """
+        canned = self._precheck(query, intent)
+        if canned is not None:
+            yield canned
+            return
+
+        stream = getattr(self.llm_callback, "stream", None)
+        if stream is None:
+            yield await self.ahandle_query(query, session_id=session_id, metadata=metadata,
+                                           intent=None)
+            return
+
+        query = self._reduce(query, metadata)
+
+        llm_kwargs, cache_key, cached = await self._offload(self._prepare, query, session_id)
+        if cached is not None:
+            await self._offload(self._record, session_id, query, cached)
+            yield cached
+            return
+
+        chunks = []
+        try:
+            with span("stream", model=getattr(self.llm_callback, "model", "")), \
+                    collect_usage() as usage:
+                async for chunk in iterate_stream(stream, query, **llm_kwargs):
+                    if chunk:
+                        chunks.append(chunk)
+                        yield chunk
+        except Exception as e:
+            yield _error_message(e)
+            return
+        self._add_usage(metadata, usage)
+
+        await self._offload(self._remember, session_id, query, "".join(chunks), cache_key,
+                            cacheable=not llm_kwargs)
+
+    @pinned
+    async def ahandle_batch(self, queries: list[str], max_concurrency: Optional[int] = None,
+                            errors: Optional[dict] = None) -> list[str]:
+        """
+        Procesa varias consultas independientes de forma asíncrona.
+
+        Args:
+            queries: Consultas del usuario
+            max_concurrency: Llamadas simultáneas al LLM (por defecto
+                            CHATBOT_CONFIG["batch"]["max_concurrency"])
+            errors: Diccionario opcional para los errores del LLM por índice
+                   (ver HadesChatbot.handle_batch)
+
+        Returns:
+            list: Respuestas en el mismo orden que las consultas
+        """
+        results, misses = await self._offload(self._batch_precheck, queries)
+        limit = asyncio.Semaphore(
+            max_concurrency or self.config.get("batch", {}).get("max_concurrency", 8)
+        )
+
+        async def answer(index: int, query: str, cache_key: Optional[str]):
+            async with limit:
+                try:
+                    if self.flights is None:
+                        response = await call_llm(self.llm_callback, query)
+                    else:
+                        response = await self.flights.ado(
+                            self._flight_key(query), lambda: call_llm(self.llm_callback, query)
+                        )
+                except Exception as e:
+                    results[index] = _error_message(e)
+                    if errors is not None:
+                        errors[index] = str(e) or type(e).__name__
+                    return
+            await self._offload(self._remember, None, query, response, cache_key)
+            results[index] = response
+
+        await asyncio.gather(*(answer(index, query, key) for index, query, key in misses))
+        return results
+
+    def handle_query(self, query: str, session_id: str = DEFAULT_SESSION,
+                     metadata: Optional[dict] = None, intent=UNCLASSIFIED) -> str:
+        """
+        Envoltorio síncrono de ahandle_query.
+
+        No debe llamarse desde dentro de un bucle de eventos en ejecución;
+        en ese caso usa ``await ahandle_query(...)``. Cada hilo reutiliza su
+        propio bucle (y los clientes HTTP creados en él) entre llamadas.
+        """
+        return _thread_loop().run_until_complete(
+            self.ahandle_query(query, session_id=session_id, metadata=metadata, intent=intent))
+
+    def handle_batch(self, queries: list[str], max_concurrency: Optional[int] = None,
+                     errors: Optional[dict] = None) -> list[str]:
+        """Envoltorio síncrono de ahandle_batch."""
+        return _thread_loop().run_until_complete(
+            self.ahandle_batch(queries, max_concurrency, errors))
+
+    def handle_query_stream(self, query: str, session_id: str = DEFAULT_SESSION,
+                            metadata: Optional[dict] = None,
+                            intent=UNCLASSIFIED) -> Iterator[str]:
+        """
+        Envoltorio síncrono de ahandle_query_stream.
+
+        El generador asíncrono se recorre entero dentro de una única tarea,
+        que entrega los fragmentos por una cola: así conserva su contexto
+        (y la instantánea fijada) de principio a fin.
+        """
+        loop = _thread_loop()
+        chunks = asyncio.Queue(maxsize=1)
+
+        async def produce():
+            try:
+                async for chunk in self.ahandle_query_stream(
+                        query, session_id=session_id, metadata=metadata, intent=intent):
+                    await chunks.put((chunk, None))
+            except Exception as e:
+                await chunks.put((None, e))
+            else:
+                await chunks.put((_END, None))
+
+        task = loop.create_task(produce())
+        try:
+            while True:
+                chunk, error = loop.run_until_complete(chunks.get())
+                if error is not None:
+                    raise error
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            if not task.done():
+                task.cancel()
+                try:
+                    loop.run_until_complete(task)
+                except asyncio.CancelledError:
+                    pass
+                # Deja correr el cierre de los generadores interrumpidos
+                loop.run_until_complete(asyncio.sleep(0))
+
+
+def create_async_hades_instance(llm_callback: Optional[Callable] = None,
+                                config: dict = CHATBOT_CONFIG):
+    """
+    Crea una instancia asíncrona del chatbot Hades.
+
+    Args:
+        llm_callback: Callback de LLM, síncrono o asíncrono
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        AsyncHadesChatbot: Instancia configurada del chatbot
+    """
+    return AsyncHadesChatbot(llm_callback=llm_callback, config=config)
+
+
+def create_async_openai_integration(api_key: Optional[str] = None, model: str = "gpt-4"):
+    """
+    Crea un callback asíncrono para integrar con OpenAI.
+
+    Args:
+        api_key: API key de OpenAI. Si no se proporciona, se intenta
+                obtener de la variable de entorno OPENAI_API_KEY.
+        model: Modelo por defecto (gpt-4, gpt-3.5-turbo, etc.)
+
+    Returns:
+        Callable: Corrutina callback para usar con AsyncHadesChatbot. Su
+                 atributo ``stream`` genera la respuesta por fragmentos.
+
+    Raises:
+        ImportError: Si openai no está instalado
+    """
+    return with_resilience(create_async_llm_integration("openai", api_key=api_key, model=model))
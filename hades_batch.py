@@ -0,0 +1,235 @@
+"""
+Hades - Procesamiento de consultas por lotes
+============================================
+
+Responde un archivo JSONL de preguntas y escribe un archivo JSONL de
+respuestas en el mismo orden, sin cargar ninguno de los dos en memoria.
+
+    python hades_batch.py preguntas.jsonl respuestas.jsonl --field question
+
+Cada línea de entrada puede ser un objeto JSON (se lee el campo indicado)
+o una cadena JSON. Las respuestas se escriben y sincronizan por bloques, así
+que si el proceso se interrumpe basta con volver a ejecutar el mismo comando:
+las líneas ya respondidas se saltan. Si la llamada al LLM falla, la línea se
+escribe con un campo "error" en lugar de "response", y al volver a ejecutar
+el comando esas líneas se reintentan.
+"""
+
+from hades_chatbot import create_hades_instance
+from hades_router import create_llm_callback_from_env
+from hades_scheduler import BACKGROUND, scheduling
+from config import CHATBOT_CONFIG
+from itertools import islice
+from typing import Iterator, Optional
+import argparse
+import json
+import os
+import sys
+
+
+def read_queries(path: str, field: str, skip: int = 0) -> Iterator[tuple[dict, str]]:
+    """
+    Lee las consultas de un archivo JSONL de forma perezosa.
+
+    Args:
+        path: Ruta del archivo de entrada
+        field: Campo que contiene la consulta en cada objeto
+        skip: Número de líneas (no vacías) a saltar
+
+    Yields:
+        tuple: (registro original, consulta)
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = (line for line in f if line.strip())
+        for line in islice(lines, skip, None):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = line.strip()
+            if isinstance(record, dict):
+                yield record, str(record.get(field, "")).strip()
+            else:
+                yield {field: record}, str(record).strip()
+
+
+def _failed(line: bytes) -> Optional[dict]:
+    """Retorna el registro de una línea de salida fallida, o None si tiene respuesta."""
+    if b'"error"' not in line:
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "error" not in data or "response" in data:
+        return None
+    del data["error"]
+    return data
+
+
+def count_completed(path: str) -> tuple[int, int]:
+    """
+    Cuenta las líneas completas de un archivo de salida.
+
+    Si la última línea quedó a medias por una interrupción, se elimina.
+
+    Returns:
+        tuple: (líneas completas, líneas con error del LLM)
+    """
+    if not os.path.exists(path):
+        return 0, 0
+    completed = 0
+    failed = 0
+    valid_size = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            completed += 1
+            failed += _failed(line) is not None
+            valid_size += len(line)
+    if valid_size != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid_size)
+    return completed, failed
+
+
+def _answer(hades, chunk: list[tuple[dict, str]], max_concurrency: Optional[int]
+            ) -> tuple[list[str], int]:
+    """Responde un bloque y retorna sus líneas de salida y cuántas fallaron."""
+    errors = {}
+    responses = hades.handle_batch([query for _, query in chunk], max_concurrency, errors)
+    lines = []
+    for index, ((record, _), response) in enumerate(zip(chunk, responses)):
+        if index in errors:
+            output = {**record, "error": errors[index]}
+        else:
+            output = {**record, "response": response}
+        lines.append(json.dumps(output, ensure_ascii=False) + "\n")
+    return lines, len(errors)
+
+
+def retry_failed(hades, output_path: str, field: str, chunk_size: int,
+                 max_concurrency: Optional[int] = None) -> tuple[int, int]:
+    """
+    Reintenta las líneas con error de un archivo de salida.
+
+    El archivo se reescribe en uno temporal, conservando el orden, y lo
+    sustituye al terminar. Las líneas correctas se copian sin cambios.
+
+    Returns:
+        tuple: (líneas reintentadas, líneas que han vuelto a fallar)
+    """
+    temp_path = output_path + ".retry"
+    retried = 0
+    failed = 0
+    pending = []   # líneas en orden: bytes ya escritas o (registro, consulta)
+    waiting = 0    # consultas pendientes de reintentar en ``pending``
+
+    with open(output_path, "rb") as source, open(temp_path, "wb") as out:
+        def flush() -> int:
+            lines, errors = _answer(hades, [item for item in pending if isinstance(item, tuple)],
+                                    max_concurrency)
+            answers = iter(lines)
+            for item in pending:
+                out.write(item if isinstance(item, bytes) else next(answers).encode("utf-8"))
+            pending.clear()
+            return errors
+
+        for line in source:
+            record = _failed(line)
+            if record is None:
+                if pending:
+                    pending.append(line)
+                else:
+                    out.write(line)
+                continue
+            pending.append((record, str(record.get(field, "")).strip()))
+            waiting += 1
+            if waiting == chunk_size:
+                failed += flush()
+                retried += waiting
+                waiting = 0
+        if pending:
+            failed += flush()
+            retried += waiting
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(temp_path, output_path)
+    return retried, failed
+
+
+def run_batch(hades, input_path: str, output_path: str, field: str = "question",
+              chunk_size: Optional[int] = None, max_concurrency: Optional[int] = None,
+              resume: bool = True) -> int:
+    """
+    Responde todas las consultas de un archivo JSONL.
+
+    Args:
+        hades: Instancia de HadesChatbot
+        input_path: Archivo JSONL de entrada
+        output_path: Archivo JSONL de salida
+        field: Campo que contiene la consulta
+        chunk_size: Consultas por bloque (por defecto CHATBOT_CONFIG["batch"]["max_size"])
+        max_concurrency: Llamadas simultáneas al LLM
+        resume: Si es True continúa un archivo de salida existente
+
+    Returns:
+        int: Número de consultas respondidas (o reintentadas) en esta ejecución
+    """
+    chunk_size = chunk_size or CHATBOT_CONFIG.get("batch", {}).get("max_size", 100)
+    done, failed = count_completed(output_path) if resume else (0, 0)
+    processed = 0
+    if failed:
+        print(f"🔁 Reintentando {failed} consultas que fallaron", file=sys.stderr)
+        processed, failed = retry_failed(hades, output_path, field, chunk_size,
+                                         max_concurrency)
+    records = read_queries(input_path, field, skip=done)
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            lines, errors = _answer(hades, chunk, max_concurrency)
+            out.writelines(lines)
+            out.flush()
+            os.fsync(out.fileno())
+            done += len(chunk)
+            processed += len(chunk)
+            failed += errors
+            print(f"✅ {done} consultas respondidas", file=sys.stderr)
+
+    if failed:
+        print(f"⚠️  {failed} consultas fallaron; vuelve a ejecutar el comando para "
+              "reintentarlas", file=sys.stderr)
+    return processed
+
+
+def main(argv: Optional[list[str]] = None):
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(description="Responde un archivo JSONL de consultas con Hades.")
+    parser.add_argument("input", help="Archivo JSONL de entrada")
+    parser.add_argument("output", help="Archivo JSONL de salida")
+    parser.add_argument("--field", default="question",
+                        help="Campo con la consulta en cada línea (por defecto: question)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Consultas por bloque")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Llamadas simultáneas al LLM")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Sobrescribe la salida en lugar de continuarla")
+    args = parser.parse_args(argv)
+
+    llm_callback = create_llm_callback_from_env()
+    if llm_callback is None:
+        print("⚠️  No hay ningún proveedor de LLM configurado; solo se validarán las consultas",
+              file=sys.stderr)
+    hades = create_hades_instance(llm_callback=llm_callback)
+    with scheduling(BACKGROUND, tenant="hades_batch"):
+        run_batch(hades, args.input, args.output, field=args.field,
+                  chunk_size=args.chunk_size, max_concurrency=args.concurrency,
+                  resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
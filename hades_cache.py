@@ -0,0 +1,615 @@
+"""
+Caché de respuestas para Hades
+==============================
+
+Evita repetir llamadas al LLM para preguntas ya respondidas. Las claves
+combinan la consulta normalizada (mayúsculas, acentos, espacios y signos de
+puntuación), el modelo y el hash del prompt del sistema.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import unicodedata
+import weakref
+
+from config import CHATBOT_CONFIG
+
+
+logger = logging.getLogger("hades.cache")
+
+# Marcas de la cola de escritura en SQLite
+_STOP = object()
+_CLEAR = object()
+
+# Cachés con SQLite, para reabrir la conexión y el escritor en los procesos hijos
+_persistent_caches = weakref.WeakSet()
+
+
+# Signos que cambian el significado de una palabra y se conservan aunque
+# estén en un extremo: C#, F#, C++ (al final) y .NET, #include, @Override,
+# --force (al principio)
+_KEEP_TRAILING = frozenset("#+")
+_KEEP_LEADING = frozenset("#.@-")
+
+
+def _strip_punctuation(word: str) -> str:
+    """Quita los signos de puntuación de los extremos de una palabra."""
+    start, end = 0, len(word)
+    while (start < end and word[start] not in _KEEP_LEADING
+           and unicodedata.category(word[start])[0] == "P"):
+        start += 1
+    while (end > start and word[end - 1] not in _KEEP_TRAILING
+           and unicodedata.category(word[end - 1])[0] == "P"):
+        end -= 1
+    return word[start:end]
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza una consulta para usarla como clave de caché.
+
+    "¿Cómo optimizo una consulta SQL?" y "como optimizo  una consulta sql"
+    producen la misma clave. Los signos dentro de una palabra (node.js,
+    e-mail) y los que la distinguen (C# frente a C, C++) se conservan.
+
+    Args:
+        query: La consulta del usuario
+
+    Returns:
+        str: Consulta sin acentos, en minúsculas, sin signos de puntuación
+             alrededor de las palabras y con los espacios colapsados
+    """
+    decomposed = unicodedata.normalize("NFKD", query.casefold())
+    chars = []
+    for char in decomposed:
+        category = unicodedata.category(char)
+        if category == "Mn":
+            continue
+        chars.append(" " if category[0] in "ZC" else char)
+    words = (_strip_punctuation(word) for word in "".join(chars).split())
+    return " ".join(word for word in words if word)
+
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas con expiración y persistencia opcional en SQLite.
+
+    Es seguro para uso concurrente desde varios hilos. Con persistencia, put()
+    solo guarda en memoria y encola la escritura: un hilo la lleva a SQLite
+    por lotes, con un commit por lote, sin bloquear a quien llama.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600,
+                 path: Optional[str] = None, clock=time.time, queue_size: int = 10000,
+                 batch_size: int = 256):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entries: Número máximo de respuestas en memoria (LRU)
+            ttl_seconds: Segundos de validez de cada respuesta. None
+                        desactiva la expiración.
+            path: Ruta opcional de un archivo SQLite para conservar la caché
+                 entre reinicios
+            clock: Función que retorna el tiempo actual en segundos
+            queue_size: Escrituras pendientes en SQLite como máximo (si la
+                       cola está llena, la respuesta solo queda en memoria)
+            batch_size: Escrituras por commit como máximo
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries debe ser mayor que cero")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if path:
+            self._open(path)
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._start_writer()
+            _persistent_caches.add(self)
+
+    @property
+    def persistent(self) -> bool:
+        """Indica si la caché se guarda en SQLite (get y put tocan el disco)."""
+        return self._db is not None
+
+    def _open(self, path: str):
+        """Abre (o crea) el almacén persistente y descarta lo expirado."""
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM responses WHERE created <= ?",
+                             (self._clock() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY created DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        self._db.commit()
+
+    def _start_writer(self):
+        self._thread = threading.Thread(target=self._run, name="hades-cache", daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        # La conexión SQLite y el hilo escritor no sobreviven al fork: cada
+        # proceso hijo abre los suyos
+        if self._db is None:
+            return
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._start_writer()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while items[-1] is not _STOP and len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_safely([item for item in items if item is not _STOP])
+            for _ in items:
+                self._queue.task_done()
+            if items[-1] is _STOP:
+                return
+
+    def _write_safely(self, items: list):
+        if not items:
+            return
+        try:
+            with self._db_lock:
+                for item in items:
+                    if item is _CLEAR:
+                        self._db.execute("DELETE FROM responses")
+                    else:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO responses (key, response, created) "
+                            "VALUES (?, ?, ?)", item
+                        )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning("No se pudieron guardar %d respuestas en caché: %s", len(items), e)
+
+    def _enqueue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def make_key(self, query: str, model: str = "", prompt_id: str = "") -> str:
+        """
+        Construye la clave de caché de una consulta.
+
+        Args:
+            query: La consulta del usuario
+            model: Nombre del modelo que genera la respuesta
+            prompt_id: Hash del prompt del sistema
+
+        Returns:
+            str: Clave de caché
+        """
+        raw = f"{model}\0{prompt_id}\0{normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _is_fresh(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is None or now - created < self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Busca una respuesta en la caché.
+
+        Args:
+            key: Clave obtenida con make_key
+
+        Returns:
+            str: Respuesta almacenada, o None si no existe o expiró
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, created = entry
+                if self._is_fresh(created, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+
+        # La lectura de SQLite no retiene el cerrojo de la memoria
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        with self._lock:
+            if row is not None and self._is_fresh(row[1], now):
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str):
+        """
+        Guarda una respuesta en la caché.
+
+        Args:
+            key: Clave obtenida con make_key
+            response: Respuesta del LLM
+        """
+        now = self._clock()
+        with self._lock:
+            self._remember(key, response, now)
+        if self._db is not None:
+            self._enqueue((key, response, now))
+
+    def _remember(self, key: str, response: str, created: float):
+        self._entries[key] = (response, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vacía la caché (también el almacén persistente)."""
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            # Tras las escrituras pendientes, y esperando a que termine
+            self._queue.put(_CLEAR)
+            self._queue.join()
+
+    def flush(self):
+        """Espera a que se guarden en SQLite las escrituras encoladas."""
+        if self._db is not None:
+            self._queue.join()
+
+    def close(self, timeout: float = 5):
+        """Guarda las escrituras pendientes y detiene el hilo escritor."""
+        if self._db is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """Retorna los contadores de aciertos y fallos."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self.persistent,
+                "pending_writes": self._queue.qsize() if self.persistent else 0,
+                "dropped_writes": self.dropped,
+            }
+
+
+def _close_caches():
+    for cache in list(_persistent_caches):
+        cache.close()
+
+
+atexit.register(_close_caches)
+
+if hasattr(os, "register_at_fork"):
+    def _after_fork():
+        for cache in list(_persistent_caches):
+            cache._after_fork()
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+# Palabras vacías que no aportan significado a la comparación semántica
+STOPWORDS = frozenset((
+    "a", "al", "como", "con", "cual", "de", "del", "el", "en", "es", "hago",
+    "hacer", "la", "las", "lo", "los", "mas", "me", "mi", "mis", "o", "para",
+    "por", "puedo", "que", "se", "su", "sus", "un", "una", "unos", "unas", "y",
+    "the", "how", "do", "i", "to", "of", "in", "is", "what", "my", "an"
+))
+
+# Terminaciones que se recortan para comparar raíces ("optimizo",
+# "optimizar" -> "optimiz"; "consultas" -> "consult"), de la más larga a la
+# más corta
+_SUFFIXES = tuple(sorted((
+    "aciones", "acion", "amente", "ando", "iendo", "ados", "adas", "ado", "ada",
+    "ar", "er", "ir", "as", "es", "os", "a", "o", "e", "s", "ing", "ed",
+), key=len, reverse=True))
+
+# Raíces equivalentes en preguntas de desarrollo (se comparan como la misma)
+SYNONYMS = {
+    "query": "consult", "queri": "consult",
+    "rapid": "optimiz", "aceler": "optimiz", "rendimient": "optimiz",
+    "lent": "optimiz", "fast": "optimiz", "speed": "optimiz", "slow": "optimiz",
+    "optimis": "optimiz",
+    "fall": "error",
+    "borr": "elimin", "delet": "elimin", "remov": "elimin",
+    "creat": "crear",
+}
+
+
+def _stem(word: str) -> str:
+    """Raíz aproximada de una palabra, con los sinónimos unificados."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            break
+    return SYNONYMS.get(word, word)
+
+
+def _stable_hash(token: str) -> int:
+    """Hash estable entre procesos (a diferencia de hash())."""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class SemanticCache:
+    """
+    Caché de respuestas para consultas parecidas (paráfrasis).
+
+    Cada consulta se convierte localmente en un vector de raíces y n-gramas
+    con hashing (sin modelos externos ni GPU). Los vectores se guardan en una
+    matriz de NumPy y la búsqueda es un único producto matriz-vector.
+
+    Los números y las versiones ("Django 4", "python3") no se comparan por
+    similitud: dos consultas solo coinciden si contienen exactamente los
+    mismos.
+
+    Requiere: pip install numpy
+    """
+
+    def __init__(self, threshold: float = 0.85, max_entries: int = 5000,
+                 dimensions: int = 1024, ttl_seconds: Optional[float] = 3600,
+                 clock=time.time):
+        """
+        Inicializa la caché semántica.
+
+        Args:
+            threshold: Similitud coseno mínima (0-1) para reutilizar una respuesta
+            max_entries: Número máximo de respuestas (se reemplazan las más antiguas)
+            dimensions: Dimensiones de los vectores
+            ttl_seconds: Segundos de validez de cada respuesta. None
+                        desactiva la expiración.
+            clock: Función que retorna el tiempo actual en segundos
+
+        Raises:
+            ImportError: Si numpy no está instalado
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(
+                "NumPy no está instalado. Ejecuta: pip install numpy\n"
+                "O desactiva la caché semántica en CHATBOT_CONFIG['semantic_cache']"
+            )
+        if max_entries < 1:
+            raise ValueError("max_entries debe ser mayor que cero")
+        self._np = numpy
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._vectors = numpy.zeros((max_entries, dimensions), dtype=numpy.float32)
+        self._created = numpy.full(max_entries, -numpy.inf)
+        self._signatures = numpy.zeros(max_entries, dtype=numpy.uint64)
+        self._namespace_ids = numpy.full(max_entries, -1, dtype=numpy.int64)
+        self._namespaces = {}
+        self._responses = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def embed(self, query: str):
+        """
+        Calcula el vector normalizado de una consulta.
+
+        Combina la raíz de cada palabra (sin palabras vacías y con los
+        sinónimos unificados) y, con menos peso, sus trigramas de caracteres,
+        proyectados con hashing firmado.
+
+        Args:
+            query: La consulta del usuario
+
+        Returns:
+            numpy.ndarray: Vector de norma 1 (o nulo si no hay términos)
+        """
+        return self._encode(query)[0]
+
+    def _encode(self, query: str):
+        """Retorna (vector, firma de los números y versiones de la consulta)."""
+        np = self._np
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        numbers = set()
+        for word in normalize_query(query).split():
+            if any(char.isdigit() for char in word):
+                numbers.add(word)
+            if word in STOPWORDS:
+                continue
+            stem = _stem(word)
+            padded = f"<{stem}>"
+            trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+            weight = 0.3 / len(trigrams) ** 0.5
+            for feature, value in [(stem, 1.0)] + [(trigram, weight) for trigram in trigrams]:
+                h = _stable_hash(feature)
+                vector[h % self.dimensions] += value if (h >> 32) & 1 else -value
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        signature = _stable_hash("\0".join(sorted(numbers))) if numbers else 0
+        return vector, signature
+
+    def _namespace_id(self, namespace: str) -> int:
+        # Se llama con el cerrojo tomado
+        return self._namespaces.setdefault(namespace, len(self._namespaces))
+
+    def _scores(self, vectors, signatures, namespace: str):
+        """Similitud de cada vector con todas las entradas vigentes."""
+        np = self._np
+        size = self._size
+        scores = vectors @ self._vectors[:size].T
+        valid = self._namespace_ids[:size] == self._namespaces.get(namespace, -2)
+        if self.ttl_seconds is not None:
+            valid &= self._created[:size] > self._clock() - self.ttl_seconds
+        scores[:, ~valid] = -np.inf
+        # Con números o versiones distintos nunca hay coincidencia
+        scores[signatures[:, None] != self._signatures[:size][None, :]] = -np.inf
+        return scores
+
+    def get_many(self, queries: list[str], namespace: str = "") -> list[Optional[str]]:
+        """
+        Busca respuestas para varias consultas con un único producto matricial.
+
+        Args:
+            queries: Consultas del usuario
+            namespace: Espacio de nombres (modelo y prompt) de las respuestas
+
+        Returns:
+            list: Respuesta reutilizable para cada consulta, o None
+        """
+        if not queries:
+            return []
+        np = self._np
+        encoded = [self._encode(query) for query in queries]
+        vectors = np.stack([vector for vector, _ in encoded])
+        signatures = np.array([signature for _, signature in encoded], dtype=np.uint64)
+        results = [None] * len(queries)
+        with self._lock:
+            if self._size:
+                scores = self._scores(vectors, signatures, namespace)
+                best = scores.argmax(axis=1)
+                for i, index in enumerate(best):
+                    if scores[i, index] >= self.threshold:
+                        results[i] = self._responses[index]
+            found = sum(result is not None for result in results)
+            self.hits += found
+            self.misses += len(queries) - found
+        return results
+
+    def get(self, query: str, namespace: str = "") -> Optional[str]:
+        """
+        Busca la respuesta de una consulta parecida.
+
+        Args:
+            query: La consulta del usuario
+            namespace: Espacio de nombres (modelo y prompt) de las respuestas
+
+        Returns:
+            str: Respuesta reutilizable, o None si ninguna supera el umbral
+        """
+        return self.get_many([query], namespace)[0]
+
+    def put(self, query: str, response: str, namespace: str = ""):
+        """
+        Guarda una respuesta.
+
+        Args:
+            query: La consulta del usuario
+            response: Respuesta del LLM
+            namespace: Espacio de nombres (modelo y prompt) de la respuesta
+        """
+        vector, signature = self._encode(query)
+        if not vector.any():
+            return
+        with self._lock:
+            index = self._next
+            self._vectors[index] = vector
+            self._created[index] = self._clock()
+            self._signatures[index] = signature
+            self._namespace_ids[index] = self._namespace_id(namespace)
+            self._responses[index] = response
+            self._next = (index + 1) % self.max_entries
+            self._size = max(self._size, index + 1)
+
+    def clear(self):
+        """Vacía la caché."""
+        with self._lock:
+            self._created[:] = -self._np.inf
+            self._namespace_ids[:] = -1
+            self._namespaces = {}
+            self._responses = [None] * self.max_entries
+            self._size = 0
+            self._next = 0
+
+    def stats(self) -> dict:
+        """Retorna los contadores de aciertos y fallos."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def create_response_cache(config: dict = CHATBOT_CONFIG) -> Optional[ResponseCache]:
+    """
+    Crea la caché de respuestas según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        ResponseCache: Caché configurada, o None si está desactivada
+    """
+    settings = config.get("cache", {})
+    if not settings.get("enabled", True):
+        return None
+    return ResponseCache(
+        max_entries=settings.get("max_entries", 1000),
+        ttl_seconds=settings.get("ttl_seconds", 3600),
+        path=settings.get("path"),
+    )
+
+
+def create_semantic_cache(config: dict = CHATBOT_CONFIG) -> Optional[SemanticCache]:
+    """
+    Crea la caché semántica según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        SemanticCache: Caché configurada, o None si está desactivada
+    """
+    settings = config.get("semantic_cache", {})
+    if not settings.get("enabled", False):
+        return None
+    return SemanticCache(
+        threshold=settings.get("threshold", 0.85),
+        max_entries=settings.get("max_entries", 5000),
+        dimensions=settings.get("dimensions", 1024),
+        ttl_seconds=settings.get("ttl_seconds", 3600),
+    )
@@ -5,18 +5,73 @@ Hades - Chatbot Especializado en Desarrollo de Software
 Implementación principal del chatbot Hades.
 """
 
-from hades_prompt import get_system_prompt, is_software_development_related
+from hades_matcher import TopicMatch
+from hades_providers import collect_usage, create_llm_integration
+from hades_resilience import with_resilience
+from hades_sessions import DEFAULT_SESSION, SessionStore, create_session_store
+from hades_context import ContextBuilder, create_context_builder
+from hades_conversations import ConversationLog, create_conversation_log
+from hades_reduce import InputReducer, create_input_reducer
+from hades_cache import (
+    ResponseCache, SemanticCache, create_response_cache, create_semantic_cache, normalize_query
+)
+from hades_singleflight import SingleFlight
+from hades_metrics import ERRORS_TOTAL, METRICS, QUERIES_TOTAL, VALIDATION_SECONDS
+from hades_tracing import span
+from hades_snapshot import EMPTY_QUERY_MESSAGE, current_snapshot, pinned
 from config import CHATBOT_CONFIG
-from typing import Optional, Callable
-import os
+from typing import Optional, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import time
+from time import perf_counter
+
+
+# Intenciones que se responden sin llamar al LLM
+INTENT_EMPTY = "empty"
+INTENT_OUT_OF_TOPIC = "out_of_topic"
+INTENT_GREETING = "greeting"
+INTENT_NO_LLM = "no_llm"
+
+# Resultado de la validación de cada intención (métrica hades_queries_total)
+INTENT_RESULTS = {
+    INTENT_EMPTY: "rejected",
+    INTENT_OUT_OF_TOPIC: "rejected",
+    INTENT_GREETING: "greeting",
+    INTENT_NO_LLM: "valid",
+    None: "valid",
+}
+
+# Valor por defecto del argumento ``intent``: la consulta aún no se ha clasificado
+UNCLASSIFIED = object()
+
+def _error_message(error: Exception) -> str:
+    """Mensaje mostrado al usuario cuando falla el LLM."""
+    ERRORS_TOTAL.inc(type(error).__name__)
+    return (
+        f"Error al procesar tu pregunta: {str(error)}\n"
+        "Por favor, inténtalo de nuevo o reformula tu pregunta."
+    )
 
 
 class HadesChatbot:
     """
     Chatbot especializado en desarrollo de software.
+    
+    El prompt, el clasificador y las respuestas predefinidas se leen de la
+    instantánea de configuración vigente (hades_snapshot), que se puede
+    recargar en caliente; cada consulta usa una misma instantánea de
+    principio a fin.
     """
     
-    def __init__(self, llm_callback: Optional[Callable[[str], str]] = None):
+    def __init__(self, llm_callback: Optional[Callable[[str], str]] = None,
+                 session_store: Optional[SessionStore] = None,
+                 cache: Optional[ResponseCache] = None,
+                 semantic_cache: Optional[SemanticCache] = None,
+                 context_builder: Optional[ContextBuilder] = None,
+                 conversation_log: Optional[ConversationLog] = None,
+                 input_reducer: Optional[InputReducer] = None,
+                 config: dict = CHATBOT_CONFIG):
         """
         Inicializa el chatbot con su prompt del sistema.
         
@@ -24,13 +79,59 @@ class HadesChatbot:
             llm_callback: Función opcional que recibe el mensaje del usuario
                          y retorna la respuesta del LLM. Si no se proporciona,
                          el chatbot solo validará las queries.
+            session_store: Almacén opcional del historial por sesión. Si no
+                          se proporciona, se crea uno según CHATBOT_CONFIG.
+            cache: Caché opcional de respuestas. Si no se proporciona, se
+                  crea una según CHATBOT_CONFIG["cache"].
+            semantic_cache: Caché opcional para consultas parecidas. Si no se
+                           proporciona, se crea según
+                           CHATBOT_CONFIG["semantic_cache"] (desactivada por
+                           defecto).
+            context_builder: Constructor opcional del historial enviado al
+                            LLM. Si no se proporciona, se crea según
+                            CHATBOT_CONFIG["context"].
+            conversation_log: Registro persistente opcional de los
+                             intercambios. Si no se proporciona, se crea según
+                             CHATBOT_CONFIG["conversation_log"] (desactivado
+                             por defecto).
+            input_reducer: Reductor opcional de las consultas largas antes
+                          de enviarlas al LLM. Si no se proporciona, se crea
+                          según CHATBOT_CONFIG["input_reduction"].
+            config: Diccionario de configuración con el que se crean los
+                   componentes no proporcionados (por defecto CHATBOT_CONFIG)
         """
-        self.system_prompt = get_system_prompt()
-        self.config = CHATBOT_CONFIG
+        self.config = config
         self.name = self.config["name"]
-        self.conversation_history = []
+        self.sessions = session_store or create_session_store(self.config)
+        self.cache = cache if cache is not None else create_response_cache(self.config)
+        self.semantic_cache = (semantic_cache if semantic_cache is not None
+                               else create_semantic_cache(self.config))
+        self.context_builder = context_builder or create_context_builder(self.config)
+        self.conversation_log = (conversation_log if conversation_log is not None
+                                 else create_conversation_log(self.config))
+        self.flights = (SingleFlight()
+                        if self.config.get("coalescing", {}).get("enabled", True) else None)
+        self.input_reducer = (input_reducer if input_reducer is not None
+                              else create_input_reducer(self.config))
         self.llm_callback = llm_callback
     
+    @property
+    def system_prompt(self) -> str:
+        return current_snapshot().system_prompt
+    
+    @property
+    def prompt_hash(self) -> str:
+        return current_snapshot().prompt_hash
+    
+    @property
+    def matcher(self):
+        return current_snapshot().matcher
+    
+    @property
+    def canned_responses(self):
+        """Respuestas predefinidas por intención."""
+        return current_snapshot().responses
+    
     def get_system_prompt(self) -> str:
         """
         Retorna el prompt del sistema.
@@ -40,6 +141,28 @@ class HadesChatbot:
         """
         return self.system_prompt
     
+    @property
+    def conversation_history(self) -> list[dict]:
+        """
+        Historial de la sesión por defecto.
+        
+        Returns:
+            list: Mensajes en formato {"role": ..., "content": ...}
+        """
+        return self.get_history()
+    
+    def get_history(self, session_id: str = DEFAULT_SESSION) -> list[dict]:
+        """
+        Retorna el historial de una sesión.
+        
+        Args:
+            session_id: Identificador de la sesión
+            
+        Returns:
+            list: Mensajes en formato {"role": ..., "content": ...}
+        """
+        return [turn.as_dict() for turn in self._session_turns(session_id)]
+    
     def validate_query(self, query: str) -> tuple[bool, str]:
         """
         Valida si una consulta está dentro del ámbito de desarrollo de software.
@@ -50,21 +173,60 @@ class HadesChatbot:
         Returns:
             tuple: (es_válida, mensaje)
         """
+        is_valid, validation_message, _ = self._classify_query(query)
+        return is_valid, validation_message
+    
+    def _classify_query(self, query: str) -> tuple[bool, str, Optional[TopicMatch]]:
+        """
+        Valida y clasifica una consulta en una sola pasada.
+        
+        Args:
+            query: La consulta del usuario
+            
+        Returns:
+            tuple: (es_válida, mensaje, término reconocido)
+        """
         if not query or not query.strip():
-            return False, "Por favor, proporciona una pregunta válida."
+            return False, EMPTY_QUERY_MESSAGE, None
         
-        query_lower = query.lower().strip()
+        match = self.matcher.classify(query)
+        if match is None:
+            return False, current_snapshot().responses[INTENT_OUT_OF_TOPIC], None
         
-        # Verificar si es un saludo
-        greetings = ["hola", "hi", "hello", "buenos días", "buenas tardes", "buenas noches"]
-        if any(greeting in query_lower for greeting in greetings):
-            return True, None
+        return True, None, match
+    
+    def classify_intent(self, query: str) -> Optional[str]:
+        """
+        Determina en una sola pasada si una consulta tiene respuesta predefinida.
+        
+        Args:
+            query: La consulta del usuario
+            
+        Returns:
+            str: Intención (clave de canned_responses), o None si la
+                 consulta debe ir al LLM
+        """
+        if not METRICS.enabled:
+            return self._match_intent(query)
+        started = perf_counter()
+        intent = self._match_intent(query)
+        VALIDATION_SECONDS.observe(perf_counter() - started)
+        QUERIES_TOTAL.inc(INTENT_RESULTS[intent])
+        return intent
+    
+    def _match_intent(self, query: str) -> Optional[str]:
+        """Clasificación de classify_intent, sin métricas."""
+        if not query or query.isspace():
+            return INTENT_EMPTY
         
-        # Validar si está relacionada con desarrollo de software
-        if is_software_development_related(query):
-            return True, None
-        else:
-            return False, self.config["responses"]["out_of_topic"]
+        match = self.matcher.classify(query)
+        if match is None:
+            return INTENT_OUT_OF_TOPIC
+        if match.is_greeting:
+            return INTENT_GREETING
+        if not self.llm_callback:
+            return INTENT_NO_LLM
+        return None
     
     def format_response(self, response: str, include_code: bool = False, 
                        code_example: str = None) -> str:
@@ -86,58 +248,383 @@ class HadesChatbot:
         
         return formatted
     
-    def handle_query(self, query: str) -> str:
+    @pinned
+    def handle_query(self, query: str, session_id: str = DEFAULT_SESSION,
+                     metadata: Optional[dict] = None, intent=UNCLASSIFIED) -> str:
         """
         Procesa una consulta del usuario y retorna la respuesta.
         
         Args:
             query: La consulta del usuario
+            session_id: Identificador de la sesión de conversación
+            metadata: Diccionario opcional donde se añade, en "input", el
+                     tamaño original y reducido de la consulta (solo si
+                     llega al LLM) y, en "usage", los tokens de la llamada
+                     al LLM, incluidos los leídos de la caché de prompts
+                     (solo si el proveedor los informa)
+            intent: Intención ya calculada con classify_intent (None si la
+                   consulta va al LLM); si se omite, se clasifica aquí
             
         Returns:
             str: La respuesta del chatbot
         """
-        # Validar la consulta
-        is_valid, validation_message = self.validate_query(query)
-        
-        if not is_valid:
-            return validation_message
-        
-        # Si es un saludo, responder con el mensaje de bienvenida
-        query_lower = query.lower().strip()
-        greetings = ["hola", "hi", "hello", "buenos días", "buenas tardes", "buenas noches"]
-        if any(greeting in query_lower for greeting in greetings):
-            return self.config["responses"]["greeting"]
-        
-        # Si hay un callback de LLM configurado, usarlo
-        if self.llm_callback:
-            try:
-                response = self.llm_callback(query)
-                # Guardar en historial
-                self.conversation_history.append({"role": "user", "content": query})
-                self.conversation_history.append({"role": "assistant", "content": response})
-                return response
-            except Exception as e:
-                return (
-                    f"Error al procesar tu pregunta: {str(e)}\n"
-                    "Por favor, inténtalo de nuevo o reformula tu pregunta."
-                )
-        
-        # Si no hay LLM configurado, informar al usuario
-        return (
-            "✅ Tu pregunta ha sido validada y está dentro del ámbito de desarrollo de software.\n\n"
-            "Para recibir una respuesta completa, necesitas configurar un proveedor de LLM.\n\n"
-            "Puedes usar el prompt del sistema en 'hades_prompt.py' o 'hades_prompt.txt' "
-            "con cualquier API de LLM (OpenAI, Claude, etc.).\n\n"
-            "Consulta 'example_integration.py' para ver ejemplos de integración."
-        )
-    
-    def reset_conversation(self):
-        """Reinicia el historial de conversación."""
-        self.conversation_history = []
+        # Respuestas que no necesitan al LLM (validación, saludo, sin LLM)
+        canned = self._precheck(query, intent)
+        if canned is not None:
+            return canned
+        
+        query = self._reduce(query, metadata)
+        llm_kwargs, cache_key, cached = self._prepare(query, session_id)
+        if cached is not None:
+            self._record(session_id, query, cached)
+            return cached
+        
+        try:
+            with collect_usage() as usage:
+                response = self._call_llm(query, llm_kwargs)
+        except Exception as e:
+            return _error_message(e)
+        self._add_usage(metadata, usage)
+        
+        # Guardar en historial y en caché
+        self._remember(session_id, query, response, cache_key, cacheable=not llm_kwargs)
+        return response
+    
+    @pinned
+    def handle_query_stream(self, query: str, session_id: str = DEFAULT_SESSION,
+                            metadata: Optional[dict] = None,
+                            intent=UNCLASSIFIED) -> Iterator[str]:
+        """
+        Procesa una consulta y genera la respuesta por fragmentos.
+        
+        Si el callback de LLM expone un atributo ``stream`` (una función que
+        recibe la consulta y retorna un iterable de fragmentos de texto), los
+        fragmentos se emiten a medida que llegan. En caso contrario se emite
+        la respuesta completa en un único fragmento.
+        
+        Args:
+            query: La consulta del usuario
+            session_id: Identificador de la sesión de conversación
+            metadata: Diccionario opcional para el tamaño de la consulta y
+                     el uso de tokens (ver handle_query); el uso se añade
+                     al terminar el stream
+            intent: Intención ya calculada (ver handle_query)
+            
+        Yields:
+            str: Fragmentos de la respuesta del chatbot
+        """
+        canned = self._precheck(query, intent)
+        if canned is not None:
+            yield canned
+            return
+        
+        stream = getattr(self.llm_callback, "stream", None)
+        if stream is None:
+            yield self.handle_query(query, session_id=session_id, metadata=metadata,
+                                    intent=None)
+            return
+        
+        query = self._reduce(query, metadata)
+        llm_kwargs, cache_key, cached = self._prepare(query, session_id)
+        if cached is not None:
+            self._record(session_id, query, cached)
+            yield cached
+            return
+        
+        chunks = []
+        try:
+            with span("stream", model=getattr(self.llm_callback, "model", "")), \
+                    collect_usage() as usage:
+                for chunk in stream(query, **llm_kwargs):
+                    if chunk:
+                        chunks.append(chunk)
+                        yield chunk
+        except Exception as e:
+            yield _error_message(e)
+            return
+        self._add_usage(metadata, usage)
+        
+        # Guardar en historial y en caché solo las respuestas completas
+        self._remember(session_id, query, "".join(chunks), cache_key,
+                       cacheable=not llm_kwargs)
+    
+    @pinned
+    def handle_batch(self, queries: list[str], max_concurrency: Optional[int] = None,
+                     errors: Optional[dict] = None) -> list[str]:
+        """
+        Procesa varias consultas independientes y retorna sus respuestas.
+        
+        Primero se validan todas las consultas y se resuelven las que están
+        en caché (la caché semántica se consulta con un único producto
+        matricial); después las restantes se envían al LLM con concurrencia
+        limitada, conservando la prioridad fijada con
+        hades_scheduler.scheduling(). Las consultas de un lote no usan ni
+        modifican el historial de ninguna sesión.
+        
+        Args:
+            queries: Consultas del usuario
+            max_concurrency: Llamadas simultáneas al LLM (por defecto
+                            CHATBOT_CONFIG["batch"]["max_concurrency"])
+            errors: Diccionario opcional donde se guarda, por índice, el
+                   error de las consultas cuya llamada al LLM falló (su
+                   respuesta es el mensaje de error para el usuario)
+            
+        Returns:
+            list: Respuestas en el mismo orden que las consultas
+        """
+        results, misses = self._batch_precheck(queries)
+        if not misses:
+            return results
+        
+        workers = max_concurrency or self.config.get("batch", {}).get("max_concurrency", 8)
+        with ThreadPoolExecutor(max_workers=min(workers, len(misses))) as executor:
+            # Cada tarea lleva una copia del contexto (prioridad, traza)
+            futures = [
+                executor.submit(contextvars.copy_context().run,
+                                self._answer_uncached, query, key)
+                for _, query, key in misses
+            ]
+            for (index, _, _), future in zip(misses, futures):
+                results[index], error = future.result()
+                if error is not None and errors is not None:
+                    errors[index] = error
+        return results
+    
+    def _batch_precheck(self, queries: list[str]) -> tuple[list, list]:
+        """
+        Resuelve las consultas de un lote que no necesitan al LLM.
+        
+        Returns:
+            tuple: (respuestas con None en las pendientes,
+                   lista de (índice, consulta reducida, clave de caché)
+                   pendientes)
+        """
+        results = [None] * len(queries)
+        misses = []
+        model = getattr(self.llm_callback, "model", "")
+        for index, query in enumerate(queries):
+            canned = self._precheck(query)
+            if canned is not None:
+                results[index] = canned
+                continue
+            query = self._reduce(query)
+            key = None
+            if self.cache is not None:
+                key = self.cache.make_key(query, model, self.prompt_hash)
+                results[index] = self.cache.get(key)
+            if results[index] is None:
+                misses.append((index, query, key))
+        
+        if misses and self.semantic_cache is not None:
+            found = self.semantic_cache.get_many(
+                [query for _, query, _ in misses], f"{model}:{self.prompt_hash}"
+            )
+            remaining = []
+            for (index, query, key), cached in zip(misses, found):
+                if cached is None:
+                    remaining.append((index, query, key))
+                    continue
+                results[index] = cached
+                if key is not None:
+                    self.cache.put(key, cached)
+            misses = remaining
+        return results, misses
+    
+    def _answer_uncached(self, query: str, cache_key: Optional[str]
+                         ) -> tuple[str, Optional[str]]:
+        """
+        Llama al LLM para una consulta de un lote y guarda la respuesta en caché.
+        
+        Returns:
+            tuple: (respuesta o mensaje de error, error o None si hubo respuesta)
+        """
+        try:
+            response = self._call_llm(query, {})
+        except Exception as e:
+            return _error_message(e), str(e) or type(e).__name__
+        self._remember(None, query, response, cache_key)
+        return response, None
+    
+    def _reduce(self, query: str, metadata: Optional[dict] = None) -> str:
+        """
+        Reduce una consulta validada antes de enviarla al LLM (ver hades_reduce).
+        
+        Args:
+            query: La consulta del usuario
+            metadata: Diccionario opcional donde se guarda, en "input", el
+                     tamaño original y reducido
+            
+        Returns:
+            str: Consulta reducida (la misma si es corta)
+        """
+        if self.input_reducer is None:
+            return query
+        with span("reduce_input") as current:
+            reduction = self.input_reducer.reduce(query)
+            if current is not None:
+                current.attributes["original_tokens"] = reduction.original_tokens
+                current.attributes["reduced_tokens"] = reduction.reduced_tokens
+        if metadata is not None:
+            metadata["input"] = reduction.info()
+        return reduction.text
+    
+    @staticmethod
+    def _add_usage(metadata: Optional[dict], usage: dict):
+        """Guarda en los metadatos, en "usage", los tokens de la llamada al LLM."""
+        if metadata is not None and usage:
+            metadata["usage"] = dict(usage)
+    
+    def _prepare(self, query: str, session_id: str) -> tuple[dict, Optional[str], Optional[str]]:
+        """
+        Prepara la llamada al LLM: construye el contexto y consulta las cachés.
+        
+        Las respuestas que dependen del historial de la sesión no se buscan
+        ni se guardan en caché.
+        
+        Args:
+            query: La consulta del usuario
+            session_id: Identificador de la sesión de conversación
+            
+        Returns:
+            tuple: (argumentos extra del callback, clave de caché,
+                   respuesta almacenada o None)
+        """
+        with span("build_context") as current:
+            history = self._build_context(session_id)
+            if current is not None:
+                current.attributes["messages"] = len(history)
+        if history:
+            return {"history": history}, None, None
+        with span("cache_lookup") as current:
+            cache_key, cached = self._lookup_cache(query)
+            if current is not None:
+                current.attributes["hit"] = cached is not None
+        return {}, cache_key, cached
+    
+    def _call_llm(self, query: str, llm_kwargs: dict) -> str:
+        """
+        Llama al LLM agrupando las consultas idénticas que estén en curso.
+        
+        Las consultas con historial no se agrupan: su respuesta depende de
+        la sesión.
+        """
+        with span("llm", model=getattr(self.llm_callback, "model", "")):
+            if self.flights is None or llm_kwargs:
+                return self.llm_callback(query, **llm_kwargs)
+            return self.flights.do(self._flight_key(query),
+                                   lambda: self.llm_callback(query))
+    
+    def _flight_key(self, query: str) -> str:
+        """Clave de agrupación: modelo, prompt y consulta normalizada."""
+        model = getattr(self.llm_callback, "model", "")
+        return f"{model}\0{self.prompt_hash}\0{normalize_query(query)}"
+    
+    def _build_context(self, session_id: str) -> list[dict]:
+        """
+        Mensajes previos de la sesión que caben en el presupuesto de tokens.
+        
+        Solo se construyen si el callback declara ``supports_history``.
+        """
+        if not getattr(self.llm_callback, "supports_history", False):
+            return []
+        return self.context_builder.build(self._session_turns(session_id))
+    
+    def _session_turns(self, session_id: str) -> list:
+        """
+        Historial en memoria de una sesión.
+        
+        Si la sesión no está en memoria (p. ej. tras un reinicio) pero sí en
+        el registro de conversaciones, se recuperan sus últimos turnos. Solo
+        se recuperan los posteriores al último reinicio de la sesión y los
+        que aún no habrían expirado por inactividad.
+        """
+        turns = self.sessions.get(session_id)
+        if turns or self.conversation_log is None:
+            return turns
+        ttl = self.sessions.ttl_seconds
+        since = time.time() - ttl if ttl is not None else None
+        for record in self.conversation_log.tail(session_id, self.sessions.max_messages // 2,
+                                                 since):
+            self.sessions.append_exchange(session_id, record["query"], record["response"])
+        return self.sessions.get(session_id)
+    
+    def _lookup_cache(self, query: str) -> tuple[Optional[str], Optional[str]]:
+        """
+        Busca la respuesta de una consulta en la caché exacta y, si no está,
+        en la caché semántica.
+        
+        Args:
+            query: La consulta del usuario
+            
+        Returns:
+            tuple: (clave de caché, respuesta almacenada o None)
+        """
+        model = getattr(self.llm_callback, "model", "")
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(query, model, self.prompt_hash)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return key, cached
+        
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.get(query, f"{model}:{self.prompt_hash}")
+            if cached is not None:
+                if key is not None:
+                    self.cache.put(key, cached)
+                return key, cached
+        
+        return key, None
+    
+    def _remember(self, session_id: Optional[str], query: str, response: str,
+                  cache_key: Optional[str] = None, cacheable: bool = True):
+        """Guarda un intercambio en el historial y, si procede, en las cachés."""
+        if session_id is not None:
+            self._record(session_id, query, response)
+        if not response or not cacheable:
+            return
+        if cache_key is not None:
+            self.cache.put(cache_key, response)
+        if self.semantic_cache is not None:
+            model = getattr(self.llm_callback, "model", "")
+            self.semantic_cache.put(query, response, f"{model}:{self.prompt_hash}")
+    
+    def _record(self, session_id: str, query: str, response: str):
+        """Añade un intercambio al historial de la sesión y al registro persistente."""
+        self.sessions.append_exchange(session_id, query, response)
+        if self.conversation_log is not None:
+            self.conversation_log.append(session_id, query, response)
+    
+    def _precheck(self, query: str, intent=UNCLASSIFIED) -> Optional[str]:
+        """
+        Resuelve las consultas que no requieren al LLM.
+        
+        Args:
+            query: La consulta del usuario
+            intent: Intención ya calculada, o UNCLASSIFIED para clasificarla
+            
+        Returns:
+            str: Respuesta predefinida, o None si la consulta debe ir al LLM
+        """
+        if intent is UNCLASSIFIED:
+            with span("validate") as current:
+                intent = self.classify_intent(query)
+                if current is not None:
+                    current.attributes["intent"] = intent or "llm"
+        if intent is None:
+            return None
+        return self.canned_responses[intent]
+    
+    def reset_conversation(self, session_id: str = DEFAULT_SESSION):
+        """Reinicia el historial de conversación de una sesión."""
+        self.sessions.clear(session_id)
+        if self.conversation_log is not None:
+            self.conversation_log.reset(session_id)
 
 
 # Función de utilidad para uso directo
-def create_hades_instance(llm_callback: Optional[Callable[[str], str]] = None):
+def create_hades_instance(llm_callback: Optional[Callable[[str], str]] = None,
+                          config: dict = CHATBOT_CONFIG):
     """
     Crea una instancia del chatbot Hades.
     
@@ -145,67 +632,35 @@ def create_hades_instance(llm_callback: Optional[Callable[[str], str]] = None):
         llm_callback: Función opcional para integrar con un LLM.
                      Debe recibir el mensaje del usuario y retornar
                      la respuesta del LLM.
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
     
     Returns:
         HadesChatbot: Instancia configurada del chatbot
     """
-    return HadesChatbot(llm_callback=llm_callback)
+    return HadesChatbot(llm_callback=llm_callback, config=config)
 
 
-def create_openai_integration(api_key: Optional[str] = None):
+def create_openai_integration(api_key: Optional[str] = None, model: str = "gpt-4"):
     """
     Crea una función de callback para integrar con OpenAI.
     
+    El cliente de OpenAI se comparte entre todas las integraciones del
+    proceso (ver hades_providers.create_llm_integration) y las llamadas
+    llevan plazo, reintentos y circuit breaker (ver hades_resilience).
+    
     Args:
         api_key: API key de OpenAI. Si no se proporciona, se intenta
                 obtener de la variable de entorno OPENAI_API_KEY.
+        model: Modelo por defecto (gpt-4, gpt-3.5-turbo, etc.)
     
     Returns:
-        Callable: Función callback para usar con HadesChatbot
+        Callable: Función callback para usar con HadesChatbot. Su atributo
+                 ``stream`` genera la respuesta por fragmentos.
         
     Raises:
         ImportError: Si openai no está instalado
     """
-    try:
-        from openai import OpenAI
-    except ImportError:
-        raise ImportError(
-            "OpenAI no está instalado. Ejecuta: pip install openai\n"
-            "Luego configura tu API key con: export OPENAI_API_KEY='tu-key'"
-        )
-    
-    api_key = api_key or os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError(
-            "Se requiere una API key de OpenAI. "
-            "Pásala como argumento o configura la variable de entorno OPENAI_API_KEY"
-        )
-    
-    client = OpenAI(api_key=api_key)
-    
-    def llm_callback(user_query: str, model: str = "gpt-4") -> str:
-        """
-        Callback para enviar queries a OpenAI.
-        
-        Args:
-            user_query: La pregunta del usuario
-            model: Modelo a usar (gpt-4, gpt-3.5-turbo, etc.)
-        
-        Returns:
-            str: Respuesta del modelo
-        """
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": get_system_prompt()},
-                {"role": "user", "content": user_query}
-            ],
-            temperature=0.7,
-            max_tokens=1500
-        )
-        return response.choices[0].message.content
-    
-    return llm_callback
+    return with_resilience(create_llm_integration("openai", api_key=api_key, model=model))
 
 
 if __name__ == "__main__":
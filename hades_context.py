@@ -0,0 +1,159 @@
+"""
+Construcción del contexto de conversación para Hades
+====================================================
+
+Arma la lista de mensajes previos que se envía al LLM sin superar un
+presupuesto de tokens. Los mensajes más antiguos que no caben se descartan
+y se resumen en una sola línea. El número de tokens de cada mensaje se
+calcula una única vez y se guarda en el propio mensaje, así que cada
+petición solo tokeniza el turno nuevo.
+"""
+
+from hades_sessions import Turn
+from config import CHATBOT_CONFIG
+from typing import Callable, Optional
+
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Cuenta los tokens de un texto.
+
+    Usa tiktoken (cl100k_base) si está instalado; si no, aproxima con
+    cuatro caracteres por token.
+
+    Args:
+        text: Texto a medir
+
+    Returns:
+        int: Número de tokens
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+class ContextBuilder:
+    """
+    Selecciona el historial reciente que cabe en un presupuesto de tokens.
+    """
+
+    # Tokens fijos que cada mensaje añade por su rol y delimitadores
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, max_tokens: int = 2000, summary_tokens: int = 200,
+                 counter: Callable[[str], int] = count_tokens):
+        """
+        Inicializa el constructor de contexto.
+
+        Args:
+            max_tokens: Presupuesto de tokens para el historial
+            summary_tokens: Tokens reservados para resumir los mensajes
+                           descartados (0 desactiva el resumen)
+            counter: Función que cuenta los tokens de un texto
+        """
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.counter = counter
+
+    def turn_tokens(self, turn: Turn) -> int:
+        """Tokens de un mensaje, calculados una sola vez."""
+        if turn.tokens is None:
+            turn.tokens = self.counter(turn.content) + self.MESSAGE_OVERHEAD
+        return turn.tokens
+
+    def build(self, turns: list[Turn]) -> list[dict]:
+        """
+        Construye los mensajes previos a enviar al LLM.
+
+        Se conservan los intercambios más recientes completos (pregunta y
+        respuesta) mientras quepan en el presupuesto.
+
+        Args:
+            turns: Historial de la sesión, del más antiguo al más reciente
+
+        Returns:
+            list: Mensajes en formato {"role": ..., "content": ...}
+        """
+        if not turns or self.max_tokens <= 0:
+            return []
+
+        total = sum(self.turn_tokens(turn) for turn in turns)
+        if total <= self.max_tokens:
+            return [turn.as_dict() for turn in turns]
+
+        budget = self.max_tokens - self.summary_tokens
+        used = 0
+        start = len(turns)
+        # Recorrer desde el final por intercambios (asistente + usuario)
+        while start > 0:
+            step = 2 if start >= 2 and turns[start - 1].role == "assistant" else 1
+            cost = sum(self.turn_tokens(turn) for turn in turns[start - step:start])
+            if used + cost > budget:
+                break
+            used += cost
+            start -= step
+
+        messages = []
+        summary = self.summarize(turns[:start])
+        if summary:
+            messages.append({"role": "system", "content": summary})
+        messages.extend(turn.as_dict() for turn in turns[start:])
+        return messages
+
+    def summarize(self, dropped: list[Turn]) -> Optional[str]:
+        """
+        Resume en una línea los mensajes descartados.
+
+        Conserva el inicio de las preguntas más recientes del usuario hasta
+        agotar summary_tokens.
+
+        Args:
+            dropped: Mensajes que no caben en el presupuesto
+
+        Returns:
+            str: Resumen, o None si no hay nada que resumir
+        """
+        if not dropped or self.summary_tokens <= 0:
+            return None
+        header = "Temas tratados antes en la conversación: "
+        budget = self.summary_tokens - self.counter(header) - self.MESSAGE_OVERHEAD
+        topics = []
+        for turn in reversed(dropped):
+            if turn.role != "user":
+                continue
+            topic = " ".join(turn.content.split())[:120]
+            cost = self.counter(topic) + 1
+            if cost > budget:
+                break
+            budget -= cost
+            topics.append(topic)
+        if not topics:
+            return None
+        return header + "; ".join(reversed(topics))
+
+
+def create_context_builder(config: dict = CHATBOT_CONFIG) -> ContextBuilder:
+    """
+    Crea el constructor de contexto según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        ContextBuilder: Constructor configurado
+    """
+    settings = config.get("context", {})
+    return ContextBuilder(
+        max_tokens=settings.get("max_tokens", 2000),
+        summary_tokens=settings.get("summary_tokens", 200),
+    )
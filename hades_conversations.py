@@ -0,0 +1,424 @@
+"""
+Registro persistente de conversaciones para Hades
+=================================================
+
+Guarda cada intercambio (pregunta + respuesta) en un archivo JSONL de solo
+añadido, sin poner la latencia del disco en la petición:
+
+- append() solo encola el intercambio. Un hilo escritor vacía la cola por
+  lotes (group commit): una escritura por lote y un fsync como mucho cada
+  ``fsync_interval`` segundos.
+- La cola está acotada: si el disco no da abasto, append() espera hasta
+  ``put_timeout`` segundos y después descarta el intercambio (se cuenta en
+  stats()), de modo que el servidor nunca se queda sin memoria.
+- Un índice en memoria guarda, por sesión, la posición y longitud de cada
+  línea, así que leer una página del historial son unas pocas lecturas
+  directas en lugar de recorrer el archivo. El índice se reconstruye al
+  abrir el archivo y, antes de cada lectura, incorpora las líneas que se
+  han añadido al final desde la última vez.
+- El índice guarda como mucho ``max_sessions`` sesiones: cuando se llena,
+  se olvidan las que llevan más tiempo sin intercambios nuevos (sus líneas
+  siguen en el archivo).
+- reset() añade una marca de reinicio: los intercambios anteriores de la
+  sesión siguen en el archivo, pero dejan de formar parte de su historial.
+
+Varios procesos (los workers de serve.py) pueden compartir el archivo: cada
+lote se escribe con una sola escritura en modo append y cada proceso indexa
+también lo que añaden los demás, así que todos ven el historial completo.
+Una última línea incompleta solo se elimina al abrir el archivo si, con un
+bloqueo exclusivo, ningún otro proceso la está escribiendo.
+"""
+
+from config import CHATBOT_CONFIG
+from array import array
+from collections import OrderedDict
+from typing import Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueos, no se repara el archivo
+    fcntl = None
+
+
+logger = logging.getLogger("hades.conversations")
+
+# Marca que detiene el hilo escritor
+_STOP = object()
+
+# Registros abiertos, para rearrancar su escritor en los procesos hijos
+_logs = weakref.WeakSet()
+
+
+class ConversationLog:
+    """Registro de intercambios de solo añadido con escritor en segundo plano."""
+
+    def __init__(self, path: str, queue_size: int = 10000, batch_size: int = 256,
+                 fsync_interval: float = 1.0, put_timeout: float = 0.05,
+                 max_sessions: int = 100000):
+        """
+        Args:
+            path: Archivo JSONL del registro
+            queue_size: Intercambios pendientes de escribir como máximo
+            batch_size: Intercambios escritos por lote como máximo
+            fsync_interval: Segundos máximos entre fsync (0 = tras cada lote)
+            put_timeout: Segundos que append() espera si la cola está llena
+            max_sessions: Sesiones que se mantienen en el índice como máximo
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.put_timeout = put_timeout
+        self.max_sessions = max_sessions
+        self.dropped = 0
+        self.errors = 0
+        self.syncs = 0
+        self.evicted = 0
+        self._closed = False
+        self._index = OrderedDict()
+        self._index_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._file = open(path, "ab", buffering=0)
+        self._reader = open(path, "rb", buffering=0)
+        self._size = self._load_index()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._start_writer()
+        # Con gunicorn --preload el registro se abre en el maestro: cada
+        # worker necesita su propio hilo escritor (ver _after_fork)
+        _logs.add(self)
+
+    def _start_writer(self):
+        self._thread = threading.Thread(target=self._run, name="hades-conversations",
+                                        daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        if self._closed:
+            return
+        # Descriptores propios: la posición del archivo heredado es compartida
+        self._file.close()
+        self._reader.close()
+        self._file = open(self.path, "ab", buffering=0)
+        self._reader = open(self.path, "rb", buffering=0)
+        self._index_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._start_writer()
+
+    def _load_index(self) -> int:
+        """
+        Reconstruye el índice a partir del archivo existente.
+
+        Una última línea incompleta puede ser un intercambio que otro proceso
+        está escribiendo, o los restos de un proceso que terminó a medias.
+        Solo se trunca con un bloqueo exclusivo del archivo, que espera a las
+        escrituras en curso (ver _write_safely); sin bloqueos se deja tal cual.
+
+        Returns:
+            int: Posición hasta la que se ha indexado
+        """
+        offset = self._index_from(0)
+        if fcntl is None or os.fstat(self._file.fileno()).st_size == offset:
+            return offset
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            # Con el bloqueo nadie escribe: lo que siga incompleto son restos
+            offset = self._index_from(offset)
+            if os.fstat(self._file.fileno()).st_size > offset:
+                logger.warning("Se descarta una línea incompleta al final de %s", self.path)
+                os.truncate(self.path, offset)
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        return offset
+
+    def _index_from(self, offset: int) -> int:
+        """Indexa las líneas completas desde ``offset``; retorna dónde termina la última."""
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._index_line(line, offset)
+                offset += len(line)
+        return offset
+
+    def _refresh(self):
+        """
+        Indexa las líneas añadidas al archivo desde la última lectura, por
+        este proceso o por otros. Una línea final incompleta (otro proceso
+        la está escribiendo) se deja para la siguiente vez.
+        """
+        with self._index_lock:
+            size = os.fstat(self._reader.fileno()).st_size
+            if size <= self._size:
+                return
+            with self._read_lock:
+                self._reader.seek(self._size)
+                data = self._reader.read(size - self._size)
+            start = 0
+            while True:
+                end = data.find(b"\n", start) + 1
+                if not end:
+                    break
+                self._index_line(data[start:end], self._size + start)
+                start = end
+            self._size += start
+
+    def _index_line(self, line: bytes, offset: int):
+        try:
+            record = json.loads(line)
+            session_id = record["session_id"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Línea inválida en %s (byte %d)", self.path, offset)
+            return
+        if record.get("reset"):
+            self._index.pop(session_id, None)
+        else:
+            self._index_record(session_id, offset, len(line))
+
+    def _index_record(self, session_id: str, offset: int, length: int):
+        entries = self._index.get(session_id)
+        if entries is None:
+            entries = self._index[session_id] = array("Q")
+            if len(self._index) > self.max_sessions:
+                # Se olvida la sesión con el intercambio más antiguo
+                self._index.popitem(last=False)
+                self.evicted += 1
+        else:
+            self._index.move_to_end(session_id)
+        entries.append(offset)
+        entries.append(length)
+
+    def append(self, session_id: str, query: str, response: str) -> bool:
+        """
+        Encola un intercambio para escribirlo en segundo plano.
+
+        Args:
+            session_id: Identificador de la sesión
+            query: Pregunta del usuario
+            response: Respuesta del asistente
+
+        Returns:
+            bool: False si la cola estaba llena y se descartó
+        """
+        try:
+            self._queue.put((session_id, time.time(), query, response),
+                            timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def reset(self, session_id: str) -> bool:
+        """
+        Reinicia el historial de una sesión.
+
+        La sesión se vacía de inmediato en el índice y se encola una marca
+        de reinicio para que también quede vacía al reconstruirlo.
+
+        Args:
+            session_id: Identificador de la sesión
+
+        Returns:
+            bool: False si la cola estaba llena y la marca se descartó
+        """
+        with self._index_lock:
+            self._index.pop(session_id, None)
+        return self.append(session_id, None, None)
+
+    def _run(self):
+        last_sync = time.monotonic()
+        unsynced = False
+        while True:
+            timeout = None
+            if unsynced:
+                timeout = max(0.0, self.fsync_interval - (time.monotonic() - last_sync))
+            try:
+                items = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                items = []
+            while items and items[-1] is not _STOP and len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = bool(items) and items[-1] is _STOP
+            batch = items[:-1] if stop else items
+            if batch:
+                self._write_safely(batch)
+                unsynced = True
+            if unsynced and (stop or time.monotonic() - last_sync >= self.fsync_interval):
+                self._sync_safely()
+                last_sync = time.monotonic()
+                unsynced = False
+            for _ in items:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_safely(self, batch: list[tuple]):
+        lines = []
+        for session_id, ts, query, response in batch:
+            record = {"session_id": session_id, "ts": round(ts, 3)}
+            if query is None:
+                record["reset"] = True
+            else:
+                record["query"] = query
+                record["response"] = response
+            lines.append((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        data = b"".join(lines)
+        try:
+            # Una sola escritura en modo append: otros procesos pueden estar
+            # añadiendo al mismo archivo. El bloqueo compartido no excluye a
+            # los demás escritores, solo a la reparación de _load_index
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_SH)
+            try:
+                written = self._file.write(data)
+                while written < len(data):
+                    written += self._file.write(data[written:])
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        except OSError as e:
+            self.errors += 1
+            logger.warning("No se pudieron guardar %d intercambios: %s", len(batch), e)
+            return
+        # El lote se indexa leyéndolo del archivo, junto con lo que hayan
+        # añadido otros procesos
+        self._refresh()
+
+    def _sync_safely(self):
+        try:
+            os.fsync(self._file.fileno())
+            self.syncs += 1
+        except OSError as e:
+            self.errors += 1
+            logger.warning("No se pudo sincronizar %s: %s", self.path, e)
+
+    def count(self, session_id: str) -> int:
+        """Retorna el número de intercambios guardados de una sesión."""
+        self._refresh()
+        with self._index_lock:
+            entries = self._index.get(session_id)
+            return len(entries) // 2 if entries is not None else 0
+
+    def read(self, session_id: str, offset: int = 0, limit: int = 50) -> tuple[int, list[dict]]:
+        """
+        Lee una página del historial de una sesión.
+
+        Los intercambios que aún están en la cola del escritor no aparecen.
+
+        Args:
+            session_id: Identificador de la sesión
+            offset: Índice del primer intercambio (0 es el más antiguo)
+            limit: Intercambios a leer como máximo
+
+        Returns:
+            tuple: (total de intercambios de la sesión, lista de
+                   {"ts", "query", "response"})
+        """
+        offset = max(0, offset)
+        self._refresh()
+        with self._index_lock:
+            entries = self._index.get(session_id)
+            if entries is None:
+                return 0, []
+            total = len(entries) // 2
+            positions = entries[2 * offset:2 * (offset + max(0, limit))]
+        records = []
+        with self._read_lock:
+            for i in range(0, len(positions), 2):
+                self._reader.seek(positions[i])
+                record = json.loads(self._reader.read(positions[i + 1]))
+                del record["session_id"]
+                records.append(record)
+        return total, records
+
+    def tail(self, session_id: str, limit: int, since: Optional[float] = None) -> list[dict]:
+        """
+        Retorna los ``limit`` intercambios más recientes de una sesión.
+
+        Args:
+            session_id: Identificador de la sesión
+            limit: Intercambios a leer como máximo
+            since: Si se indica, solo los intercambios posteriores a este
+                  instante (segundos desde epoch)
+        """
+        records = self.read(session_id, self.count(session_id) - limit, limit)[1]
+        if since is not None:
+            records = [record for record in records if record["ts"] >= since]
+        return records
+
+    def flush(self):
+        """Espera a que se escriban todos los intercambios encolados."""
+        self._queue.join()
+
+    def close(self, timeout: float = 5):
+        """Escribe lo pendiente, sincroniza y cierra el archivo."""
+        if self._closed or not self._thread.is_alive():
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._file.close()
+        self._reader.close()
+
+    def stats(self) -> dict:
+        with self._index_lock:
+            sessions = len(self._index)
+            records = sum(len(entries) for entries in self._index.values()) // 2
+            size = self._size
+        return {
+            "path": self.path,
+            "sessions": sessions,
+            "records": records,
+            "bytes": size,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "evicted": self.evicted,
+            "errors": self.errors,
+            "syncs": self.syncs,
+        }
+
+
+if hasattr(os, "register_at_fork"):
+    def _after_fork():
+        for log in list(_logs):
+            log._after_fork()
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def create_conversation_log(config: dict = CHATBOT_CONFIG) -> Optional[ConversationLog]:
+    """
+    Crea el registro de conversaciones según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        ConversationLog: Registro abierto, o None si está desactivado
+    """
+    settings = config.get("conversation_log", {})
+    if not settings.get("enabled", False):
+        return None
+    log = ConversationLog(
+        settings.get("path", "hades_conversations.jsonl"),
+        queue_size=settings.get("queue_size", 10000),
+        batch_size=settings.get("batch_size", 256),
+        fsync_interval=settings.get("fsync_interval", 1.0),
+        put_timeout=settings.get("put_timeout", 0.05),
+        max_sessions=settings.get("max_sessions", 100000),
+    )
+    atexit.register(log.close)
+    return log
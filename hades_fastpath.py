@@ -0,0 +1,57 @@
+"""
+Respuestas rápidas sin LLM para Hades
+=====================================
+
+Los saludos, las consultas fuera de tema y las demás respuestas predefinidas
+son siempre el mismo texto. La instantánea de configuración (hades_snapshot)
+las guarda ya serializadas a JSON, de modo que /api/chat puede responderlas
+con una clasificación y una concatenación de bytes, sin pasar por jsonify.
+
+Si lookup() no tiene respuesta, la consulta ya está clasificada: se pasa a
+handle_query con ``intent=None`` para no clasificarla otra vez.
+"""
+
+from hades_snapshot import current_snapshot, pinned
+from hades_tracing import span
+from typing import Optional
+import json
+import threading
+
+
+class FastPath:
+    """Respuestas JSON preserializadas por intención."""
+
+    def __init__(self, chatbot):
+        """
+        Args:
+            chatbot: Instancia de HadesChatbot
+        """
+        self.chatbot = chatbot
+        self.hits = 0
+        # Los hilos de un worker gthread comparten la instancia
+        self._lock = threading.Lock()
+
+    @pinned
+    def lookup(self, query: str, session_id: str) -> Optional[bytes]:
+        """
+        Retorna el cuerpo JSON de la respuesta si la consulta no necesita al LLM.
+
+        Args:
+            query: La consulta del usuario
+            session_id: Identificador de la sesión
+
+        Returns:
+            bytes: Cuerpo JSON listo para enviar, o None si la consulta
+                   debe ir al LLM (con ``handle_query(..., intent=None)``)
+        """
+        with span("validate") as current:
+            intent = self.chatbot.classify_intent(query)
+            if current is not None:
+                current.attributes["intent"] = intent or "llm"
+        if intent is None:
+            return None
+        with self._lock:
+            self.hits += 1
+        return b"".join((b'{"success": true, "response": ',
+                         current_snapshot().encoded_responses[intent],
+                         b', "session_id": ', json.dumps(session_id).encode("ascii"), b"}"))
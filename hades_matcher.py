@@ -0,0 +1,265 @@
+"""
+Clasificador de temas para Hades
+================================
+
+Reúne las palabras clave, saludos, lenguajes y tecnologías conocidas en un
+diccionario que se construye una sola vez. Las palabras clave genéricas se
+reconocen también en plural y con terminaciones verbales ("errores",
+"debugging"); los nombres de lenguajes y tecnologías solo tal cual, porque
+muchos son palabras corrientes en inglés ("go", "rust", "spring"). Clasificar una consulta consiste en separarla en palabras y
+buscarlas en el diccionario; los pocos términos de varias palabras o con
+símbolos ("base de datos", "C++", "Node.js") se comprueban aparte con una
+expresión regular pequeña, solo si aparece su primera palabra.
+
+Los textos largos (logs, trazas, volcados de código) se recorren por
+fragmentos: primero el principio, luego el final (donde suelen estar la
+pregunta y el error) y por último el centro, y la búsqueda termina en cuanto
+aparece un término técnico. Los saludos solo cuentan en las primeras
+caracteres de la consulta.
+"""
+
+import re
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from config import CHATBOT_CONFIG
+
+
+# Palabras clave genéricas de desarrollo de software
+GENERIC_KEYWORDS = (
+    "código", "programación", "desarrollo", "software", "aplicación",
+    "algoritmo", "función", "variable", "clase", "objeto", "base de datos",
+    "API", "framework", "librería", "biblioteca", "compilación", "error",
+    "bug", "debug", "test", "testing", "deploy",
+    "servidor", "cliente", "frontend", "backend", "fullstack", "móvil",
+)
+
+# Nombres de lenguajes y tecnologías entre las palabras clave
+NAME_KEYWORDS = (
+    "git", "docker", "sql", "javascript", "python", "java", "html", "css", "react",
+    "angular", "vue", "node", "express", "django", "flask", "spring"
+)
+
+# Palabras clave de desarrollo de software
+TOPIC_KEYWORDS = GENERIC_KEYWORDS + NAME_KEYWORDS
+
+# Saludos reconocidos
+GREETINGS = ("hola", "hi", "hello", "buenos días", "buenas tardes", "buenas noches")
+
+# Categorías en orden de prioridad: un saludo siempre tiene preferencia
+GREETING = "greeting"
+KEYWORD = "keyword"
+LANGUAGE = "language"
+TECHNOLOGY = "technology"
+
+# Caracteres iniciales de la consulta en los que se buscan saludos
+GREETING_CHARS = 48
+
+# Caracteres del principio y del final que se examinan primero, y del resto
+# de fragmentos al recorrer textos largos
+EDGE_CHARS = 256
+CHUNK_CHARS = 2048
+
+_WORD = re.compile(r"\w+")
+_SPACE = re.compile(r"\s")
+_UNACCENT = str.maketrans("áéíóúü", "aeiouu")
+
+# Terminaciones de plural y de verbos en inglés de las palabras clave
+# genéricas ("errores", "APIs", "tests", "debugging", "deployed")
+_SUFFIXES = ("s", "es")
+_VERB_SUFFIXES = ("ing", "ed", "er", "ers")
+
+
+class TopicMatch(NamedTuple):
+    """Resultado de clasificar una consulta."""
+
+    kind: str
+    term: str
+    start: int
+    end: int
+
+    @property
+    def is_greeting(self) -> bool:
+        return self.kind == GREETING
+
+
+def _inflections(term: str) -> set[str]:
+    """Formas de una palabra que se reconocen como el propio término."""
+    forms = {term}
+    forms.update(term + suffix for suffix in _SUFFIXES)
+    plain = term.translate(_UNACCENT)
+    if plain != term and term[-1] in "ns":
+        # "función" -> "funciones", "compilación" -> "compilaciones"
+        forms.add(plain + "es")
+    forms.update(term + suffix for suffix in _VERB_SUFFIXES)
+    if term[-1] not in "aeiouy":
+        # "debug" -> "debugging", "bug" -> "bugged"
+        forms.update(term + term[-1] + suffix for suffix in _VERB_SUFFIXES)
+    # También sin tilde: "codigo", "funcion"
+    forms.update([form.translate(_UNACCENT) for form in forms])
+    return forms
+
+
+class _Vocabulary:
+    """
+    Formas de una o varias categorías, con los términos compuestos aparte.
+
+    Cada grupo es (categoría, términos, con_flexiones); sin flexiones solo
+    se reconoce el término exacto.
+    """
+
+    def __init__(self, groups: Iterable[tuple[str, Iterable[str], bool]]):
+        self.words = {}        # forma -> (categoría, término)
+        self.triggers = set()  # primera palabra de cada término compuesto
+        phrases = []
+        for kind, terms, inflect in groups:
+            # Los términos de un solo carácter (por ejemplo el lenguaje "R")
+            # se descartan porque generarían demasiados falsos positivos
+            for term in sorted({term.lower() for term in terms if len(term.strip()) > 1}):
+                if _WORD.fullmatch(term):
+                    for form in (_inflections(term) if inflect else (term,)):
+                        self.words.setdefault(form, (kind, term))
+                else:
+                    first = _WORD.search(term)
+                    if first is None:
+                        continue
+                    self.triggers.add(first.group())
+                    phrases.append((kind, term))
+        self.phrase_kinds = {term: kind for kind, term in reversed(phrases)}
+        self.phrases = None
+        if phrases:
+            ordered = sorted(self.phrase_kinds, key=lambda term: (-len(term), term))
+            self.phrases = re.compile(
+                r"(?<!\w)(?:" + "|".join(re.escape(term) for term in ordered) + r")(?!\w)")
+
+    def first(self, text: str, offset: int, tokens: Optional[list[str]] = None
+              ) -> Optional[TopicMatch]:
+        """Primer término del fragmento ``text`` (posiciones desde ``offset``)."""
+        if tokens is None:
+            tokens = _WORD.findall(text)
+        found = self.words.keys() & tokens
+        best = None
+        if found:
+            for match in _WORD.finditer(text):
+                if match.group() in found:
+                    kind, term = self.words[match.group()]
+                    best = TopicMatch(kind, term, offset + match.start(), offset + match.end())
+                    break
+        if self.phrases is not None and not self.triggers.isdisjoint(tokens):
+            match = self.phrases.search(text)
+            # A igual posición gana el término compuesto ("node.js" frente a "node")
+            if match is not None and (best is None or match.start() <= best.start - offset):
+                term = match.group()
+                best = TopicMatch(self.phrase_kinds[term], term,
+                                  offset + match.start(), offset + match.end())
+        return best
+
+
+def _boundary(text: str, position: int) -> int:
+    """Primera posición tras un espacio a partir de ``position``."""
+    space = _SPACE.search(text, position)
+    return space.end() if space else len(text)
+
+
+def _chunks(text: str) -> Iterator[tuple[int, int]]:
+    """
+    Divide el texto en fragmentos que terminan en un espacio, en el orden en
+    que se examinan: un principio y un final cortos y después el centro.
+    """
+    if len(text) <= 2 * EDGE_CHARS:
+        yield 0, len(text)
+        return
+    head = _boundary(text, EDGE_CHARS)
+    tail = _boundary(text, len(text) - EDGE_CHARS)
+    if tail <= head:
+        yield 0, len(text)
+        return
+    yield 0, head
+    yield tail, len(text)
+    start = head
+    while start < tail:
+        end = min(_boundary(text, start + CHUNK_CHARS), tail)
+        yield start, end
+        start = end
+
+
+class TopicMatcher:
+    """
+    Clasificador de consultas por búsqueda de palabras en un diccionario.
+    """
+
+    def __init__(self, greetings: Iterable[str], keywords: Iterable[str],
+                 languages: Iterable[str] = (), technologies: Iterable[str] = ()):
+        """
+        Construye el clasificador.
+
+        Args:
+            greetings: Saludos reconocidos
+            keywords: Palabras clave de desarrollo de software (las que no son
+                     nombres de lenguajes o tecnologías admiten flexiones)
+            languages: Lenguajes de programación soportados
+            technologies: Frameworks y tecnologías soportadas
+        """
+        languages = tuple(languages)
+        technologies = tuple(technologies)
+        # Los nombres se reconocen tal cual aunque figuren entre las palabras clave
+        names = {term.lower() for term in (*NAME_KEYWORDS, *languages, *technologies)}
+        keywords = tuple(keywords)
+        self.greetings = _Vocabulary([(GREETING, greetings, False)])
+        self.topics = _Vocabulary([
+            (KEYWORD, [term for term in keywords if term.lower() not in names], True),
+            (KEYWORD, [term for term in keywords if term.lower() in names], False),
+            (LANGUAGE, languages, False),
+            (TECHNOLOGY, technologies, False),
+        ])
+
+    def classify(self, query: str, include_greetings: bool = True) -> Optional[TopicMatch]:
+        """
+        Clasifica una consulta.
+
+        Si la consulta empieza por un saludo (en sus GREETING_CHARS primeros
+        caracteres) se devuelve el saludo; en caso contrario, un término técnico
+        de la consulta. Los textos largos se recorren por fragmentos y la
+        búsqueda se detiene en el primero que contiene un término.
+
+        Args:
+            query: La consulta del usuario
+            include_greetings: Si es False se ignoran los saludos
+
+        Returns:
+            TopicMatch o None si no coincide ningún término
+        """
+        for start, end in _chunks(query):
+            # Cada fragmento se pasa a minúsculas al examinarlo: en textos largos
+            # con caracteres no ASCII, lower() sobre todo el texto es lo más caro
+            text = query[start:end].lower()
+            tokens = _WORD.findall(text)
+            if include_greetings and start == 0:
+                greeting = self.greetings.first(text[:GREETING_CHARS], 0, tokens)
+                if greeting is not None:
+                    return greeting
+            match = self.topics.first(text, start, tokens)
+            if match is not None:
+                return match
+        return None
+
+
+def build_topic_matcher(config: dict = CHATBOT_CONFIG) -> TopicMatcher:
+    """
+    Construye un clasificador a partir de la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        TopicMatcher: Clasificador listo para usar
+    """
+    return TopicMatcher(
+        greetings=GREETINGS,
+        keywords=TOPIC_KEYWORDS,
+        languages=config.get("supported_languages", ()),
+        technologies=config.get("technologies", ()),
+    )
+
+
+# Clasificador compartido, construido una única vez al importar
+TOPIC_MATCHER = build_topic_matcher()
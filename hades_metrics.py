@@ -0,0 +1,235 @@
+"""
+Métricas de Hades en formato Prometheus
+=======================================
+
+Contadores e histogramas sin dependencias externas, expuestos en /metrics
+con el formato de texto de Prometheus. Cuando las métricas están
+desactivadas (CHATBOT_CONFIG["metrics"]["enabled"] = False) el registro
+entrega métricas vacías cuyas operaciones no hacen nada, y los puntos de
+medición del camino crítico comprueban METRICS.enabled antes de leer el reloj.
+
+Los valores que otros componentes ya cuentan (aciertos de caché, tokens por
+modelo) no se duplican en el camino crítico: se leen de sus stats() al
+generar la respuesta mediante colectores.
+"""
+
+from config import CHATBOT_CONFIG
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+import threading
+
+
+# Límites de los histogramas de latencia (segundos)
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Counter:
+    """Contador monótono con etiquetas."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        """Incrementa el contador de la combinación de etiquetas dada."""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, labels)), value)
+                    for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        """Registra una observación (en segundos para las latencias)."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        with self._lock:
+            result = []
+            for labels, (counts, total, count) in self._series.items():
+                base = dict(zip(self.labelnames, labels))
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += bucket
+                    result.append((self.name + "_bucket", {**base, "le": str(bound)}, cumulative))
+                result.append((self.name + "_sum", base, total))
+                result.append((self.name + "_count", base, count))
+            return result
+
+
+class _NullMetric:
+    """Métrica de un registro desactivado: no registra nada."""
+
+    def inc(self, *labels, amount: float = 1):
+        pass
+
+    def observe(self, value: float, *labels):
+        pass
+
+
+NULL_METRIC = _NullMetric()
+
+
+class MetricsRegistry:
+    """Conjunto de métricas del proceso."""
+
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled: Si es False, las métricas creadas no registran nada
+        """
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = {}
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()):
+        """Crea y registra un contador."""
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS):
+        """Crea y registra un histograma."""
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        if not self.enabled:
+            return NULL_METRIC
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]],
+                      name: Optional[str] = None):
+        """
+        Registra una función que se consulta al generar /metrics.
+
+        La función retorna tuplas (nombre, tipo, ayuda, muestras), donde las
+        muestras son pares (etiquetas, valor).
+
+        Args:
+            collector: Función colectora
+            name: Nombre del colector. Un colector con el mismo nombre
+                 sustituye al anterior, de modo que crear otra aplicación o
+                 planificador no duplica las familias de métricas (Prometheus
+                 rechaza la exposición entera si se repite una)
+        """
+        if self.enabled:
+            self._collectors[name or id(collector)] = collector
+
+    def render(self) -> str:
+        """Genera la exposición en formato de texto de Prometheus."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        for collector in list(self._collectors.values()):
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def create_metrics_registry(config: dict = CHATBOT_CONFIG) -> MetricsRegistry:
+    """
+    Crea el registro de métricas según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        MetricsRegistry: Registro activado o desactivado
+    """
+    return MetricsRegistry(enabled=config.get("metrics", {}).get("enabled", True))
+
+
+def chatbot_collector(chatbot) -> Callable[[], Iterable[tuple]]:
+    """
+    Crea un colector con los contadores que ya mantiene un chatbot.
+
+    Args:
+        chatbot: Instancia de HadesChatbot
+
+    Returns:
+        Callable: Colector para MetricsRegistry.add_collector
+    """
+    def collect():
+        lookups = []
+        for name, cache in (("exact", chatbot.cache), ("semantic", chatbot.semantic_cache)):
+            if cache is None:
+                continue
+            stats = cache.stats()
+            lookups.append(({"cache": name, "result": "hit"}, stats["hits"]))
+            lookups.append(({"cache": name, "result": "miss"}, stats["misses"]))
+        yield ("hades_cache_lookups_total", "counter",
+               "Búsquedas en la caché de respuestas por resultado", lookups)
+        if chatbot.flights is not None:
+            yield ("hades_coalesced_queries_total", "counter",
+                   "Consultas que esperaron a una llamada idéntica en curso",
+                   [({}, chatbot.flights.stats()["duplicates"])])
+        yield ("hades_sessions", "gauge", "Sesiones de conversación en memoria",
+               [({}, len(chatbot.sessions))])
+    return collect
+
+
+# Registro del proceso
+METRICS = create_metrics_registry()
+
+REQUEST_SECONDS = METRICS.histogram(
+    "hades_request_seconds", "Latencia total de las peticiones HTTP", ("endpoint",))
+VALIDATION_SECONDS = METRICS.histogram(
+    "hades_validation_seconds", "Tiempo de clasificación de las consultas")
+LLM_SECONDS = METRICS.histogram(
+    "hades_llm_seconds", "Duración de las llamadas al proveedor de LLM", ("provider", "model"))
+FIRST_TOKEN_SECONDS = METRICS.histogram(
+    "hades_llm_first_token_seconds", "Tiempo hasta el primer fragmento de la respuesta",
+    ("provider", "model"))
+SERIALIZATION_SECONDS = METRICS.histogram(
+    "hades_serialization_seconds", "Tiempo de serialización de las respuestas JSON")
+QUERIES_TOTAL = METRICS.counter(
+    "hades_queries_total", "Consultas recibidas por resultado de la validación", ("result",))
+REJECTED_TOTAL = METRICS.counter(
+    "hades_rejected_requests_total", "Peticiones rechazadas con 429 por motivo", ("reason",))
+ERRORS_TOTAL = METRICS.counter(
+    "hades_errors_total", "Errores al procesar consultas por tipo", ("type",))
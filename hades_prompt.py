@@ -6,6 +6,9 @@ Este módulo contiene el prompt del sistema para Hades, un chatbot altamente
 preciso y eficiente enfocado exclusivamente en desarrollo de software.
 """
 
+from hades_matcher import TOPIC_MATCHER
+import hashlib
+
 HADES_SYSTEM_PROMPT = """
 # Rol del Chatbot
 
@@ -98,6 +101,16 @@ Las siguientes áreas están dentro de mi dominio de conocimiento:
 """
 
 
+def prompt_hash(prompt: str) -> str:
+    """Retorna un hash corto y estable de un prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+# Prompt limpio y su hash, calculados una sola vez al importar
+SYSTEM_PROMPT = HADES_SYSTEM_PROMPT.strip()
+SYSTEM_PROMPT_HASH = prompt_hash(SYSTEM_PROMPT)
+
+
 def get_system_prompt():
     """
     Retorna el prompt del sistema para Hades.
@@ -105,7 +118,7 @@ def get_system_prompt():
     Returns:
         str: El prompt completo del sistema
     """
-    return HADES_SYSTEM_PROMPT.strip()
+    return SYSTEM_PROMPT
 
 
 def format_prompt_for_api():
@@ -145,16 +158,4 @@ def is_software_development_related(query: str) -> bool:
     Returns:
         bool: True si está relacionada, False en caso contrario
     """
-    keywords = [
-        "código", "programación", "desarrollo", "software", "aplicación",
-        "algoritmo", "función", "variable", "clase", "objeto", "base de datos",
-        "API", "framework", "librería", "biblioteca", "compilación", "error",
-        "bug", "debug", "test", "testing", "deploy", "git", "docker",
-        "servidor", "cliente", "frontend", "backend", "fullstack", "móvil",
-        "sql", "javascript", "python", "java", "html", "css", "react",
-        "angular", "vue", "node", "express", "django", "flask", "spring"
-    ]
-    
-    query_lower = query.lower()
-    return any(keyword in query_lower for keyword in keywords)
-
+    return TOPIC_MATCHER.classify(query, include_greetings=False) is not None
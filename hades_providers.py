@@ -0,0 +1,641 @@
+"""
+Proveedores de LLM para Hades
+=============================
+
+Capa común para OpenAI, Anthropic y Azure OpenAI. Todos los proveedores
+comparten un único cliente HTTP por proceso (conexiones keep-alive en pool,
+timeouts configurables y HTTP/2 opcional), de modo que las llamadas no
+repiten el handshake TLS ni reconstruyen clientes en cada consulta.
+"""
+
+from hades_snapshot import current_snapshot
+from hades_metrics import FIRST_TOKEN_SECONDS, LLM_SECONDS, METRICS
+from hades_tracing import annotate
+from config import CHATBOT_CONFIG
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Iterator, Optional
+import asyncio
+import contextvars
+import importlib
+import importlib.util
+import logging
+import os
+import threading
+import time
+import weakref
+
+
+# Modelos por defecto de cada proveedor
+DEFAULT_MODELS = {
+    "openai": "gpt-4",
+    "anthropic": "claude-3-5-sonnet-20241022",
+    "azure": None,  # se usa AZURE_OPENAI_DEPLOYMENT_NAME
+}
+
+logger = logging.getLogger("hades.providers")
+
+_lock = threading.Lock()
+_http_client = None
+_async_http_clients = weakref.WeakKeyDictionary()
+_sdk_clients = {}
+
+
+def _import_httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError("httpx no está instalado. Ejecuta: pip install httpx")
+    return httpx
+
+
+def _http_options(config: dict) -> dict:
+    """Traduce CHATBOT_CONFIG["http_client"] a opciones de httpx."""
+    httpx = _import_httpx()
+    settings = config.get("http_client", {})
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings.get("max_connections", 100),
+            max_keepalive_connections=settings.get("max_keepalive_connections", 20),
+            keepalive_expiry=settings.get("keepalive_expiry", 30),
+        ),
+        "timeout": httpx.Timeout(
+            settings.get("timeout", 60),
+            connect=settings.get("connect_timeout", 5),
+        ),
+        "http2": settings.get("http2", False),
+    }
+
+
+def get_http_client(config: dict = CHATBOT_CONFIG):
+    """
+    Retorna el cliente HTTP compartido del proceso (se crea la primera vez).
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        httpx.Client: Cliente con pool de conexiones keep-alive
+    """
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                _http_client = _import_httpx().Client(**_http_options(config))
+    return _http_client
+
+
+def get_async_http_client(config: dict = CHATBOT_CONFIG):
+    """
+    Retorna el cliente HTTP asíncrono compartido del bucle de eventos actual.
+
+    Las conexiones asíncronas pertenecen a un bucle concreto, así que se
+    mantiene un cliente por bucle (normalmente uno por proceso).
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        httpx.AsyncClient: Cliente con pool de conexiones keep-alive
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = _import_httpx().AsyncClient(**_http_options(config))
+        _async_http_clients[loop] = client
+    return client
+
+
+def close_http_clients():
+    """Cierra el cliente HTTP síncrono compartido y olvida los clientes SDK."""
+    global _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        _sdk_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    def _after_fork():
+        # Con gunicorn --preload los clientes se crean en el maestro: sus
+        # conexiones no deben compartirse con los workers. Se descartan sin
+        # cerrarlas (siguen siendo del maestro) y cada worker crea las suyas
+        global _lock, _http_client, _async_http_clients
+        _lock = threading.Lock()
+        _http_client = None
+        _async_http_clients = weakref.WeakKeyDictionary()
+        _sdk_clients.clear()
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _api_key(provider: str, api_key: Optional[str]) -> Optional[str]:
+    variables = {
+        "openai": "OPENAI_API_KEY",
+        "anthropic": "ANTHROPIC_API_KEY",
+        "azure": "AZURE_OPENAI_API_KEY",
+    }
+    api_key = api_key or os.getenv(variables[provider])
+    if not api_key and provider != "azure":
+        raise ValueError(
+            f"Se requiere una API key de {provider}. "
+            f"Pásala como argumento o configura la variable de entorno {variables[provider]}"
+        )
+    return api_key
+
+
+def _sdk_missing(provider: str) -> ImportError:
+    if provider == "anthropic":
+        return ImportError("Anthropic no está instalado. Ejecuta: pip install anthropic")
+    return ImportError(
+        "OpenAI no está instalado. Ejecuta: pip install openai\n"
+        "Luego configura tu API key con: export OPENAI_API_KEY='tu-key'"
+    )
+
+
+def _import_sdk(provider: str):
+    """Importa el SDK del proveedor con un mensaje claro si falta."""
+    try:
+        return importlib.import_module("anthropic" if provider == "anthropic" else "openai")
+    except ImportError:
+        raise _sdk_missing(provider)
+
+
+def _check_sdk(provider: str):
+    """
+    Comprueba que el SDK del proveedor está instalado sin importarlo.
+
+    Importar un SDK tarda cientos de milisegundos; se deja para la primera
+    petición o para warmup().
+    """
+    if importlib.util.find_spec("anthropic" if provider == "anthropic" else "openai") is None:
+        raise _sdk_missing(provider)
+
+
+def _sdk_options(http_client, config: dict) -> dict:
+    """
+    Opciones comunes de los clientes de SDK.
+
+    Los reintentos y el plazo de cada llamada son cosa de hades_resilience:
+    el SDK no reintenta por su cuenta (multiplicaría los intentos) y su
+    timeout HTTP no supera el plazo de la petición.
+    """
+    timeout = config.get("resilience", {}).get("timeout")
+    if not timeout:
+        timeout = config.get("http_client", {}).get("timeout", 60)
+    return {"http_client": http_client, "max_retries": 0, "timeout": timeout}
+
+
+def _build_sdk_client(provider: str, api_key: Optional[str], http_client,
+                      asynchronous: bool, config: dict = CHATBOT_CONFIG):
+    """Construye el cliente del SDK del proveedor sobre el cliente HTTP dado."""
+    sdk = _import_sdk(provider)
+    if provider == "anthropic":
+        cls = sdk.AsyncAnthropic if asynchronous else sdk.Anthropic
+        return cls(api_key=api_key, **_sdk_options(http_client, config))
+
+    if provider == "openai":
+        cls = sdk.AsyncOpenAI if asynchronous else sdk.OpenAI
+        return cls(api_key=api_key, **_sdk_options(http_client, config))
+
+    options = {
+        "azure_endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
+        "api_version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+        **_sdk_options(http_client, config),
+    }
+    if api_key:
+        options["api_key"] = api_key
+    else:
+        try:
+            from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+        except ImportError:
+            raise ImportError(
+                "Azure OpenAI no está instalado. Ejecuta: pip install openai azure-identity"
+            )
+        options["azure_ad_token_provider"] = get_bearer_token_provider(
+            DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
+        )
+    cls = sdk.AsyncAzureOpenAI if asynchronous else sdk.AzureOpenAI
+    return cls(**options)
+
+
+def get_sdk_client(provider: str, api_key: Optional[str] = None,
+                   config: dict = CHATBOT_CONFIG):
+    """
+    Retorna el cliente SDK compartido de un proveedor.
+
+    Args:
+        provider: "openai", "anthropic" o "azure"
+        api_key: API key (por defecto, la variable de entorno del proveedor)
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        Cliente del SDK del proveedor
+    """
+    if provider not in DEFAULT_MODELS:
+        raise ValueError(f"Proveedor de LLM desconocido: {provider}")
+    api_key = _api_key(provider, api_key)
+    key = (provider, api_key)
+    client = _sdk_clients.get(key)
+    if client is None:
+        http_client = get_http_client(config)
+        with _lock:
+            client = _sdk_clients.get(key)
+            if client is None:
+                client = _build_sdk_client(provider, api_key, http_client, False, config)
+                _sdk_clients[key] = client
+    return client
+
+
+def _resolve_model(provider: str, model: Optional[str]) -> str:
+    model = model or DEFAULT_MODELS[provider]
+    if provider == "azure":
+        model = model or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+    if not model:
+        raise ValueError(
+            "Se requiere el nombre del deployment de Azure OpenAI. "
+            "Pásalo como argumento o configura AZURE_OPENAI_DEPLOYMENT_NAME"
+        )
+    return model
+
+
+def _request_options(provider: str, model: str, user_query: str, config: dict,
+                     history: Optional[list[dict]] = None) -> dict:
+    """
+    Parámetros de la petición de chat para cada proveedor.
+
+    El prompt del sistema va siempre primero y sin cambios para que el
+    proveedor lo reutilice como prefijo en caché: Anthropic lo marca con
+    ``cache_control`` y OpenAI cachea automáticamente los prefijos estables.
+    """
+    settings = config.get("llm", {})
+    history = history or []
+    system_prompt = current_snapshot().system_prompt
+    if provider == "anthropic":
+        # Anthropic solo admite el prompt del sistema fuera de los mensajes;
+        # las notas del historial van en un bloque aparte, fuera del prefijo
+        system = [{"type": "text", "text": system_prompt,
+                   "cache_control": {"type": "ephemeral"}}]
+        system.extend({"type": "text", "text": message["content"]}
+                      for message in history if message["role"] == "system")
+        return {
+            "model": model,
+            "max_tokens": settings.get("max_tokens", 1500),
+            "system": system,
+            "messages": [message for message in history if message["role"] != "system"]
+                        + [{"role": "user", "content": user_query}],
+        }
+    return {
+        "model": model,
+        "messages": [{"role": "system", "content": system_prompt}]
+                    + history
+                    + [{"role": "user", "content": user_query}],
+        "temperature": settings.get("temperature", 0.7),
+        "max_tokens": settings.get("max_tokens", 1500),
+    }
+
+
+def _stream_options(provider: str) -> dict:
+    """Opciones extra de streaming (OpenAI solo envía el uso si se pide)."""
+    if provider == "openai":
+        return {"stream": True, "stream_options": {"include_usage": True}}
+    return {"stream": True}
+
+
+# Campos de uso de tokens que se suman por modelo y por petición
+USAGE_FIELDS = ("prompt_tokens", "cached_tokens", "cache_creation_tokens", "completion_tokens")
+
+# Tokens acumulados de la consulta en curso (ver collect_usage())
+_request_usage = contextvars.ContextVar("hades_request_usage", default=None)
+_request_usage_lock = threading.Lock()
+
+
+@contextmanager
+def collect_usage():
+    """
+    Acumula el uso de tokens de las llamadas al LLM del bloque.
+
+    Los reintentos y el hedging también suman: son tokens consumidos en
+    nombre de la misma consulta. Los callbacks que no informan del uso
+    dejan el diccionario vacío.
+
+    Yields:
+        dict: Tokens acumulados por campo (ver USAGE_FIELDS)
+    """
+    totals = {}
+    token = _request_usage.set(totals)
+    try:
+        yield totals
+    finally:
+        try:
+            _request_usage.reset(token)
+        except ValueError:
+            # El generador se cerró desde otro contexto
+            pass
+
+
+class UsageStats:
+    """
+    Tokens consumidos por modelo, incluidos los leídos de la caché de
+    prompts del proveedor.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def record(self, usage: dict):
+        with self._lock:
+            totals = self._models.setdefault(usage["model"], {
+                "requests": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                "cache_creation_tokens": 0, "completion_tokens": 0,
+            })
+            totals["requests"] += 1
+            for name in USAGE_FIELDS:
+                totals[name] += usage[name]
+
+    def stats(self) -> dict:
+        """Retorna los totales por modelo y la fracción del prompt cacheada."""
+        with self._lock:
+            result = {}
+            for model, totals in self._models.items():
+                result[model] = dict(totals)
+                prompt = totals["prompt_tokens"]
+                result[model]["cache_hit_ratio"] = (
+                    round(totals["cached_tokens"] / prompt, 4) if prompt else 0.0
+                )
+            return result
+
+
+# Uso acumulado de todos los proveedores del proceso
+USAGE = UsageStats()
+
+
+def _usage_metrics():
+    """Colector de métricas con los tokens consumidos por modelo."""
+    samples = [
+        ({"model": model, "kind": kind}, totals[f"{kind}_tokens"])
+        for model, totals in USAGE.stats().items()
+        for kind in ("prompt", "cached", "cache_creation", "completion")
+    ]
+    yield "hades_llm_tokens_total", "counter", "Tokens consumidos por modelo y tipo", samples
+
+
+METRICS.add_collector(_usage_metrics, "llm_usage")
+
+
+def _parse_usage(provider: str, model: str, usage) -> Optional[dict]:
+    """Normaliza el objeto ``usage`` de OpenAI o Anthropic."""
+    if usage is None:
+        return None
+    if provider == "anthropic":
+        cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+        created = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        return {
+            "provider": provider,
+            "model": model,
+            "prompt_tokens": (usage.input_tokens or 0) + cached + created,
+            "cached_tokens": cached,
+            "cache_creation_tokens": created,
+            "completion_tokens": usage.output_tokens or 0,
+        }
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "provider": provider,
+        "model": model,
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "cache_creation_tokens": 0,
+        "completion_tokens": usage.completion_tokens or 0,
+    }
+
+
+def _report_usage(provider: str, model: str, usage,
+                  on_usage: Optional[Callable[[dict], None]]):
+    """
+    Registra el uso de tokens de una petición: en los totales del proceso,
+    en los de la consulta en curso (collect_usage()) y en su span.
+    """
+    usage = _parse_usage(provider, model, usage)
+    if usage is None:
+        return
+    USAGE.record(usage)
+    totals = _request_usage.get()
+    if totals is None:
+        annotate(**{name: usage[name] for name in USAGE_FIELDS})
+    else:
+        with _request_usage_lock:
+            for name in USAGE_FIELDS:
+                totals[name] = totals.get(name, 0) + usage[name]
+            annotate(**totals)
+    logger.debug(
+        "%s %s: prompt=%d (caché=%d) completion=%d", provider, model,
+        usage["prompt_tokens"], usage["cached_tokens"], usage["completion_tokens"]
+    )
+    if on_usage is not None:
+        on_usage(usage)
+
+
+def _measure_stream(chunks: Iterator[str], provider: str, model: str) -> Iterator[str]:
+    """Mide el tiempo hasta el primer fragmento y la duración de un stream."""
+    started = time.perf_counter()
+    first = True
+    try:
+        for chunk in chunks:
+            if first:
+                FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, provider, model)
+                first = False
+            yield chunk
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, provider, model)
+
+
+async def _ameasure_stream(chunks: AsyncIterator[str], provider: str,
+                           model: str) -> AsyncIterator[str]:
+    """Versión asíncrona de _measure_stream."""
+    started = time.perf_counter()
+    first = True
+    try:
+        async for chunk in chunks:
+            if first:
+                FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, provider, model)
+                first = False
+            yield chunk
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, provider, model)
+
+
+def create_llm_integration(provider: str = "openai", api_key: Optional[str] = None,
+                           model: Optional[str] = None,
+                           config: dict = CHATBOT_CONFIG,
+                           on_usage: Optional[Callable[[dict], None]] = None) -> Callable[[str], str]:
+    """
+    Crea un callback de LLM para cualquier proveedor soportado.
+
+    Args:
+        provider: "openai", "anthropic" o "azure"
+        api_key: API key del proveedor. Si no se proporciona, se obtiene de
+                su variable de entorno (OPENAI_API_KEY, ANTHROPIC_API_KEY o
+                AZURE_OPENAI_API_KEY; Azure admite además Azure AD).
+        model: Modelo (o deployment de Azure) por defecto
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        on_usage: Función opcional que recibe el uso de tokens de cada
+                 petición (incluidos los tokens leídos de la caché de prompts)
+
+    Returns:
+        Callable: Callback para usar con HadesChatbot. Su atributo ``stream``
+                 genera la respuesta por fragmentos. Ambos aceptan
+                 ``history`` con los mensajes previos de la conversación.
+                 El SDK se importa y el cliente se construye en la primera
+                 petición, o antes llamando a ``warmup()``. El cliente no
+                 reintenta: envuélvelo con hades_resilience.with_resilience
+                 (create_llm_callback_from_env ya lo hace).
+
+    Raises:
+        ImportError: Si el SDK del proveedor no está instalado
+        ValueError: Si falta la API key o el proveedor no existe
+    """
+    if provider not in DEFAULT_MODELS:
+        raise ValueError(f"Proveedor de LLM desconocido: {provider}")
+    api_key = _api_key(provider, api_key)
+    default_model = _resolve_model(provider, model)
+    # Falla pronto si el SDK no está instalado, pero sin importarlo todavía
+    _check_sdk(provider)
+
+    def warmup():
+        get_sdk_client(provider, api_key, config)
+
+    def llm_callback(user_query: str, model: str = default_model,
+                     history: Optional[list[dict]] = None) -> str:
+        options = _request_options(provider, model, user_query, config, history)
+        client = get_sdk_client(provider, api_key, config)
+        started = time.perf_counter()
+        try:
+            if provider == "anthropic":
+                message = client.messages.create(**options)
+                _report_usage(provider, model, message.usage, on_usage)
+                return message.content[0].text
+            response = client.chat.completions.create(**options)
+            _report_usage(provider, model, response.usage, on_usage)
+            return response.choices[0].message.content
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, provider, model)
+
+    def stream_callback(user_query: str, model: str = default_model,
+                        history: Optional[list[dict]] = None) -> Iterator[str]:
+        return _measure_stream(stream_chunks(user_query, model, history), provider, model)
+
+    def stream_chunks(user_query: str, model: str,
+                      history: Optional[list[dict]]) -> Iterator[str]:
+        options = _request_options(provider, model, user_query, config, history)
+        client = get_sdk_client(provider, api_key, config)
+        if provider == "anthropic":
+            with client.messages.stream(**options) as stream:
+                yield from stream.text_stream
+                _report_usage(provider, model, stream.get_final_message().usage, on_usage)
+            return
+        for chunk in client.chat.completions.create(**_stream_options(provider), **options):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None) is not None:
+                _report_usage(provider, model, chunk.usage, on_usage)
+
+    llm_callback.stream = stream_callback
+    llm_callback.warmup = warmup
+    llm_callback.model = default_model
+    llm_callback.provider = provider
+    llm_callback.supports_history = True
+    return llm_callback
+
+
+def create_async_llm_integration(provider: str = "openai", api_key: Optional[str] = None,
+                                 model: Optional[str] = None,
+                                 config: dict = CHATBOT_CONFIG,
+                                 on_usage: Optional[Callable[[dict], None]] = None) -> Callable:
+    """
+    Crea un callback asíncrono de LLM para cualquier proveedor soportado.
+
+    El cliente SDK se crea en el primer uso dentro de cada bucle de eventos
+    y reutiliza el cliente HTTP asíncrono compartido de ese bucle.
+
+    Args:
+        provider: "openai", "anthropic" o "azure"
+        api_key: API key del proveedor (ver create_llm_integration)
+        model: Modelo (o deployment de Azure) por defecto
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        on_usage: Función opcional que recibe el uso de tokens de cada petición
+
+    Returns:
+        Callable: Corrutina callback para usar con AsyncHadesChatbot. Su
+                 atributo ``stream`` genera la respuesta por fragmentos y
+                 ``warmup()`` adelanta la importación del SDK. Como en
+                 create_llm_integration, el cliente no reintenta.
+
+    Raises:
+        ImportError: Si el SDK del proveedor no está instalado
+        ValueError: Si falta la API key o el proveedor no existe
+    """
+    if provider not in DEFAULT_MODELS:
+        raise ValueError(f"Proveedor de LLM desconocido: {provider}")
+    api_key = _api_key(provider, api_key)
+    default_model = _resolve_model(provider, model)
+    # Falla pronto si el SDK no está instalado, pero sin importarlo todavía
+    _check_sdk(provider)
+    clients = weakref.WeakKeyDictionary()
+
+    def warmup():
+        # Los clientes pertenecen a un bucle de eventos: aquí solo se
+        # adelantan las importaciones
+        _import_sdk(provider)
+        _import_httpx()
+
+    def get_client():
+        loop = asyncio.get_running_loop()
+        client = clients.get(loop)
+        if client is None:
+            client = _build_sdk_client(provider, api_key, get_async_http_client(config),
+                                           True, config)
+            clients[loop] = client
+        return client
+
+    async def llm_callback(user_query: str, model: str = default_model,
+                           history: Optional[list[dict]] = None) -> str:
+        options = _request_options(provider, model, user_query, config, history)
+        started = time.perf_counter()
+        try:
+            if provider == "anthropic":
+                message = await get_client().messages.create(**options)
+                _report_usage(provider, model, message.usage, on_usage)
+                return message.content[0].text
+            response = await get_client().chat.completions.create(**options)
+            _report_usage(provider, model, response.usage, on_usage)
+            return response.choices[0].message.content
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, provider, model)
+
+    def stream_callback(user_query: str, model: str = default_model,
+                        history: Optional[list[dict]] = None) -> AsyncIterator[str]:
+        return _ameasure_stream(stream_chunks(user_query, model, history), provider, model)
+
+    async def stream_chunks(user_query: str, model: str,
+                            history: Optional[list[dict]]) -> AsyncIterator[str]:
+        options = _request_options(provider, model, user_query, config, history)
+        if provider == "anthropic":
+            async with get_client().messages.stream(**options) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+                _report_usage(provider, model, message.usage, on_usage)
+            return
+        stream = await get_client().chat.completions.create(**_stream_options(provider), **options)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None) is not None:
+                _report_usage(provider, model, chunk.usage, on_usage)
+
+    llm_callback.stream = stream_callback
+    llm_callback.warmup = warmup
+    llm_callback.model = default_model
+    llm_callback.provider = provider
+    llm_callback.supports_history = True
+    return llm_callback
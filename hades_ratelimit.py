@@ -0,0 +1,418 @@
+"""
+Control de admisión para Hades
+==============================
+
+Protege al proveedor de LLM de clientes abusivos y de picos de tráfico:
+
+- RateLimiter: un token bucket por cliente (API key o IP). Solo las API
+  keys configuradas (CHATBOT_CONFIG["rate_limit"]["api_keys"] o la
+  variable de entorno HADES_API_KEYS) identifican a un cliente; cualquier
+  otra se ignora y el cliente se identifica por su IP. El estado se
+  guarda en un backend intercambiable: en memoria (por proceso) o en Redis,
+  para que el límite se respete entre varios workers. Si Redis no responde,
+  el límite pasa a aplicarse por proceso en memoria hasta que se recupere.
+- ConcurrencyLimiter / AsyncConcurrencyLimiter: límite global de peticiones
+  en curso hacia el LLM con una cola de espera acotada. Si la cola está
+  llena, o la espera supera el plazo, la petición se rechaza.
+
+Los servidores responden 429 con la cabecera Retry-After en ambos casos.
+
+Ambos están desactivados por defecto (CHATBOT_CONFIG["rate_limit"]["enabled"]).
+"""
+
+from config import CHATBOT_CONFIG
+from collections import OrderedDict
+from typing import Optional
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger("hades.ratelimit")
+
+
+class MemoryBucketBackend:
+    """Token buckets en memoria del proceso, con desalojo LRU."""
+
+    def __init__(self, max_keys: int = 100000, clock=time.monotonic):
+        """
+        Args:
+            max_keys: Clientes distintos que se recuerdan
+            clock: Función que retorna el tiempo actual en segundos
+        """
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> tuple[bool, float]:
+        """
+        Intenta consumir ``cost`` tokens del bucket de un cliente.
+
+        Returns:
+            tuple: (permitido, tokens restantes)
+        """
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed, tokens
+
+
+# Recarga y consumo atómicos del bucket en Redis
+_REDIS_TAKE = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketBackend:
+    """
+    Token buckets compartidos entre procesos en Redis.
+
+    Una caída de Redis no tumba la API: mientras falle, cada proceso limita
+    con sus propios buckets en memoria (``fallback``) y se registra un aviso
+    al empezar el fallo y otro al recuperarse.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "hades:rl:",
+                 fallback: Optional[MemoryBucketBackend] = None):
+        """
+        Args:
+            url: URL de conexión a Redis
+            prefix: Prefijo de las claves
+            fallback: Backend que se usa mientras Redis no responde
+
+        Raises:
+            ImportError: Si redis no está instalado
+        """
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("redis no está instalado. Ejecuta: pip install redis")
+        self.url = url
+        self.prefix = prefix
+        self.fallback = fallback or MemoryBucketBackend()
+        self.errors = 0
+        self._error_types = (redis.RedisError,)
+        self._failing = False
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_REDIS_TAKE)
+        self._async_take = None
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1) -> tuple[bool, float]:
+        """Igual que MemoryBucketBackend.take, de forma atómica en Redis."""
+        try:
+            allowed, tokens = self._take(keys=[self.prefix + key],
+                                         args=[rate, burst, cost, time.time()])
+        except self._error_types as e:
+            return self._fall_back(e, key, rate, burst, cost)
+        self._recovered()
+        return bool(allowed), float(tokens)
+
+    async def atake(self, key: str, rate: float, burst: float,
+                    cost: float = 1) -> tuple[bool, float]:
+        """Versión de take() con redis.asyncio, que no bloquea el event loop."""
+        if self._async_take is None:
+            import redis.asyncio
+            client = redis.asyncio.Redis.from_url(self.url)
+            self._async_take = client.register_script(_REDIS_TAKE)
+        try:
+            allowed, tokens = await self._async_take(keys=[self.prefix + key],
+                                                     args=[rate, burst, cost, time.time()])
+        except self._error_types as e:
+            return self._fall_back(e, key, rate, burst, cost)
+        self._recovered()
+        return bool(allowed), float(tokens)
+
+    def _fall_back(self, error: Exception, key: str, rate: float, burst: float,
+                   cost: float) -> tuple[bool, float]:
+        self.errors += 1
+        if not self._failing:
+            self._failing = True
+            logger.warning("Redis no responde (%s): el límite de peticiones se aplica "
+                           "por proceso hasta que se recupere", error)
+        return self.fallback.take(key, rate, burst, cost)
+
+    def _recovered(self):
+        if self._failing:
+            self._failing = False
+            logger.warning("Redis vuelve a responder: el límite de peticiones es de nuevo global")
+
+
+class RateLimiter:
+    """Límite de peticiones por cliente con token buckets."""
+
+    def __init__(self, rate: float = 1.0, burst: float = 20, backend=None):
+        """
+        Args:
+            rate: Tokens que recupera cada cliente por segundo
+            burst: Capacidad del bucket (ráfaga máxima)
+            backend: MemoryBucketBackend o RedisBucketBackend
+        """
+        self.rate = rate
+        self.burst = burst
+        self.backend = backend or MemoryBucketBackend()
+        self.rejected = 0
+
+    def check(self, client_id: str, cost: float = 1) -> tuple[bool, float]:
+        """
+        Consume ``cost`` tokens del cliente.
+
+        Args:
+            client_id: API key o IP del cliente
+            cost: Tokens que consume la petición (por ejemplo, el tamaño de
+                 un lote); se limita a la capacidad del bucket
+
+        Returns:
+            tuple: (permitido, segundos hasta poder reintentar)
+        """
+        cost = min(cost, self.burst)
+        allowed, tokens = self.backend.take(client_id, self.rate, self.burst, cost)
+        return self._result(allowed, tokens, cost)
+
+    async def acheck(self, client_id: str, cost: float = 1) -> tuple[bool, float]:
+        """
+        Versión asíncrona de check().
+
+        Con RedisBucketBackend la consulta se hace con redis.asyncio; el
+        backend en memoria no hace E/S y se llama directamente.
+        """
+        cost = min(cost, self.burst)
+        atake = getattr(self.backend, "atake", None)
+        if atake is None:
+            allowed, tokens = self.backend.take(client_id, self.rate, self.burst, cost)
+        else:
+            allowed, tokens = await atake(client_id, self.rate, self.burst, cost)
+        return self._result(allowed, tokens, cost)
+
+    def _result(self, allowed: bool, tokens: float, cost: float) -> tuple[bool, float]:
+        if allowed:
+            return True, 0.0
+        self.rejected += 1
+        return False, (cost - tokens) / self.rate
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "rejected": self.rejected,
+                "backend": type(self.backend).__name__,
+                "backend_errors": getattr(self.backend, "errors", 0)}
+
+
+class _ConcurrencyBase:
+    def __init__(self, max_in_flight: int = 64, max_queue: int = 256,
+                 queue_timeout: float = 10):
+        """
+        Args:
+            max_in_flight: Peticiones simultáneas hacia el LLM
+            max_queue: Peticiones que pueden esperar un hueco
+            queue_timeout: Segundos máximos de espera en la cola
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    @property
+    def retry_after(self) -> float:
+        """Espera sugerida a los clientes rechazados."""
+        return self.queue_timeout
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight,
+                "waiting": self.waiting, "max_queue": self.max_queue,
+                "rejected": self.rejected}
+
+
+class ConcurrencyLimiter(_ConcurrencyBase):
+    """Límite global de peticiones en curso para servidores con hilos."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """
+        Reserva un hueco, esperando en la cola si hace falta.
+
+        Returns:
+            bool: False si la cola está llena o se agotó la espera
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self.waiting -= 1
+                if not acquired:
+                    self.rejected += 1
+                    return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        """Libera un hueco reservado con acquire()."""
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+
+class AsyncConcurrencyLimiter(_ConcurrencyBase):
+    """Límite global de peticiones en curso para servidores asyncio."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    async def acquire(self) -> bool:
+        """Versión asíncrona de ConcurrencyLimiter.acquire()."""
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        """Libera un hueco reservado con acquire()."""
+        self.in_flight -= 1
+        self._slots.release()
+
+
+def hash_api_key(api_key: str) -> str:
+    """Resumen de una API key, para no usarla en claro como clave o etiqueta."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+
+def load_api_keys(config: dict = CHATBOT_CONFIG) -> frozenset:
+    """
+    Retorna los resúmenes de las API keys que identifican a un cliente.
+
+    Se leen de CHATBOT_CONFIG["rate_limit"]["api_keys"] y de la variable de
+    entorno HADES_API_KEYS (separadas por comas).
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        frozenset: Resúmenes calculados con hash_api_key()
+    """
+    keys = list(config.get("rate_limit", {}).get("api_keys", ()))
+    keys += os.environ.get("HADES_API_KEYS", "").split(",")
+    return frozenset(hash_api_key(key.strip()) for key in keys if key.strip())
+
+
+def get_client_id(headers, remote_addr: Optional[str], trust_proxy: bool = False,
+                  api_keys: frozenset = frozenset()) -> str:
+    """
+    Identifica al cliente por su API key o, si no tiene una válida, por su IP.
+
+    Una API key solo cuenta si está en ``api_keys``: de lo contrario, un
+    cliente podría estrenar un bucket (y un turno en el planificador) con
+    cada clave inventada.
+
+    Args:
+        headers: Cabeceras de la petición (acceso por nombre en minúsculas
+                o insensible a mayúsculas)
+        remote_addr: IP de la conexión
+        trust_proxy: Si es True se usa la primera IP de X-Forwarded-For
+        api_keys: Resúmenes de las API keys admitidas (ver load_api_keys())
+
+    Returns:
+        str: Identificador del cliente ("key:<resumen>" o "ip:<dirección>")
+    """
+    if api_keys:
+        api_key = headers.get("x-api-key")
+        authorization = headers.get("authorization") or ""
+        if not api_key and authorization.lower().startswith("bearer "):
+            api_key = authorization[7:].strip()
+        if api_key:
+            digest = hash_api_key(api_key)
+            if digest in api_keys:
+                return "key:" + digest
+    if trust_proxy and headers.get("x-forwarded-for"):
+        return "ip:" + headers.get("x-forwarded-for").split(",")[0].strip()
+    return "ip:" + (remote_addr or "unknown")
+
+
+def create_rate_limiter(config: dict = CHATBOT_CONFIG) -> Optional[RateLimiter]:
+    """
+    Crea el limitador por cliente según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        RateLimiter: Limitador, o None si está desactivado
+
+    Raises:
+        ImportError: Si el backend es "redis" y redis no está instalado
+    """
+    settings = config.get("rate_limit", {})
+    if not settings.get("enabled", False):
+        return None
+    memory = MemoryBucketBackend(settings.get("max_clients", 100000))
+    if settings.get("backend", "memory") == "redis":
+        backend = RedisBucketBackend(settings.get("redis_url", "redis://localhost:6379/0"),
+                                     fallback=memory)
+    else:
+        backend = memory
+    return RateLimiter(settings.get("rate", 1.0), settings.get("burst", 20), backend)
+
+
+def create_concurrency_limiter(config: dict = CHATBOT_CONFIG, asynchronous: bool = False):
+    """
+    Crea el límite global de peticiones en curso.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        asynchronous: Si es True se crea la versión para asyncio
+
+    Returns:
+        ConcurrencyLimiter o AsyncConcurrencyLimiter, o None si está desactivado
+    """
+    settings = config.get("rate_limit", {})
+    if not settings.get("enabled", False) or not settings.get("max_concurrency"):
+        return None
+    cls = AsyncConcurrencyLimiter if asynchronous else ConcurrencyLimiter
+    return cls(settings["max_concurrency"], settings.get("max_queue", 256),
+               settings.get("queue_timeout", 10))
@@ -0,0 +1,329 @@
+"""
+Reducción de consultas largas para Hades
+========================================
+
+Los usuarios pegan logs, trazas y archivos enteros. Antes de enviar la
+consulta al LLM (y después de validarla) se reduce en una sola pasada por
+líneas, con memoria acotada salvo el resultado:
+
+1. Se quitan los espacios al final de cada línea y las líneas en blanco
+   consecutivas se dejan en una.
+2. Los bloques de hasta ``max_period`` líneas que se repiten seguidos
+   (marcos de una recursión, una misma línea de log) se conservan una vez y
+   se sustituyen por una nota con el número de repeticiones. Al comparar se
+   ignoran las marcas de tiempo y las direcciones de memoria.
+3. Si aún supera ``max_tokens``, se conservan el principio y el final (donde
+   suelen estar la pregunta, el error y la causa) y se omite el centro.
+
+Las consultas de menos de ``min_chars`` caracteres se envían tal cual.
+"""
+
+from hades_context import count_tokens
+from config import CHATBOT_CONFIG
+from collections import deque
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+import re
+
+
+# Partes de una línea que cambian entre repeticiones de un mismo mensaje
+_VOLATILE = re.compile(
+    r"\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d(?:[.,]\d+)?(?:Z|[+-]\d\d:?\d\d)?"
+    r"|\b\d\d:\d\d:\d\d(?:[.,]\d+)?"
+    r"|0x[0-9a-fA-F]+"
+)
+
+# Caracteres por token al recortar una sola línea enorme (aproximado)
+CHARS_PER_TOKEN = 4
+
+# Tokens reservados para la nota de las líneas omitidas
+NOTE_TOKENS = 24
+
+
+class Reduction(NamedTuple):
+    """Resultado de reducir una consulta."""
+
+    text: str
+    original_chars: int
+    original_tokens: int
+    reduced_tokens: int
+    collapsed_lines: int = 0
+    omitted_lines: int = 0
+
+    def info(self) -> dict:
+        """Tamaños original y reducido, para los metadatos de la respuesta."""
+        return {
+            "original_chars": self.original_chars,
+            "reduced_chars": len(self.text),
+            "original_tokens": self.original_tokens,
+            "reduced_tokens": self.reduced_tokens,
+            "collapsed_lines": self.collapsed_lines,
+            "omitted_lines": self.omitted_lines,
+        }
+
+
+def _lines(text: str) -> Iterator[str]:
+    """Líneas del texto sin crear la lista completa."""
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def squeeze_whitespace(lines: Iterable[str]) -> Iterator[str]:
+    """Quita los espacios finales y deja una sola línea en blanco seguida."""
+    blank = True  # también descarta las líneas en blanco iniciales
+    for line in lines:
+        line = line.rstrip()
+        if not line:
+            if blank:
+                continue
+            blank = True
+        else:
+            blank = False
+        yield line
+
+
+def _repeat_note(period: int, repeats: int) -> str:
+    times = "vez" if repeats == 1 else "veces"
+    if period == 1:
+        return f"[… la línea anterior se repite {repeats} {times} más]"
+    return f"[… las {period} líneas anteriores se repiten {repeats} {times} más]"
+
+
+class RepeatCollapser:
+    """
+    Colapsa los bloques de líneas que se repiten seguidos.
+
+    Trabaja en streaming: cada línea se compara con las ``max_period``
+    últimas emitidas, así que el coste es lineal en el número de líneas.
+    """
+
+    def __init__(self, max_period: int = 8, min_repeats: int = 3):
+        """
+        Args:
+            max_period: Líneas máximas del bloque que se repite
+            min_repeats: Apariciones seguidas (incluida la primera) a partir
+                        de las que un bloque se colapsa
+        """
+        self.max_period = max_period
+        self.min_repeats = max(2, min_repeats)
+        self.collapsed = 0
+        self._history = deque(maxlen=max_period)  # claves de las líneas emitidas
+        self._pending = []     # (línea, clave) que coinciden con un bloque anterior
+        self._periods = []     # periodos candidatos mientras se busca un bloque
+        self._period = None    # periodo del bloque que se está repitiendo
+        self._repeats = 0      # copias completas del bloque tras la primera
+        self._held = []        # copias retenidas hasta llegar a min_repeats
+        self._output = []
+
+    def process(self, lines: Iterable[str]) -> Iterator[str]:
+        """Genera las líneas de entrada con las repeticiones colapsadas."""
+        for line in lines:
+            self._feed(line, _VOLATILE.sub("#", line))
+            if self._output:
+                yield from self._output
+                self._output.clear()
+        self._finish()
+        yield from self._output
+        self._output.clear()
+
+    def _emit(self, line: str, key: Optional[str]):
+        self._output.append(line)
+        if key is None:
+            self._history.clear()
+        else:
+            self._history.append(key)
+
+    def _feed(self, line: str, key: str):
+        work = deque([(line, key)])
+        while work:
+            line, key = work.popleft()
+            if self._period is not None:
+                self._feed_repeat(line, key, work)
+            else:
+                self._feed_search(line, key, work)
+
+    def _feed_search(self, line: str, key: str, work: deque):
+        history = self._history
+        offset = len(self._pending)
+        if offset == 0:
+            self._periods = [period for period in range(1, len(history) + 1)
+                             if history[-period] == key]
+        else:
+            self._periods = [period for period in self._periods
+                             if period > offset and history[-period + offset] == key]
+        if not self._periods:
+            if not self._pending:
+                self._emit(line, key)
+                return
+            # El bloque no se repite: se emite la primera línea y el resto
+            # se vuelve a examinar por si empieza otra repetición
+            pending, self._pending = self._pending, []
+            self._emit(*pending[0])
+            work.extendleft(reversed(pending[1:] + [(line, key)]))
+            return
+        self._pending.append((line, key))
+        if len(self._pending) == self._periods[0]:
+            # Una copia completa del bloque (el periodo más corto que encaja)
+            self._period = self._periods[0]
+            self._repeats = 1
+            self._held, self._pending = self._pending, []
+            self._confirm()
+
+    def _feed_repeat(self, line: str, key: str, work: deque):
+        offset = len(self._pending)
+        if self._history[-self._period + offset] != key:
+            self._end_repeat()
+            work.extendleft(reversed(self._pending + [(line, key)]))
+            self._pending = []
+            return
+        self._pending.append((line, key))
+        if len(self._pending) == self._period:
+            self._repeats += 1
+            if self._held is not None:
+                self._held.extend(self._pending)
+            self._pending = []
+            self._confirm()
+
+    def _confirm(self):
+        if self._held is not None and self._repeats + 1 >= self.min_repeats:
+            self._held = None
+
+    def _end_repeat(self):
+        if self._held is None:
+            self.collapsed += self._repeats * self._period
+            self._emit(_repeat_note(self._period, self._repeats), None)
+        else:
+            for line, key in self._held:
+                self._emit(line, key)
+        self._period = None
+        self._held = []
+
+    def _finish(self):
+        if self._period is not None:
+            self._end_repeat()
+        while self._pending:
+            pending, self._pending = self._pending, []
+            self._emit(*pending[0])
+            for line, key in pending[1:]:
+                self._feed(line, key)
+            if self._period is not None:
+                self._end_repeat()
+
+
+class InputReducer:
+    """Reduce las consultas largas antes de enviarlas al LLM."""
+
+    def __init__(self, max_tokens: int = 4000, min_chars: int = 2000,
+                 head_ratio: float = 0.4, max_period: int = 8, min_repeats: int = 3,
+                 counter: Callable[[str], int] = count_tokens):
+        """
+        Args:
+            max_tokens: Techo de tokens de la consulta reducida
+            min_chars: Las consultas más cortas no se modifican
+            head_ratio: Fracción del techo reservada al principio de la
+                       consulta; el resto es para el final
+            max_period: Líneas máximas de un bloque repetido
+            min_repeats: Apariciones seguidas para colapsar un bloque
+            counter: Función que cuenta los tokens de un texto
+        """
+        self.max_tokens = max_tokens
+        self.min_chars = min_chars
+        self.head_ratio = head_ratio
+        self.max_period = max_period
+        self.min_repeats = min_repeats
+        self.counter = counter
+
+    def reduce(self, text: str) -> Reduction:
+        """
+        Reduce una consulta.
+
+        Args:
+            text: Consulta del usuario (ya validada)
+
+        Returns:
+            Reduction: Texto reducido y tamaños original y final
+        """
+        original_tokens = self.counter(text)
+        if len(text) < self.min_chars:
+            return Reduction(text, len(text), original_tokens, original_tokens)
+        collapser = RepeatCollapser(self.max_period, self.min_repeats)
+        lines, omitted = self._head_and_tail(
+            collapser.process(squeeze_whitespace(_lines(text))))
+        while lines and not lines[-1]:
+            lines.pop()
+        reduced = "\n".join(lines)
+        return Reduction(reduced, len(text), original_tokens, self.counter(reduced),
+                         collapser.collapsed, omitted)
+
+    def _head_and_tail(self, lines: Iterable[str]) -> tuple[list[str], int]:
+        """
+        Aplica el techo de tokens conservando el principio y el final.
+
+        Returns:
+            tuple: (líneas resultantes, número de líneas omitidas)
+        """
+        head_budget = int(self.max_tokens * self.head_ratio)
+        head, head_tokens = [], 0
+        tail, tail_tokens = deque(), 0
+        tail_budget = None  # se fija al cerrar el principio
+        omitted = omitted_tokens = 0
+        for line in lines:
+            cost = self.counter(line) + 1
+            if tail_budget is None:
+                if head_tokens + cost <= head_budget:
+                    head.append(line)
+                    head_tokens += cost
+                    continue
+                # Lo que el principio no usa es para el final, menos la nota
+                tail_budget = self.max_tokens - head_tokens - NOTE_TOKENS
+            tail.append((line, cost))
+            tail_tokens += cost
+            while tail_tokens > tail_budget and len(tail) > 1:
+                _, dropped = tail.popleft()
+                tail_tokens -= dropped
+                omitted += 1
+                omitted_tokens += dropped
+        if tail and tail_tokens > tail_budget:
+            # Una línea enorme (p. ej. código minificado): se recorta por
+            # caracteres; si es la única, se conservan sus dos extremos
+            line, _ = tail.pop()
+            keep = max(0, tail_budget - 2) * CHARS_PER_TOKEN
+            if head:
+                line = "… " + line[len(line) - keep:]
+            else:
+                start = int(keep * self.head_ratio)
+                line = line[:start] + " … " + line[len(line) - (keep - start):]
+            tail.append((line, 0))
+        result = head
+        if omitted:
+            lines_text = "1 línea" if omitted == 1 else f"{omitted} líneas"
+            result.append(f"[… se omitieron {lines_text} (unos {omitted_tokens} tokens) …]")
+        result.extend(line for line, _ in tail)
+        return result, omitted
+
+
+def create_input_reducer(config: dict = CHATBOT_CONFIG) -> Optional[InputReducer]:
+    """
+    Crea el reductor de consultas según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        InputReducer: Reductor configurado, o None si está desactivado
+    """
+    settings = config.get("input_reduction", {})
+    if not settings.get("enabled", True):
+        return None
+    return InputReducer(
+        max_tokens=settings.get("max_tokens", 4000),
+        min_chars=settings.get("min_chars", 2000),
+        head_ratio=settings.get("head_ratio", 0.4),
+        max_period=settings.get("max_period", 8),
+        min_repeats=settings.get("min_repeats", 3),
+    )
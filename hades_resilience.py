@@ -0,0 +1,415 @@
+"""
+Resiliencia para los callbacks de LLM
+=====================================
+
+Envuelve un callback de LLM con:
+
+- Plazo máximo por petición (el worker no queda bloqueado si el proveedor
+  se cuelga).
+- Reintentos con backoff exponencial y jitter ante 429, 5xx, timeouts y
+  errores de conexión.
+- Circuit breaker que falla de inmediato mientras el proveedor está caído.
+- Peticiones "hedged": si la primera no responde en cierto tiempo se lanza
+  una segunda y se usa la que termine antes.
+- Métricas de reintentos, timeouts, hedges y rechazos por circuito abierto.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from config import CHATBOT_CONFIG
+from typing import Callable, Optional
+import asyncio
+import contextvars
+import inspect
+import random
+import threading
+import time
+
+
+# Códigos HTTP que merece la pena reintentar
+RETRYABLE_STATUS = frozenset({408, 409, 425, 429})
+
+_END = object()
+
+
+class CircuitOpenError(RuntimeError):
+    """El proveedor de LLM está marcado como caído."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """El LLM no respondió dentro del plazo de la petición."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Indica si un error del proveedor es transitorio.
+
+    Reconoce los errores de los SDK de OpenAI y Anthropic por su código HTTP
+    (atributo ``status_code``) o por el nombre de la clase (timeouts y
+    errores de conexión).
+
+    Args:
+        error: Excepción lanzada por el callback
+
+    Returns:
+        bool: True si se debe reintentar
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por fallos consecutivos.
+
+    Tras ``failure_threshold`` fallos seguidos el circuito se abre durante
+    ``reset_timeout`` segundos; después deja pasar una petición de prueba
+    (semiabierto) y se cierra si tiene éxito.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Indica si se puede enviar una petición al proveedor."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def release(self):
+        """
+        Termina una petición sin contarla como éxito ni como fallo (un error
+        del cliente, como un 400, no dice nada de la salud del proveedor).
+        En estado semiabierto se podrá enviar otra petición de prueba.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class _ResilienceBase:
+    """Configuración, métricas y circuit breaker comunes."""
+
+    def __init__(self, callback: Callable, timeout: Optional[float] = 30,
+                 max_retries: int = 2, backoff_base: float = 0.5,
+                 backoff_max: float = 8, failure_threshold: int = 5,
+                 reset_timeout: float = 30, hedge_delay: Optional[float] = None,
+                 clock=time.monotonic):
+        """
+        Args:
+            callback: Callback de LLM a proteger
+            timeout: Plazo total por petición en segundos (None = sin plazo)
+            max_retries: Reintentos máximos ante errores transitorios
+            backoff_base: Espera base del backoff exponencial en segundos
+            backoff_max: Espera máxima entre reintentos en segundos
+            failure_threshold: Fallos consecutivos que abren el circuito
+            reset_timeout: Segundos que el circuito permanece abierto
+            hedge_delay: Segundos tras los que se lanza una petición
+                        duplicada (None desactiva el hedging)
+            clock: Función que retorna el tiempo actual en segundos
+        """
+        self.callback = callback
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_delay = hedge_delay
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+        self.model = getattr(callback, "model", "")
+        self.provider = getattr(callback, "provider", None)
+        self.supports_history = getattr(callback, "supports_history", False)
+        self._clock = clock
+        self._metrics = {"calls": 0, "retries": 0, "timeouts": 0, "hedges": 0,
+                         "failures": 0, "circuit_rejections": 0}
+        self._metrics_lock = threading.Lock()
+
+    def warmup(self):
+        """Prepara el callback envuelto (importa el SDK y crea el cliente)."""
+        warmup = getattr(self.callback, "warmup", None)
+        if warmup is not None:
+            warmup()
+
+    def _count(self, name: str):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    def _deadline(self) -> Optional[float]:
+        return None if self.timeout is None else self._clock() + self.timeout
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - self._clock())
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial con jitter completo."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            self._count("circuit_rejections")
+            raise CircuitOpenError(
+                "El proveedor de LLM no está disponible en este momento."
+            )
+
+    def _retry_delay(self, error: Exception, attempt: int,
+                     deadline: Optional[float]) -> Optional[float]:
+        """
+        Registra un fallo y decide si se reintenta.
+
+        Returns:
+            float: Segundos a esperar antes de reintentar, o None si no se
+                  debe reintentar
+        """
+        retryable = is_retryable(error)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+        if not retryable or attempt >= self.max_retries:
+            self._count("failures")
+            return None
+        delay = self._backoff(attempt)
+        remaining = self._remaining(deadline)
+        if remaining is not None and delay >= remaining:
+            self._count("failures")
+            return None
+        self._count("retries")
+        return delay
+
+    def stats(self) -> dict:
+        """Retorna las métricas y el estado del circuito."""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["circuit_state"] = self.breaker.state
+        metrics["circuit_opened"] = self.breaker.opened
+        return metrics
+
+
+class ResilientCallback(_ResilienceBase):
+    """Callback de LLM síncrono con plazo, reintentos, circuit breaker y hedging."""
+
+    # Hilos compartidos para aplicar los plazos a callbacks bloqueantes
+    _executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hades-llm")
+
+    def __init__(self, callback: Callable, **options):
+        super().__init__(callback, **options)
+        inner_stream = getattr(callback, "stream", None)
+        self.stream = self._wrap_stream(inner_stream) if inner_stream else None
+
+    def __call__(self, user_query: str, **kwargs) -> str:
+        self._count("calls")
+        return self._run(lambda: self.callback(user_query, **kwargs))
+
+    def _run(self, func: Callable):
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            self._check_circuit()
+            try:
+                result = self._attempt(func, deadline)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _attempt(self, func: Callable, deadline: Optional[float]):
+        """Ejecuta un intento (con su posible petición duplicada) dentro del plazo."""
+        if deadline is None and self.hedge_delay is None:
+            return func()
+
+        # Cada intento corre con una copia del contexto de la petición: la
+        # instantánea fijada (hades_snapshot.pinned) y el span en curso
+        futures = [self._executor.submit(contextvars.copy_context().run, func)]
+        if self.hedge_delay is not None:
+            remaining = self._remaining(deadline)
+            first_wait = self.hedge_delay if remaining is None else min(self.hedge_delay, remaining)
+            done, _ = wait(futures, timeout=first_wait)
+            if not done and (remaining is None or remaining > self.hedge_delay):
+                self._count("hedges")
+                futures.append(self._executor.submit(contextvars.copy_context().run, func))
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=self._remaining(deadline),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                self._count("timeouts")
+                raise DeadlineExceededError(
+                    f"El LLM no respondió en {self.timeout} segundos."
+                )
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def _wrap_stream(self, inner_stream: Callable) -> Callable:
+        """Aplica la política al inicio del stream (hasta el primer fragmento)."""
+
+        def stream(user_query: str, **kwargs):
+            self._count("calls")
+
+            def start():
+                iterator = iter(inner_stream(user_query, **kwargs))
+                return iterator, next(iterator, _END)
+
+            iterator, first = self._run(start)
+            if first is _END:
+                return
+            yield first
+            yield from iterator
+
+        return stream
+
+
+class AsyncResilientCallback(_ResilienceBase):
+    """Callback de LLM asíncrono con plazo, reintentos, circuit breaker y hedging."""
+
+    def __init__(self, callback: Callable, **options):
+        super().__init__(callback, **options)
+        inner_stream = getattr(callback, "stream", None)
+        self.stream = self._wrap_stream(inner_stream) if inner_stream else None
+
+    async def __call__(self, user_query: str, **kwargs) -> str:
+        self._count("calls")
+        return await self._run(lambda: self.callback(user_query, **kwargs))
+
+    async def _run(self, factory: Callable):
+        deadline = self._deadline()
+        attempt = 0
+        while True:
+            self._check_circuit()
+            try:
+                result = await self._attempt(factory, deadline)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _attempt(self, factory: Callable, deadline: Optional[float]):
+        """Ejecuta un intento (con su posible petición duplicada) dentro del plazo."""
+        tasks = [asyncio.ensure_future(factory())]
+        try:
+            if self.hedge_delay is not None:
+                remaining = self._remaining(deadline)
+                first_wait = self.hedge_delay if remaining is None else min(self.hedge_delay, remaining)
+                done, _ = await asyncio.wait(tasks, timeout=first_wait)
+                if not done and (remaining is None or remaining > self.hedge_delay):
+                    self._count("hedges")
+                    tasks.append(asyncio.ensure_future(factory()))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=self._remaining(deadline),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._count("timeouts")
+                    raise DeadlineExceededError(
+                        f"El LLM no respondió en {self.timeout} segundos."
+                    )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _wrap_stream(self, inner_stream: Callable) -> Callable:
+        """Aplica la política al inicio del stream (hasta el primer fragmento)."""
+
+        async def stream(user_query: str, **kwargs):
+            self._count("calls")
+
+            async def start():
+                iterator = inner_stream(user_query, **kwargs).__aiter__()
+                try:
+                    return iterator, await iterator.__anext__()
+                except StopAsyncIteration:
+                    return iterator, _END
+
+            iterator, first = await self._run(start)
+            if first is _END:
+                return
+            yield first
+            async for chunk in iterator:
+                yield chunk
+
+        return stream
+
+
+def with_resilience(callback: Callable, config: dict = CHATBOT_CONFIG, **overrides):
+    """
+    Envuelve un callback de LLM con la política de resiliencia.
+
+    Args:
+        callback: Callback de LLM, síncrono o asíncrono
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        **overrides: Opciones que sustituyen a CHATBOT_CONFIG["resilience"]
+
+    Returns:
+        ResilientCallback o AsyncResilientCallback según el tipo de callback
+    """
+    options = dict(config.get("resilience", {}))
+    options.update(overrides)
+    is_async = (inspect.iscoroutinefunction(callback)
+                or inspect.iscoroutinefunction(getattr(callback, "__call__", None)))
+    cls = AsyncResilientCallback if is_async else ResilientCallback
+    return cls(callback, **options)
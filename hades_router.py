@@ -0,0 +1,338 @@
+"""
+Enrutador de proveedores de LLM
+===============================
+
+Reparte las consultas entre varios backends (proveedores, cuentas o
+regiones). Para cada backend mantiene una media móvil exponencial (EWMA) de
+la latencia y de la tasa de errores, envía cada petición al backend sano más
+rápido, respeta su límite de concurrencia y, si falla, prueba con el
+siguiente.
+
+La tasa de errores también decae con el tiempo (``error_half_life``): un
+backend que dejó de recibir tráfico por fallar vuelve a considerarse sano
+pasado un rato, y su siguiente petición sirve de prueba.
+"""
+
+from hades_providers import create_async_llm_integration, create_llm_integration
+from hades_resilience import with_resilience
+from hades_scheduler import with_scheduler
+from config import CHATBOT_CONFIG
+from typing import Callable, Optional
+import inspect
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger("hades.router")
+
+_END = object()
+
+
+class NoBackendAvailableError(RuntimeError):
+    """Todos los backends están saturados o han fallado."""
+
+
+class Backend:
+    """Estado de enrutamiento de un backend."""
+
+    __slots__ = ("name", "callback", "max_concurrency", "in_flight",
+                 "latency", "error_rate", "updated", "requests", "errors")
+
+    def __init__(self, name: str, callback: Callable, max_concurrency: int = 16):
+        self.name = name
+        self.callback = callback
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.latency = None  # EWMA en segundos; None = sin medir todavía
+        self.error_rate = 0.0
+        self.updated = 0.0   # instante de la última actualización de error_rate
+        self.requests = 0
+        self.errors = 0
+
+    def circuit_open(self) -> bool:
+        breaker = getattr(self.callback, "breaker", None)
+        return breaker is not None and breaker.state == breaker.OPEN
+
+    def as_dict(self) -> dict:
+        stats = getattr(self.callback, "stats", None)
+        return {
+            "name": self.name,
+            "model": getattr(self.callback, "model", ""),
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "errors": self.errors,
+            "resilience": stats() if stats else None,
+        }
+
+
+class _RouterBase:
+    """Selección de backends y actualización de las medias móviles."""
+
+    def __init__(self, backends: list[Backend], alpha: float = 0.2,
+                 error_threshold: float = 0.5, error_half_life: Optional[float] = 30,
+                 clock=time.monotonic):
+        """
+        Args:
+            backends: Backends disponibles
+            alpha: Peso de la última observación en las medias móviles (0-1)
+            error_threshold: Tasa de errores a partir de la que un backend
+                            se considera no sano
+            error_half_life: Segundos en los que la tasa de errores se
+                            reduce a la mitad sin nuevas observaciones
+                            (None = sin decaimiento)
+            clock: Función que retorna el tiempo actual en segundos
+        """
+        if not backends:
+            raise ValueError("El enrutador necesita al menos un backend")
+        self.backends = backends
+        self.alpha = alpha
+        self.error_threshold = error_threshold
+        self.error_half_life = error_half_life
+        self.model = "router:" + ",".join(
+            f"{backend.name}={getattr(backend.callback, 'model', '')}" for backend in backends
+        )
+        self.supports_history = all(
+            getattr(backend.callback, "supports_history", False) for backend in backends
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        for backend in backends:
+            backend.updated = clock()
+
+    def warmup(self):
+        """Prepara los callbacks de todos los backends."""
+        for backend in self.backends:
+            warmup = getattr(backend.callback, "warmup", None)
+            if warmup is not None:
+                warmup()
+
+    def _score(self, backend: Backend) -> float:
+        latency = backend.latency or 0.0
+        return latency * (1 + backend.in_flight / backend.max_concurrency)
+
+    def _decay(self, backend: Backend, now: float):
+        """Aplica a la tasa de errores el decaimiento desde su última actualización."""
+        if self.error_half_life and backend.error_rate:
+            backend.error_rate *= 0.5 ** ((now - backend.updated) / self.error_half_life)
+        backend.updated = now
+
+    def _candidates(self) -> list[Backend]:
+        """Backends por orden de preferencia: primero los sanos y más rápidos."""
+        now = self._clock()
+        with self._lock:
+            healthy, degraded = [], []
+            for backend in self.backends:
+                self._decay(backend, now)
+                if backend.circuit_open():
+                    continue
+                if backend.error_rate >= self.error_threshold:
+                    degraded.append(backend)
+                else:
+                    healthy.append(backend)
+            healthy.sort(key=self._score)
+            degraded.sort(key=lambda backend: backend.error_rate)
+            return healthy + degraded
+
+    def _acquire(self, backend: Backend) -> bool:
+        with self._lock:
+            if backend.in_flight >= backend.max_concurrency:
+                return False
+            backend.in_flight += 1
+            backend.requests += 1
+            return True
+
+    def _release(self, backend: Backend, started: float, failed: bool):
+        now = self._clock()
+        elapsed = now - started
+        with self._lock:
+            backend.in_flight -= 1
+            self._decay(backend, now)
+            alpha = self.alpha
+            backend.error_rate = (1 - alpha) * backend.error_rate + alpha * (1.0 if failed else 0.0)
+            if failed:
+                backend.errors += 1
+            elif backend.latency is None:
+                backend.latency = elapsed
+            else:
+                backend.latency = (1 - alpha) * backend.latency + alpha * elapsed
+
+    @staticmethod
+    def _unavailable(error: Optional[Exception]) -> Exception:
+        if error is not None:
+            return error
+        return NoBackendAvailableError(
+            "Todos los proveedores de LLM están ocupados. Inténtalo de nuevo en unos segundos."
+        )
+
+    def stats(self) -> list[dict]:
+        """Retorna la tabla de enrutamiento."""
+        now = self._clock()
+        with self._lock:
+            for backend in self.backends:
+                self._decay(backend, now)
+            return [backend.as_dict() for backend in self.backends]
+
+
+class LLMRouter(_RouterBase):
+    """Callback de LLM síncrono que enruta entre varios backends."""
+
+    def __init__(self, backends: list[Backend], **options):
+        super().__init__(backends, **options)
+        if all(getattr(backend.callback, "stream", None) for backend in backends):
+            self.stream = self._stream
+        else:
+            self.stream = None
+
+    def _route(self, call: Callable):
+        error = None
+        for backend in self._candidates():
+            if not self._acquire(backend):
+                continue
+            started = self._clock()
+            try:
+                result = call(backend)
+            except Exception as e:
+                self._release(backend, started, failed=True)
+                error = e
+                continue
+            self._release(backend, started, failed=False)
+            return result
+        raise self._unavailable(error)
+
+    def __call__(self, user_query: str, **kwargs) -> str:
+        return self._route(lambda backend: backend.callback(user_query, **kwargs))
+
+    def _stream(self, user_query: str, **kwargs):
+        def start(backend):
+            iterator = iter(backend.callback.stream(user_query, **kwargs))
+            return iterator, next(iterator, _END)
+
+        # La latencia medida es el tiempo hasta el primer fragmento
+        iterator, first = self._route(start)
+        if first is _END:
+            return
+        yield first
+        yield from iterator
+
+
+class AsyncLLMRouter(_RouterBase):
+    """Callback de LLM asíncrono que enruta entre varios backends."""
+
+    def __init__(self, backends: list[Backend], **options):
+        super().__init__(backends, **options)
+        if all(getattr(backend.callback, "stream", None) for backend in backends):
+            self.stream = self._stream
+        else:
+            self.stream = None
+
+    async def _route(self, call: Callable):
+        error = None
+        for backend in self._candidates():
+            if not self._acquire(backend):
+                continue
+            started = self._clock()
+            try:
+                result = await call(backend)
+            except Exception as e:
+                self._release(backend, started, failed=True)
+                error = e
+                continue
+            self._release(backend, started, failed=False)
+            return result
+        raise self._unavailable(error)
+
+    async def __call__(self, user_query: str, **kwargs) -> str:
+        return await self._route(lambda backend: backend.callback(user_query, **kwargs))
+
+    async def _stream(self, user_query: str, **kwargs):
+        async def start(backend):
+            iterator = backend.callback.stream(user_query, **kwargs).__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, _END
+
+        iterator, first = await self._route(start)
+        if first is _END:
+            return
+        yield first
+        async for chunk in iterator:
+            yield chunk
+
+
+def create_router(callbacks: dict, config: dict = CHATBOT_CONFIG):
+    """
+    Crea un enrutador a partir de varios callbacks de LLM.
+
+    Args:
+        callbacks: Diccionario {nombre: callback}; todos deben ser síncronos
+                  o todos asíncronos
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        LLMRouter o AsyncLLMRouter según el tipo de los callbacks
+    """
+    settings = config.get("router", {})
+    limits = settings.get("max_concurrency", {})
+    default_limit = limits.get("default", 16) if isinstance(limits, dict) else limits
+    backends = [
+        Backend(name, callback,
+                limits.get(name, default_limit) if isinstance(limits, dict) else limits)
+        for name, callback in callbacks.items()
+    ]
+    is_async = [
+        inspect.iscoroutinefunction(callback)
+        or inspect.iscoroutinefunction(getattr(callback, "__call__", None))
+        for callback in callbacks.values()
+    ]
+    if any(is_async) and not all(is_async):
+        raise ValueError("No se pueden mezclar callbacks síncronos y asíncronos")
+    cls = AsyncLLMRouter if all(is_async) else LLMRouter
+    return cls(backends, alpha=settings.get("alpha", 0.2),
+               error_threshold=settings.get("error_threshold", 0.5),
+               error_half_life=settings.get("error_half_life", 30))
+
+
+def create_llm_callback_from_env(asynchronous: bool = False, config: dict = CHATBOT_CONFIG):
+    """
+    Configura los proveedores de LLM disponibles en las variables de entorno.
+
+    Cada proveedor con credenciales (OPENAI_API_KEY, ANTHROPIC_API_KEY,
+    AZURE_OPENAI_ENDPOINT) se envuelve con la política de resiliencia. Si hay
+    más de uno se combinan en un enrutador. Delante de todo se coloca el
+    planificador por prioridad.
+
+    Un proveedor mal configurado (falta su SDK, o el deployment de Azure) se
+    omite con un aviso en el log en lugar de desactivar a los demás.
+
+    Args:
+        asynchronous: Si es True se crean callbacks asíncronos
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        Callable: Callback de LLM, o None si no hay ningún proveedor utilizable
+    """
+    factory = create_async_llm_integration if asynchronous else create_llm_integration
+    available = {
+        "openai": os.getenv("OPENAI_API_KEY"),
+        "anthropic": os.getenv("ANTHROPIC_API_KEY"),
+        "azure": os.getenv("AZURE_OPENAI_ENDPOINT"),
+    }
+    callbacks = {}
+    for provider, configured in available.items():
+        if not configured:
+            continue
+        try:
+            callbacks[provider] = with_resilience(factory(provider, config=config), config)
+        except (ImportError, ValueError) as e:
+            logger.warning("Se omite el proveedor %s: %s", provider, e)
+    if not callbacks:
+        return None
+    if len(callbacks) == 1:
+        return with_scheduler(next(iter(callbacks.values())), config)
+    return with_scheduler(create_router(callbacks, config), config)
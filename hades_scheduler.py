@@ -0,0 +1,350 @@
+"""
+Planificador de llamadas al LLM
+===============================
+
+Se coloca delante del callback de LLM y decide el orden en que se atienden
+las llamadas cuando hay más que huecos de concurrencia:
+
+- Clases de prioridad estricta: interactive > batch > background. Un lote
+  masivo nunca retrasa a un usuario interactivo.
+- Dentro de cada clase, reparto justo ponderado (weighted fair queuing)
+  entre tenants: cada llamada recibe una etiqueta de fin virtual
+  ``max(tiempo virtual, último fin del tenant) + 1 / peso`` y se atiende la
+  menor.
+- Las llamadas cuyo plazo ya venció mientras esperaban se descartan sin
+  llegar al proveedor: su cliente ya no espera la respuesta.
+
+La prioridad, el tenant y el plazo de la petición en curso se fijan con
+``scheduling()`` y viajan en una ContextVar, sin cambiar la firma de los
+callbacks.
+"""
+
+from hades_metrics import METRICS
+from hades_resilience import DeadlineExceededError
+from config import CHATBOT_CONFIG
+from contextlib import contextmanager
+from typing import Callable, Optional
+import asyncio
+import contextvars
+import heapq
+import inspect
+import itertools
+import threading
+import time
+
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+
+# Clases de prioridad, de mayor a menor
+PRIORITIES = (INTERACTIVE, BATCH, BACKGROUND)
+
+# (prioridad, tenant, plazo absoluto) de la petición en curso
+_request = contextvars.ContextVar("hades_schedule", default=None)
+
+WAIT_SECONDS = METRICS.histogram(
+    "hades_scheduler_wait_seconds", "Espera en la cola del planificador", ("priority",))
+
+
+@contextmanager
+def scheduling(priority: str = INTERACTIVE, tenant: str = "default",
+               timeout: Optional[float] = None, clock=time.monotonic):
+    """
+    Fija la prioridad, el tenant y el plazo de las llamadas al LLM del bloque.
+
+    Args:
+        priority: "interactive", "batch" o "background"
+        tenant: Cliente o equipo al que se atribuye la llamada
+        timeout: Segundos que el cliente está dispuesto a esperar (None usa
+                el plazo por defecto de la clase)
+        clock: Función que retorna el tiempo actual en segundos
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Prioridad desconocida: {priority}")
+    deadline = None if timeout is None else clock() + timeout
+    token = _request.set((PRIORITIES.index(priority), tenant, deadline))
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+class _Waiter:
+    """Llamada esperando un hueco."""
+
+    __slots__ = ("priority", "tenant", "deadline", "enqueued", "granted", "cancelled", "wake")
+
+    def __init__(self, priority: int, tenant: str, deadline: Optional[float], enqueued: float):
+        self.priority = priority
+        self.tenant = tenant
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.granted = False
+        self.cancelled = False
+        self.wake = None
+
+
+class _SchedulerBase:
+    """Colas por prioridad y reparto justo entre tenants."""
+
+    def __init__(self, callback: Callable, max_concurrency: int = 32,
+                 tenant_weights: Optional[dict] = None,
+                 timeouts: Optional[dict] = None, clock=time.monotonic):
+        """
+        Args:
+            callback: Callback de LLM a planificar
+            max_concurrency: Llamadas simultáneas al callback
+            tenant_weights: Peso relativo de cada tenant (1 por defecto)
+            timeouts: Plazo por defecto de cada clase de prioridad (segundos)
+            clock: Función que retorna el tiempo actual en segundos
+        """
+        self.callback = callback
+        self.model = getattr(callback, "model", "")
+        self.provider = getattr(callback, "provider", "")
+        self.supports_history = getattr(callback, "supports_history", False)
+        self.max_concurrency = max_concurrency
+        self.tenant_weights = tenant_weights or {}
+        self.timeouts = [(timeouts or {}).get(priority) for priority in PRIORITIES]
+        self.in_flight = 0
+        self.dropped = 0
+        self._clock = clock
+        self._queues = [[] for _ in PRIORITIES]
+        self._virtual = [0.0] * len(PRIORITIES)
+        self._finish = {}
+        self._seq = itertools.count()
+        self._waits = [[0, 0.0] for _ in PRIORITIES]  # llamadas, segundos
+        self._lock = threading.Lock()
+
+    def warmup(self):
+        """Prepara el callback envuelto (importa el SDK y crea el cliente)."""
+        warmup = getattr(self.callback, "warmup", None)
+        if warmup is not None:
+            warmup()
+
+    def _new_waiter(self) -> _Waiter:
+        now = self._clock()
+        priority, tenant, deadline = _request.get() or (0, "default", None)
+        if deadline is None and self.timeouts[priority] is not None:
+            deadline = now + self.timeouts[priority]
+        return _Waiter(priority, tenant, deadline, now)
+
+    def _admit(self, waiter: _Waiter) -> bool:
+        """Ocupa un hueco libre o encola la llamada (con el lock tomado)."""
+        if self.in_flight < self.max_concurrency and not any(self._queues):
+            self.in_flight += 1
+            waiter.granted = True
+            self._record_wait(waiter)
+            return True
+        key = (waiter.priority, waiter.tenant)
+        start = max(self._virtual[waiter.priority], self._finish.get(key, 0.0))
+        tag = start + 1.0 / self.tenant_weights.get(waiter.tenant, 1.0)
+        self._finish[key] = tag
+        if len(self._finish) > 10000:
+            self._prune_tags()
+        heapq.heappush(self._queues[waiter.priority], (tag, next(self._seq), waiter))
+        return False
+
+    def _prune_tags(self):
+        """Olvida los tenants cuya etiqueta ya quedó por detrás del tiempo virtual."""
+        self._finish = {key: tag for key, tag in self._finish.items()
+                        if tag > self._virtual[key[0]]}
+
+    def _release(self):
+        """Cede el hueco a la siguiente llamada o lo libera."""
+        woken = []
+        with self._lock:
+            now = self._clock()
+            granted = None
+            for priority, queue in enumerate(self._queues):
+                while queue and granted is None:
+                    tag, _, waiter = heapq.heappop(queue)
+                    if waiter.cancelled:
+                        continue
+                    if waiter.deadline is not None and waiter.deadline <= now:
+                        # El cliente ya no espera: se descarta sin llamar al LLM
+                        waiter.cancelled = True
+                        self.dropped += 1
+                        woken.append(waiter)
+                        continue
+                    self._virtual[priority] = tag
+                    waiter.granted = True
+                    self._record_wait(waiter)
+                    granted = waiter
+                if granted is not None:
+                    break
+            if granted is None:
+                self.in_flight -= 1
+            else:
+                woken.append(granted)
+        for waiter in woken:
+            waiter.wake()
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """
+        Retira una llamada cuyo plazo venció esperando.
+
+        Returns:
+            bool: True si, pese a todo, ya se le había concedido un hueco
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            if not waiter.cancelled:
+                waiter.cancelled = True
+                self.dropped += 1
+            return False
+
+    def _record_wait(self, waiter: _Waiter):
+        waited = self._clock() - waiter.enqueued
+        stats = self._waits[waiter.priority]
+        stats[0] += 1
+        stats[1] += waited
+        WAIT_SECONDS.observe(waited, PRIORITIES[waiter.priority])
+
+    @staticmethod
+    def _expired() -> DeadlineExceededError:
+        return DeadlineExceededError(
+            "La consulta superó su plazo mientras esperaba turno para el LLM."
+        )
+
+    def stats(self) -> dict:
+        """Retorna la profundidad de las colas, las esperas y el callback interno."""
+        with self._lock:
+            queues = {}
+            for priority, name in enumerate(PRIORITIES):
+                calls, waited = self._waits[priority]
+                queues[name] = {
+                    "depth": sum(1 for _, _, waiter in self._queues[priority]
+                                 if not waiter.cancelled),
+                    "dispatched": calls,
+                    "avg_wait_ms": round(waited / calls * 1000, 2) if calls else 0.0,
+                }
+            result = {
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "dropped": self.dropped,
+                "queues": queues,
+            }
+        inner = getattr(self.callback, "stats", None)
+        result["upstream"] = inner() if inner else None
+        return result
+
+    def queue_metrics(self):
+        """Colector de métricas con la profundidad de cada cola."""
+        stats = self.stats()
+        yield ("hades_scheduler_queue_depth", "gauge", "Llamadas esperando turno por prioridad",
+               [({"priority": name}, queue["depth"]) for name, queue in stats["queues"].items()])
+        yield ("hades_scheduler_dropped_total", "counter",
+               "Llamadas descartadas por plazo vencido en la cola", [({}, stats["dropped"])])
+
+
+class PriorityScheduler(_SchedulerBase):
+    """Planificador para callbacks síncronos (servidores con hilos)."""
+
+    def __init__(self, callback: Callable, **options):
+        super().__init__(callback, **options)
+        inner_stream = getattr(callback, "stream", None)
+        self.stream = self._stream if inner_stream else None
+
+    def _acquire(self):
+        waiter = self._new_waiter()
+        with self._lock:
+            if self._admit(waiter):
+                return
+            event = threading.Event()
+            waiter.wake = event.set
+        timeout = None if waiter.deadline is None else max(0.0, waiter.deadline - self._clock())
+        event.wait(timeout)
+        if not self._abandon(waiter):
+            raise self._expired()
+
+    def __call__(self, user_query: str, **kwargs) -> str:
+        self._acquire()
+        try:
+            return self.callback(user_query, **kwargs)
+        finally:
+            self._release()
+
+    def _stream(self, user_query: str, **kwargs):
+        self._acquire()
+        try:
+            yield from self.callback.stream(user_query, **kwargs)
+        finally:
+            self._release()
+
+
+class AsyncPriorityScheduler(_SchedulerBase):
+    """Planificador para callbacks asíncronos."""
+
+    def __init__(self, callback: Callable, **options):
+        super().__init__(callback, **options)
+        inner_stream = getattr(callback, "stream", None)
+        self.stream = self._stream if inner_stream else None
+
+    async def _acquire(self):
+        waiter = self._new_waiter()
+        with self._lock:
+            if self._admit(waiter):
+                return
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            waiter.wake = wake
+        timeout = None if waiter.deadline is None else max(0.0, waiter.deadline - self._clock())
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # El cliente se desconectó: si ya tenía hueco, se devuelve
+            if self._abandon(waiter):
+                self._release()
+            raise
+        if not self._abandon(waiter):
+            raise self._expired()
+
+    async def __call__(self, user_query: str, **kwargs) -> str:
+        await self._acquire()
+        try:
+            return await self.callback(user_query, **kwargs)
+        finally:
+            self._release()
+
+    async def _stream(self, user_query: str, **kwargs):
+        await self._acquire()
+        try:
+            chunks = self.callback.stream(user_query, **kwargs)
+            if inspect.isawaitable(chunks):
+                chunks = await chunks
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            self._release()
+
+
+def with_scheduler(callback: Callable, config: dict = CHATBOT_CONFIG, **overrides):
+    """
+    Coloca el planificador delante de un callback de LLM.
+
+    Args:
+        callback: Callback de LLM, síncrono o asíncrono
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        **overrides: Opciones que sustituyen a CHATBOT_CONFIG["scheduler"]
+
+    Returns:
+        PriorityScheduler o AsyncPriorityScheduler según el tipo de
+        callback, o el propio callback si el planificador está desactivado
+    """
+    settings = dict(config.get("scheduler", {}))
+    settings.update(overrides)
+    if not settings.pop("enabled", True):
+        return callback
+    is_async = (inspect.iscoroutinefunction(callback)
+                or inspect.iscoroutinefunction(getattr(callback, "__call__", None)))
+    cls = AsyncPriorityScheduler if is_async else PriorityScheduler
+    scheduler = cls(callback, **settings)
+    METRICS.add_collector(scheduler.queue_metrics, "scheduler")
+    return scheduler
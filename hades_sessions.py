@@ -0,0 +1,249 @@
+"""
+Almacén de conversaciones por sesión para Hades
+===============================================
+
+Guarda el historial de cada sesión con memoria acotada: número máximo de
+turnos por sesión, desalojo LRU entre sesiones y expiración por inactividad.
+
+Los identificadores de sesión de la API los emite el servidor y van firmados
+(ver issue_session_id()): un cliente no puede inventar ni adivinar el de
+otro para leer su historial.
+"""
+
+from collections import OrderedDict, deque
+from typing import Optional
+import hashlib
+import hmac
+import os
+import threading
+import time
+import uuid
+
+from config import CHATBOT_CONFIG
+
+
+# Sesión usada cuando el llamador no indica ninguna
+DEFAULT_SESSION = "default"
+
+# Secreto usado si no se configura ninguno. Se genera al importar: con
+# serve.py (preload) lo comparten todos los workers, pero cambia al reiniciar
+_PROCESS_SECRET = os.urandom(32)
+
+
+class Turn:
+    """Mensaje individual de una conversación."""
+
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str):
+        self.role = role
+        self.content = content
+        self.tokens = None  # calculado bajo demanda por ContextBuilder
+
+    def as_dict(self) -> dict:
+        """Retorna el mensaje en el formato de las APIs de chat."""
+        return {"role": self.role, "content": self.content}
+
+    def __repr__(self) -> str:
+        return f"Turn(role={self.role!r}, content={self.content!r})"
+
+
+class _Session:
+    """Historial y marca de último acceso de una sesión."""
+
+    __slots__ = ("turns", "last_access")
+
+    def __init__(self, max_messages: int, now: float):
+        self.turns = deque(maxlen=max_messages)
+        self.last_access = now
+
+
+class SessionStore:
+    """
+    Historial de conversaciones indexado por id de sesión.
+
+    Es seguro para uso concurrente desde varios hilos.
+    """
+
+    def __init__(self, max_sessions: int = 10000, max_turns: int = 20,
+                 ttl_seconds: Optional[float] = 1800, clock=time.monotonic):
+        """
+        Inicializa el almacén.
+
+        Args:
+            max_sessions: Número máximo de sesiones en memoria (LRU)
+            max_turns: Turnos (pregunta + respuesta) conservados por sesión
+            ttl_seconds: Segundos de inactividad tras los que expira una
+                        sesión. None desactiva la expiración.
+            clock: Función que retorna el tiempo actual en segundos
+        """
+        if max_sessions < 1 or max_turns < 1:
+            raise ValueError("max_sessions y max_turns deben ser mayores que cero")
+        self.max_sessions = max_sessions
+        self.max_messages = max_turns * 2
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire(self._clock())
+            return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            self._expire(self._clock())
+            return session_id in self._sessions
+
+    def _expire(self, now: float):
+        """Elimina las sesiones inactivas (las más antiguas están al principio)."""
+        if self.ttl_seconds is None:
+            return
+        deadline = now - self.ttl_seconds
+        sessions = self._sessions
+        while sessions:
+            session_id, session = next(iter(sessions.items()))
+            if session.last_access > deadline:
+                break
+            del sessions[session_id]
+
+    def _touch(self, session_id: str, now: float, create: bool) -> Optional[_Session]:
+        """Retorna la sesión marcándola como usada recientemente."""
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = _Session(self.max_messages, now)
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def append(self, session_id: str, role: str, content: str):
+        """
+        Agrega un mensaje al historial de una sesión.
+
+        Args:
+            session_id: Identificador de la sesión
+            role: Rol del mensaje ("user" o "assistant")
+            content: Contenido del mensaje
+        """
+        with self._lock:
+            self._touch(session_id, self._clock(), create=True).turns.append(Turn(role, content))
+
+    def append_exchange(self, session_id: str, query: str, response: str):
+        """
+        Agrega una pregunta y su respuesta de forma atómica.
+
+        Args:
+            session_id: Identificador de la sesión
+            query: Pregunta del usuario
+            response: Respuesta del asistente
+        """
+        with self._lock:
+            turns = self._touch(session_id, self._clock(), create=True).turns
+            turns.append(Turn("user", query))
+            turns.append(Turn("assistant", response))
+
+    def get(self, session_id: str) -> list[Turn]:
+        """
+        Retorna el historial de una sesión.
+
+        Args:
+            session_id: Identificador de la sesión
+
+        Returns:
+            list: Mensajes de la sesión (vacía si no existe o expiró)
+        """
+        with self._lock:
+            session = self._touch(session_id, self._clock(), create=False)
+            return list(session.turns) if session is not None else []
+
+    def clear(self, session_id: str):
+        """Elimina el historial de una sesión."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        """Retorna estadísticas del almacén."""
+        with self._lock:
+            self._expire(self._clock())
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_turns": self.max_messages // 2,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+def create_session_store(config: dict = CHATBOT_CONFIG) -> SessionStore:
+    """
+    Crea un almacén de sesiones según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        SessionStore: Almacén configurado
+    """
+    settings = config.get("sessions", {})
+    return SessionStore(
+        max_sessions=settings.get("max_sessions", 10000),
+        max_turns=settings.get("max_turns", 20),
+        ttl_seconds=settings.get("ttl_seconds", 1800),
+    )
+
+
+def load_session_secret(config: dict = CHATBOT_CONFIG) -> bytes:
+    """
+    Retorna el secreto con el que se firman los identificadores de sesión.
+
+    Se lee de CHATBOT_CONFIG["sessions"]["secret"] o de la variable de
+    entorno HADES_SESSION_SECRET; si no hay ninguno, se usa uno aleatorio
+    del proceso.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        bytes: Secreto de firma
+    """
+    secret = config.get("sessions", {}).get("secret") or os.environ.get("HADES_SESSION_SECRET")
+    return secret.encode("utf-8") if secret else _PROCESS_SECRET
+
+
+def _signature(token: str, secret: bytes) -> str:
+    return hmac.new(secret, token.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_session_id(secret: bytes) -> str:
+    """
+    Emite un identificador de sesión nuevo, firmado con ``secret``.
+
+    Returns:
+        str: Identificador con la forma "<aleatorio>.<firma>"
+    """
+    token = uuid.uuid4().hex
+    return f"{token}.{_signature(token, secret)}"
+
+
+def verify_session_id(session_id, secret: bytes) -> bool:
+    """
+    Indica si un identificador de sesión lo emitió este servidor.
+
+    Args:
+        session_id: Identificador recibido del cliente
+        secret: Secreto de firma (ver load_session_secret())
+
+    Returns:
+        bool: True si la firma es válida
+    """
+    if not isinstance(session_id, str) or len(session_id) > 128:
+        return False
+    token, _, signature = session_id.rpartition(".")
+    return bool(token) and hmac.compare_digest(signature, _signature(token, secret))
@@ -0,0 +1,103 @@
+"""
+Agrupación de consultas idénticas en curso (single-flight)
+==========================================================
+
+Cuando llegan a la vez varias consultas con la misma clave, solo la primera
+llama al LLM; las demás esperan su resultado y lo comparten. No introduce
+respuestas obsoletas: en cuanto la llamada termina, la clave se libera.
+
+Funciona desde hilos (Flask) y desde corrutinas (ASGI) con la misma
+instancia, porque el resultado se publica en un concurrent.futures.Future.
+"""
+
+from concurrent.futures import Future
+from typing import Awaitable, Callable
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """Coalescencia de llamadas concurrentes con la misma clave."""
+
+    def __init__(self):
+        self.leaders = 0
+        self.duplicates = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        """Retorna el Future de la clave y si el llamador es el líder."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.duplicates += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: Exception = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, func: Callable[[], str]) -> str:
+        """
+        Ejecuta ``func`` una sola vez por clave entre los llamadores concurrentes.
+
+        Args:
+            key: Clave de la consulta
+            func: Función que realiza la llamada
+
+        Returns:
+            str: Resultado de la llamada (compartido)
+
+        Raises:
+            Exception: La excepción de la llamada, también para los que esperan
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, func: Callable[[], Awaitable[str]]) -> str:
+        """
+        Versión asíncrona de do().
+
+        Args:
+            key: Clave de la consulta
+            func: Función que retorna la corrutina que realiza la llamada
+
+        Returns:
+            str: Resultado de la llamada (compartido)
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await func()
+        except BaseException as e:
+            self._finish(key, future, error=e if isinstance(e, Exception) else
+                         RuntimeError("La consulta original fue cancelada."))
+            raise
+        self._finish(key, future, result)
+        return result
+
+    def stats(self) -> dict:
+        """Retorna las llamadas realizadas y las agrupadas."""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "duplicates": self.duplicates,
+            }
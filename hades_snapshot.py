@@ -0,0 +1,352 @@
+"""
+Instantánea de configuración de Hades
+=====================================
+
+Reúne en un objeto inmutable todo lo que el camino crítico lee en cada
+consulta: el prompt del sistema y su hash, el clasificador de temas ya
+compilado y las respuestas predefinidas, también serializadas a JSON.
+
+La instantánea se puede recargar sin reiniciar el proceso: basta con
+modificar el archivo de ajustes (CHATBOT_CONFIG["hot_reload"]["path"]) o
+el archivo del prompt, o enviar SIGHUP. La nueva instantánea se construye
+aparte y se publica con una sola asignación; si falla (JSON inválido, por
+ejemplo) se conserva la anterior.
+
+Cada consulta fija la instantánea vigente al empezar (ver pinned()) y la
+usa hasta terminar, aunque entretanto se publique otra. Con gunicorn, cada
+worker vigila los archivos por su cuenta; kill -HUP al maestro renueva los
+workers de forma ordenada y estos cargan los ajustes actuales al arrancar.
+
+Ejemplo de archivo de ajustes (JSON; todas las claves son opcionales):
+
+    {
+        "system_prompt": "...",
+        "responses": {"out_of_topic": "...", "greeting": "..."},
+        "keywords": ["código", "bug", ...],
+        "greetings": ["hola", "hello"],
+        "supported_languages": ["Python", ...],
+        "technologies": ["Django", ...]
+    }
+"""
+
+from hades_matcher import GREETINGS, TOPIC_KEYWORDS, TopicMatcher
+from hades_prompt import SYSTEM_PROMPT, prompt_hash
+from config import CHATBOT_CONFIG
+from types import MappingProxyType
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import signal
+import threading
+import time
+
+
+logger = logging.getLogger("hades.snapshot")
+
+# Mensaje para consultas vacías
+EMPTY_QUERY_MESSAGE = "Por favor, proporciona una pregunta válida."
+
+# Mensaje cuando no hay ningún proveedor de LLM configurado
+NO_LLM_MESSAGE = (
+    "✅ Tu pregunta ha sido validada y está dentro del ámbito de desarrollo de software.\n\n"
+    "Para recibir una respuesta completa, necesitas configurar un proveedor de LLM.\n\n"
+    "Puedes usar el prompt del sistema en 'hades_prompt.py' o 'hades_prompt.txt' "
+    "con cualquier API de LLM (OpenAI, Claude, etc.).\n\n"
+    "Consulta 'example_integration.py' para ver ejemplos de integración."
+)
+
+# Respuestas que no están en CHATBOT_CONFIG["responses"]
+DEFAULT_RESPONSES = {"empty": EMPTY_QUERY_MESSAGE, "no_llm": NO_LLM_MESSAGE}
+
+
+def _freeze(value):
+    """Copia inmutable de una estructura de diccionarios y listas."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _merge(base: dict, overrides: dict) -> dict:
+    """Combina dos configuraciones; los diccionarios se combinan por clave."""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            value = _merge(merged[key], value)
+        merged[key] = value
+    return merged
+
+
+class ConfigSnapshot:
+    """Configuración compilada e inmutable."""
+
+    __slots__ = ("version", "config", "system_prompt", "prompt_hash", "matcher",
+                 "responses", "encoded_responses", "sources", "loaded_at")
+
+    def __init__(self, config: dict, system_prompt: str, version: int = 1,
+                 sources: tuple = ()):
+        """
+        Args:
+            config: Configuración ya combinada con los ajustes
+            system_prompt: Prompt del sistema
+            version: Número de la instantánea (crece con cada recarga)
+            sources: Firma de los archivos leídos, para detectar cambios
+        """
+        responses = {**DEFAULT_RESPONSES, **config.get("responses", {})}
+        for name, value in (
+            ("version", version),
+            ("config", _freeze(config)),
+            ("system_prompt", system_prompt),
+            ("prompt_hash", prompt_hash(system_prompt)),
+            ("matcher", TopicMatcher(
+                greetings=config.get("greetings", GREETINGS),
+                keywords=config.get("keywords", TOPIC_KEYWORDS),
+                languages=config.get("supported_languages", ()),
+                technologies=config.get("technologies", ()),
+            )),
+            ("responses", MappingProxyType(responses)),
+            ("encoded_responses", MappingProxyType({
+                name: json.dumps(text, ensure_ascii=False).encode("utf-8")
+                for name, text in responses.items()
+            })),
+            ("sources", sources),
+            ("loaded_at", time.time()),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot es inmutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ConfigSnapshot es inmutable")
+
+    def info(self) -> dict:
+        return {"version": self.version, "prompt_hash": self.prompt_hash,
+                "loaded_at": round(self.loaded_at, 3)}
+
+
+def _source_paths(config: dict) -> list[str]:
+    settings = config.get("hot_reload", {})
+    return [path for path in (settings.get("path"), settings.get("prompt_path")) if path]
+
+
+def _signature(paths: list[str]) -> tuple:
+    """(ruta, mtime, tamaño) de cada archivo; None si no existe."""
+    result = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            result.append((path, None))
+        else:
+            result.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(result)
+
+
+def load_snapshot(config: dict = CHATBOT_CONFIG, version: int = 1) -> ConfigSnapshot:
+    """
+    Construye una instantánea a partir de la configuración y de los archivos
+    de CHATBOT_CONFIG["hot_reload"].
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+        version: Número de la nueva instantánea
+
+    Returns:
+        ConfigSnapshot: Instantánea compilada
+
+    Raises:
+        ValueError: Si el archivo de ajustes no es un objeto JSON válido
+        OSError: Si un archivo existe pero no se puede leer
+    """
+    settings = config.get("hot_reload", {})
+    paths = _source_paths(config)
+    # La firma se toma antes de leer: un cambio durante la lectura se
+    # detectará en la siguiente comprobación
+    sources = _signature(paths)
+    overrides = {}
+    path = settings.get("path")
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        if not isinstance(overrides, dict):
+            raise ValueError(f"{path} debe contener un objeto JSON")
+    merged = _merge(config, overrides)
+    system_prompt = merged.get("system_prompt")
+    prompt_path = settings.get("prompt_path")
+    if not system_prompt and prompt_path and os.path.exists(prompt_path):
+        with open(prompt_path, encoding="utf-8") as f:
+            system_prompt = f.read().strip()
+    return ConfigSnapshot(merged, system_prompt or SYSTEM_PROMPT, version, sources)
+
+
+class _State:
+    """Instantánea publicada y estado del recargador del proceso."""
+
+    def __init__(self):
+        self.snapshot = None
+        self.reloads = 0
+        self.failures = 0
+        self.failed_sources = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.watcher_pid = None
+        self.config = CHATBOT_CONFIG
+
+
+_state = _State()
+
+# Instantánea fijada por la consulta en curso
+_pinned = contextvars.ContextVar("hades_snapshot", default=None)
+
+
+def current_snapshot() -> ConfigSnapshot:
+    """Retorna la instantánea de la consulta en curso o, si no hay, la vigente."""
+    return _pinned.get() or _state.snapshot
+
+
+def _unpin(token):
+    try:
+        _pinned.reset(token)
+    except ValueError:
+        # El generador se cerró desde otro contexto
+        pass
+
+
+def pinned(method):
+    """
+    Decorador: el método usa la misma instantánea de principio a fin.
+
+    Admite funciones, corrutinas y generadores (síncronos y asíncronos); en
+    los generadores la instantánea se fija al pedir el primer elemento.
+    """
+    if inspect.isasyncgenfunction(method):
+        async def wrapper(*args, **kwargs):
+            token = _pinned.set(current_snapshot())
+            try:
+                async for item in method(*args, **kwargs):
+                    yield item
+            finally:
+                _unpin(token)
+    elif inspect.isgeneratorfunction(method):
+        def wrapper(*args, **kwargs):
+            token = _pinned.set(current_snapshot())
+            try:
+                yield from method(*args, **kwargs)
+            finally:
+                _unpin(token)
+    elif inspect.iscoroutinefunction(method):
+        async def wrapper(*args, **kwargs):
+            token = _pinned.set(current_snapshot())
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                _unpin(token)
+    else:
+        def wrapper(*args, **kwargs):
+            token = _pinned.set(current_snapshot())
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _unpin(token)
+    return functools.wraps(method)(wrapper)
+
+
+def reload_snapshot(config: dict = CHATBOT_CONFIG) -> bool:
+    """
+    Construye una nueva instantánea y la publica.
+
+    Las consultas en curso conservan la suya.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        bool: False si la carga falló y se conserva la instantánea anterior
+    """
+    with _state.lock:
+        version = _state.snapshot.version + 1 if _state.snapshot is not None else 1
+        try:
+            snapshot = load_snapshot(config, version)
+        except (OSError, ValueError) as e:
+            _state.failures += 1
+            _state.failed_sources = _signature(_source_paths(config))
+            logger.warning("No se pudo recargar la configuración: %s", e)
+            return False
+        _state.snapshot = snapshot
+        _state.failed_sources = None
+        if version > 1:
+            _state.reloads += 1
+            logger.info("Configuración recargada (versión %d, prompt %s)",
+                        version, snapshot.prompt_hash)
+        return True
+
+
+def _watch(config: dict, interval: float):
+    """Recarga cuando cambian los archivos o llega SIGHUP."""
+    paths = _source_paths(config)
+    while True:
+        triggered = _state.wake.wait(interval or None)
+        _state.wake.clear()
+        sources = _signature(paths)
+        if triggered or (sources != _state.snapshot.sources
+                         and sources != _state.failed_sources):
+            reload_snapshot(config)
+
+
+def start_reloader(config: dict = CHATBOT_CONFIG):
+    """
+    Activa la recarga en caliente en este proceso.
+
+    Arranca el hilo que vigila los archivos y, si el proceso lo permite
+    (hilo principal de un sistema con SIGHUP), instala el manejador de la
+    señal. Se puede llamar varias veces.
+
+    Los procesos hijos creados con fork (los workers de gunicorn --preload)
+    no arrancan otro hilo: al crearse cargan los archivos si han cambiado, y
+    los cambios posteriores les llegan al reciclarlos (kill -HUP al maestro).
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+    """
+    settings = config.get("hot_reload", {})
+    if not settings.get("enabled", True) or _state.watcher_pid == os.getpid():
+        return
+    _state.watcher_pid = os.getpid()
+    _state.config = config
+    # Un worker recién creado puede haber heredado una instantánea antigua
+    if _signature(_source_paths(config)) != _state.snapshot.sources:
+        reload_snapshot(config)
+    threading.Thread(target=_watch, args=(config, settings.get("interval", 2.0)),
+                     name="hades-reloader", daemon=True).start()
+    if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+        # El manejador solo despierta al hilo: la recarga no corre dentro de la señal
+        signal.signal(signal.SIGHUP, lambda signum, frame: _state.wake.set())
+
+
+def reloader_stats() -> dict:
+    """Retorna la instantánea vigente y el número de recargas."""
+    return {**_state.snapshot.info(), "reloads": _state.reloads,
+            "failures": _state.failures}
+
+
+if hasattr(os, "register_at_fork"):
+    def _after_fork():
+        _state.lock = threading.Lock()
+        _state.wake = threading.Event()
+        if _state.watcher_pid is not None:
+            # Sin hilo propio (un vigilante por worker repetiría las mismas
+            # lecturas): solo se parte de los archivos actuales
+            _state.watcher_pid = os.getpid()
+            if _signature(_source_paths(_state.config)) != _state.snapshot.sources:
+                reload_snapshot(_state.config)
+    os.register_at_fork(after_in_child=_after_fork)
+
+# Instantánea inicial; si los ajustes no se pueden leer se arranca sin ellos
+if not reload_snapshot():
+    _state.snapshot = ConfigSnapshot(CHATBOT_CONFIG, SYSTEM_PROMPT)
@@ -0,0 +1,293 @@
+"""
+Archivos estáticos de Hades
+===========================
+
+Prepara en memoria, al arrancar, los archivos del frontend para servirlos
+de forma eficiente desde app.py y asgi.py:
+
+- Variantes precomprimidas con gzip y, si está instalado el paquete brotli,
+  con brotli; se elige la mejor según Accept-Encoding.
+- ETags fuertes (hash del contenido) y respuestas 304 a If-None-Match.
+- Nombres con huella (``style.3f2a1b9c04.css``) que el HTML referencia en
+  lugar de los originales y que se sirven con Cache-Control inmutable de
+  larga duración. Los nombres originales y el HTML se revalidan siempre.
+
+También incluye compress_response() para comprimir las respuestas JSON
+grandes de la API.
+"""
+
+from config import CHATBOT_CONFIG
+from typing import Optional
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+
+# Archivos del frontend que se sirven. Solo estos: el directorio raíz también
+# contiene código, configuración, requirements.txt y quizá un venv/
+STATIC_FILES = ("index.html", "style.css", "styles.css", "app.js", "script.js",
+                "hades_prompt.txt")
+
+# Tipos que merece la pena comprimir (las imágenes y fuentes ya lo están)
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# Referencias a otros archivos dentro del HTML
+_REFERENCE = re.compile(r"""(\b(?:href|src)=["'])/?([^"'?#:]+)(["'])""")
+
+
+def _brotli():
+    """Retorna el módulo brotli, o None si no está instalado (es opcional)."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(accept_encoding: str, available) -> Optional[str]:
+    """
+    Elige la codificación de contenido preferida que acepta el cliente.
+
+    Args:
+        accept_encoding: Valor de la cabecera Accept-Encoding
+        available: Codificaciones disponibles, en orden de preferencia
+
+    Returns:
+        str: "br", "gzip" o None si se debe enviar sin comprimir
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress_response(body: bytes, accept_encoding: str, min_size: int = 1024,
+                      level: int = 6) -> tuple[bytes, Optional[str]]:
+    """
+    Comprime el cuerpo de una respuesta dinámica si es grande.
+
+    Se usan niveles moderados: la respuesta se comprime en cada petición.
+
+    Args:
+        body: Cuerpo sin comprimir
+        accept_encoding: Valor de la cabecera Accept-Encoding
+        min_size: Tamaño mínimo (bytes) a partir del cual se comprime
+        level: Nivel de gzip (1-9)
+
+    Returns:
+        tuple: (cuerpo, codificación o None si se deja sin comprimir)
+    """
+    if len(body) < min_size:
+        return body, None
+    brotli = _brotli()
+    encoding = choose_encoding(accept_encoding, ("br", "gzip") if brotli else ("gzip",))
+    if encoding == "br":
+        return brotli.compress(body, quality=4), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level, mtime=0), encoding
+    return body, None
+
+
+def _etag_matches(if_none_match: str, etags) -> bool:
+    """Comparación débil de If-None-Match con las ETags de un archivo."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+class Asset:
+    """Un archivo estático con sus variantes comprimidas."""
+
+    __slots__ = ("name", "content_type", "digest", "cache_control", "variants")
+
+    def __init__(self, name: str, content_type: str, body: bytes, cache_control: str):
+        self.name = name
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.cache_control = cache_control
+        self.variants = {None: body}
+
+    def with_cache_control(self, cache_control: str) -> "Asset":
+        """Retorna el mismo archivo (compartiendo variantes) con otra política de caché."""
+        other = Asset.__new__(Asset)
+        other.name = self.name
+        other.content_type = self.content_type
+        other.digest = self.digest
+        other.cache_control = cache_control
+        other.variants = self.variants
+        return other
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """ETag fuerte de la variante (cada codificación tiene la suya)."""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+class StaticAssets:
+    """Archivos estáticos de un directorio, preparados en memoria."""
+
+    def __init__(self, root: str, min_size: int = 512, gzip_level: int = 9,
+                 brotli_quality: int = 11, use_brotli: bool = True,
+                 max_age: int = 31536000, files=STATIC_FILES):
+        """
+        Args:
+            root: Directorio con los archivos del frontend
+            min_size: Tamaño mínimo (bytes) para precomprimir un archivo
+            gzip_level: Nivel de gzip de las variantes precomprimidas
+            brotli_quality: Calidad de brotli de las variantes precomprimidas
+            use_brotli: Si es False no se generan variantes brotli
+            max_age: Segundos de caché de los nombres con huella
+            files: Nombres de los archivos de ``root`` que se sirven (sin
+                   subdirectorios); los que no existen se ignoran
+        """
+        self.root = os.path.abspath(root)
+        self.files = tuple(files)
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli = _brotli() if use_brotli else None
+        self.max_age = max_age
+        self.not_modified = 0
+        self._assets = {}
+        self._fingerprinted = {}
+        self.build()
+
+    def build(self):
+        """(Re)lee los archivos permitidos y genera sus variantes."""
+        files = [name for name in self.files
+                 if "/" not in name and os.sep not in name
+                 and os.path.isfile(os.path.join(self.root, name))]
+
+        assets = {}
+        fingerprinted = {}
+        # El HTML se procesa al final para apuntar a los nombres con huella
+        for name in sorted(files, key=lambda name: name.endswith(".html")):
+            with open(os.path.join(self.root, name), "rb") as f:
+                body = f.read()
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            if content_type == "text/html":
+                body = self._rewrite_references(body, fingerprinted)
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            asset = Asset(name, content_type, body, "no-cache")
+            self._precompress(asset)
+            assets[name] = asset
+            if content_type.startswith("text/html"):
+                continue
+            stem, ext = os.path.splitext(name)
+            fingerprinted[name] = f"{stem}.{asset.digest[:10]}{ext}"
+            assets[fingerprinted[name]] = asset.with_cache_control(
+                f"public, max-age={self.max_age}, immutable")
+        self._assets = assets
+        self._fingerprinted = fingerprinted
+
+    def _rewrite_references(self, body: bytes, fingerprinted: dict) -> bytes:
+        def replace(match):
+            target = fingerprinted.get(match.group(2))
+            if target is None:
+                return match.group(0)
+            return match.group(1) + target + match.group(3)
+        text = body.decode("utf-8")
+        return _REFERENCE.sub(replace, text).encode("utf-8")
+
+    def _precompress(self, asset: Asset):
+        body = asset.variants[None]
+        if len(body) < self.min_size or not asset.content_type.startswith(COMPRESSIBLE_TYPES):
+            return
+        compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if len(compressed) < len(body):
+            asset.variants["gzip"] = compressed
+        if self.brotli is not None:
+            compressed = self.brotli.compress(body, quality=self.brotli_quality)
+            if len(compressed) < len(body):
+                asset.variants["br"] = compressed
+
+    def url_for(self, name: str) -> str:
+        """Retorna la URL con huella de un archivo (o la original si no tiene)."""
+        return "/" + self._fingerprinted.get(name, name)
+
+    def respond(self, path: str, accept_encoding: str = "",
+                if_none_match: str = "") -> Optional[tuple[int, list, bytes]]:
+        """
+        Construye la respuesta HTTP de un archivo.
+
+        Args:
+            path: Ruta pedida ("" o "/" equivale a index.html)
+            accept_encoding: Valor de la cabecera Accept-Encoding
+            if_none_match: Valor de la cabecera If-None-Match
+
+        Returns:
+            tuple: (estado, cabeceras [(nombre, valor)], cuerpo), o None si
+                   el archivo no existe
+        """
+        asset = self._assets.get(path.lstrip("/") or "index.html")
+        if asset is None:
+            return None
+        encodings = [encoding for encoding in ("br", "gzip") if encoding in asset.variants]
+        encoding = choose_encoding(accept_encoding, encodings)
+        headers = [("ETag", asset.etag(encoding)), ("Cache-Control", asset.cache_control)]
+        if encodings:
+            headers.append(("Vary", "Accept-Encoding"))
+        if _etag_matches(if_none_match, [asset.etag(None)] + [asset.etag(e) for e in encodings]):
+            self.not_modified += 1
+            return 304, headers, b""
+        body = asset.variants[encoding]
+        headers.append(("Content-Type", asset.content_type))
+        headers.append(("Content-Length", str(len(body))))
+        if encoding:
+            headers.append(("Content-Encoding", encoding))
+        return 200, headers, body
+
+    def stats(self) -> dict:
+        originals = [asset for name, asset in self._assets.items() if name == asset.name]
+        return {
+            "files": len(originals),
+            "bytes": sum(len(asset.variants[None]) for asset in originals),
+            "brotli": self.brotli is not None,
+            "not_modified": self.not_modified,
+        }
+
+
+def create_static_assets(root: str, config: dict = CHATBOT_CONFIG) -> StaticAssets:
+    """
+    Prepara los archivos estáticos según la configuración del chatbot.
+
+    Args:
+        root: Directorio con los archivos del frontend
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        StaticAssets: Archivos listos para servir
+    """
+    settings = config.get("static", {})
+    return StaticAssets(
+        root,
+        min_size=settings.get("min_size", 512),
+        gzip_level=settings.get("gzip_level", 9),
+        brotli_quality=settings.get("brotli_quality", 11),
+        use_brotli=settings.get("brotli", True),
+        max_age=settings.get("max_age", 31536000),
+        files=settings.get("files", STATIC_FILES),
+    )
@@ -0,0 +1,364 @@
+"""
+Trazas por petición para Hades
+==============================
+
+Registra la línea de tiempo de una petición como un árbol de spans
+(validación, caché, contexto, llamada al LLM, streaming, serialización).
+El span activo se guarda en una ContextVar, así que se propaga por la cadena
+de llamadas, también entre corrutinas, sin pasar parámetros.
+
+Solo se trazan las peticiones muestreadas (CHATBOT_CONFIG["tracing"]
+["sample_rate"]); en las demás, span() retorna un gestor vacío. Las trazas
+terminadas se exportan en segundo plano a un archivo JSONL o a un colector
+OTLP/HTTP (JSON), sin bloquear la petición.
+"""
+
+from config import CHATBOT_CONFIG
+from typing import Optional
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+import weakref
+
+
+logger = logging.getLogger("hades.tracing")
+
+# (traza, id del span padre) de la petición en curso
+_current = contextvars.ContextVar("hades_trace", default=None)
+
+
+class Span:
+    """Intervalo de tiempo con nombre dentro de una traza."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+
+    def as_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Spans de una petición muestreada."""
+
+    __slots__ = ("trace_id", "request_id", "spans")
+
+    def __init__(self, request_id: str):
+        self.trace_id = os.urandom(16).hex()
+        self.request_id = request_id
+        self.spans = []
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            "spans": [span.as_dict() for span in self.spans],
+        }
+
+
+class _NoopScope:
+    """Gestor de contexto de las peticiones no muestreadas."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+class _SpanScope:
+    """Abre un span al entrar y lo cierra al salir."""
+
+    __slots__ = ("trace", "span", "on_end", "_token")
+
+    def __init__(self, trace: Trace, span: Span, on_end=None):
+        self.trace = trace
+        self.span = span
+        self.on_end = on_end
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self.trace.spans.append(self.span)
+        self._token = _current.set((self.trace, self.span.span_id))
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.span.attributes["error"] = exc_type.__name__
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # El generador se cerró desde otro contexto
+            pass
+        if self.on_end is not None:
+            self.on_end(self.trace)
+        return False
+
+
+def span(name: str, **attributes):
+    """
+    Abre un span hijo del span activo.
+
+    Si la petición no se está trazando, no hace nada.
+
+    Args:
+        name: Nombre de la operación
+        **attributes: Atributos del span
+
+    Returns:
+        Gestor de contexto que entrega el Span (o None)
+    """
+    current = _current.get()
+    if current is None:
+        return _NOOP
+    trace, parent_id = current
+    return _SpanScope(trace, Span(name, parent_id, attributes))
+
+
+def annotate(**attributes):
+    """
+    Añade atributos al span activo.
+
+    Si la petición no se está trazando, no hace nada.
+
+    Args:
+        **attributes: Atributos del span (sustituyen a los del mismo nombre)
+    """
+    current = _current.get()
+    if current is None:
+        return
+    trace, span_id = current
+    for active in reversed(trace.spans):
+        if active.span_id == span_id:
+            active.attributes.update(attributes)
+            return
+
+
+def current_request_id() -> Optional[str]:
+    """Retorna el id de la petición trazada en curso, si la hay."""
+    current = _current.get()
+    return current[0].request_id if current is not None else None
+
+
+# Exportadores vivos, para reiniciar su hilo en los procesos hijos
+_exporters = weakref.WeakSet()
+
+
+class _BackgroundExporter:
+    """Exporta las trazas desde un hilo con una cola acotada."""
+
+    def __init__(self, queue_size: int = 1000, batch_size: int = 100):
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._start()
+        _exporters.add(self)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="hades-tracing", daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        # El hilo no sobrevive al fork: cada proceso hijo (los workers de
+        # gunicorn --preload) arranca el suyo con una cola vacía
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._start()
+
+    def export(self, trace: Trace):
+        """Encola una traza; si la cola está llena, se descarta."""
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5):
+        """Exporta las trazas pendientes y detiene el hilo."""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            batch = [trace]
+            while len(batch) < self.batch_size:
+                try:
+                    trace = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if trace is None:
+                    self._write_safely(batch)
+                    return
+                batch.append(trace)
+            self._write_safely(batch)
+
+    def _write_safely(self, batch: list[Trace]):
+        try:
+            self.write(batch)
+        except Exception as e:
+            logger.warning("No se pudieron exportar %d trazas: %s", len(batch), e)
+
+    def write(self, batch: list[Trace]):
+        raise NotImplementedError
+
+
+class JsonlExporter(_BackgroundExporter):
+    """Añade cada traza como una línea JSON a un archivo."""
+
+    def __init__(self, path: str, **options):
+        self.path = path
+        super().__init__(**options)
+
+    def write(self, batch: list[Trace]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for trace in batch:
+                f.write(json.dumps(trace.as_dict(), ensure_ascii=False) + "\n")
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter(_BackgroundExporter):
+    """Envía las trazas a un colector OTLP/HTTP en formato JSON."""
+
+    def __init__(self, endpoint: str = "http://localhost:4318/v1/traces",
+                 service_name: str = "hades", timeout: float = 5, **options):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        super().__init__(**options)
+
+    def _otlp_span(self, trace: Trace, span: Span) -> dict:
+        attributes = {"request_id": trace.request_id, **span.attributes}
+        result = {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)}
+                           for key, value in attributes.items()],
+        }
+        if span.parent_id:
+            result["parentSpanId"] = span.parent_id
+        if "error" in span.attributes:
+            result["status"] = {"code": 2}
+        return result
+
+    def write(self, batch: list[Trace]):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": self.service_name}}
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "hades"},
+                "spans": [self._otlp_span(trace, span)
+                          for trace in batch for span in trace.spans],
+            }],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """Decide qué peticiones se trazan y exporta sus spans."""
+
+    def __init__(self, sample_rate: float = 0.0,
+                 exporter: Optional[_BackgroundExporter] = None):
+        """
+        Args:
+            sample_rate: Fracción de peticiones trazadas (0-1)
+            exporter: Destino de las trazas; sin él no se traza nada
+        """
+        self.sample_rate = sample_rate if exporter is not None else 0.0
+        self.exporter = exporter
+
+    def trace(self, name: str, request_id: str, **attributes):
+        """
+        Abre el span raíz de una petición si resulta muestreada.
+
+        Args:
+            name: Nombre de la operación raíz (por ejemplo, el endpoint)
+            request_id: Id de la petición
+            **attributes: Atributos del span raíz
+
+        Returns:
+            Gestor de contexto que entrega el Span raíz (o None)
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return _NOOP
+        return _SpanScope(Trace(request_id), Span(name, None, attributes),
+                          on_end=self.exporter.export)
+
+
+def create_tracer(config: dict = CHATBOT_CONFIG) -> Tracer:
+    """
+    Crea el trazador según la configuración del chatbot.
+
+    Args:
+        config: Diccionario de configuración (por defecto CHATBOT_CONFIG)
+
+    Returns:
+        Tracer: Trazador (sin exportador si el trazado está desactivado)
+    """
+    settings = config.get("tracing", {})
+    if not settings.get("enabled", False):
+        return Tracer()
+    options = {"queue_size": settings.get("queue_size", 1000)}
+    if settings.get("exporter", "jsonl") == "otlp":
+        exporter = OTLPExporter(settings.get("endpoint", "http://localhost:4318/v1/traces"),
+                                service_name=config.get("name", "hades").lower(), **options)
+    else:
+        exporter = JsonlExporter(settings.get("path", "hades_traces.jsonl"), **options)
+    atexit.register(exporter.close)
+    return Tracer(settings.get("sample_rate", 0.01), exporter)
+
+
+if hasattr(os, "register_at_fork"):
+    def _after_fork():
+        for exporter in list(_exporters):
+            exporter._after_fork()
+    os.register_at_fork(after_in_child=_after_fork)
+
+# Trazador del proceso
+TRACER = create_tracer()
@@ -0,0 +1,156 @@
+"""
+Hades - Servidor de producción
+==============================
+
+Sirve Hades con un servidor de producción en lugar del servidor de
+desarrollo de Flask:
+
+    python serve.py                 # WSGI (app.py) con gunicorn
+    python serve.py --asgi          # ASGI (asgi.py) con uvicorn
+
+Por defecto se usa un solo proceso (con varios hilos en WSGI, o un bucle de
+eventos en ASGI). Cada proceso tiene su propio estado en memoria:
+
+- el historial de las sesiones (SessionStore),
+- la caché de respuestas y la caché semántica,
+- los contadores de límite de peticiones (salvo con backend "redis"),
+- el limitador de concurrencia y las métricas de /metrics.
+
+Con ``--workers N`` mayor que 1, el balanceador debe enviar cada sesión
+siempre al mismo proceso (sesiones persistentes / sticky sessions), o el
+historial se pierde entre peticiones; el límite por cliente se multiplica
+por N si no se comparte en Redis, y cada lectura de /metrics corresponde a
+un solo proceso.
+
+Con gunicorn la aplicación (prompt, configuración, clasificador) se carga
+una sola vez en el proceso maestro antes de crear los workers, de modo que
+la memoria se comparte entre ellos (copy-on-write). Los clientes HTTP no se
+heredan: cada worker abre sus propias conexiones (ver hades_providers.py).
+Recarga ordenada de los workers sin cortar conexiones: kill -HUP <pid del
+maestro>. Los workers nuevos cargan el prompt y los ajustes actuales (ver
+hades_snapshot.py).
+
+Los valores por defecto se toman de CHATBOT_CONFIG["server"].
+"""
+
+from config import CHATBOT_CONFIG
+from typing import Optional
+import argparse
+import gc
+import logging
+
+
+logger = logging.getLogger("hades.serve")
+
+
+def serve_wsgi(options: dict):
+    """
+    Sirve app.py con gunicorn (procesos × hilos).
+
+    Args:
+        options: Opciones del servidor (ver CHATBOT_CONFIG["server"])
+
+    Raises:
+        ImportError: Si gunicorn no está instalado
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise ImportError("gunicorn no está instalado. Ejecuta: pip install gunicorn")
+
+    class HadesApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{options['host']}:{options['port']}",
+                "workers": options["workers"],
+                "threads": options["threads"],
+                "worker_class": "gthread",
+                "backlog": options["backlog"],
+                "keepalive": options["keepalive"],
+                "timeout": options["timeout"],
+                "graceful_timeout": options["graceful_timeout"],
+                "preload_app": options["preload"],
+                "loglevel": "debug" if options["debug"] else "info",
+                # Congelar los objetos cargados para que el recolector de
+                # basura no los toque y sigan compartidos tras el fork
+                "when_ready": lambda server: gc.freeze(),
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            if options["preload"]:
+                # Los workers se crean con el SDK ya importado, en lugar de
+                # calentarse cada uno por su cuenta (los clientes HTTP se
+                # crean de nuevo en cada worker tras el fork)
+                app.extensions["hades"].wait_ready()
+            return app
+
+    HadesApplication().run()
+
+
+def serve_asgi(options: dict):
+    """
+    Sirve asgi.py con uvicorn (un bucle de eventos por proceso).
+
+    Args:
+        options: Opciones del servidor (ver CHATBOT_CONFIG["server"])
+
+    Raises:
+        ImportError: Si uvicorn no está instalado
+    """
+    try:
+        import uvicorn
+    except ImportError:
+        raise ImportError("uvicorn no está instalado. Ejecuta: pip install uvicorn")
+
+    uvicorn.run(
+        "asgi:app",
+        host=options["host"],
+        port=options["port"],
+        workers=options["workers"],
+        backlog=options["backlog"],
+        timeout_keep_alive=options["keepalive"],
+        timeout_graceful_shutdown=options["graceful_timeout"],
+        log_level="debug" if options["debug"] else "info",
+    )
+
+
+def main(argv: Optional[list[str]] = None):
+    """Punto de entrada de la línea de comandos."""
+    server = CHATBOT_CONFIG.get("server", {})
+    parser = argparse.ArgumentParser(description="Servidor de producción de Hades.")
+    parser.add_argument("--asgi", action="store_true",
+                        help="Sirve asgi.py con uvicorn en lugar de app.py con gunicorn")
+    parser.add_argument("--host", default=server.get("host", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=server.get("port", 5000))
+    parser.add_argument("--workers", type=int, default=server.get("workers", 1),
+                        help="Procesos (por defecto 1; con más, sesiones persistentes "
+                             "en el balanceador)")
+    parser.add_argument("--threads", type=int, default=server.get("threads", 8),
+                        help="Hilos por proceso (solo WSGI)")
+    parser.add_argument("--backlog", type=int, default=server.get("backlog", 2048))
+    parser.add_argument("--keepalive", type=int, default=server.get("keepalive", 5))
+    parser.add_argument("--timeout", type=int, default=server.get("timeout", 120))
+    parser.add_argument("--graceful-timeout", type=int,
+                        default=server.get("graceful_timeout", 30))
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        default=server.get("preload", True),
+                        help="Carga la aplicación en cada worker (solo WSGI)")
+    parser.add_argument("--debug", action="store_true", default=server.get("debug", False))
+    options = vars(parser.parse_args(argv))
+    options["workers"] = options["workers"] or 1
+    if options["workers"] > 1:
+        logger.warning("%d procesos: cada uno tiene sus propias sesiones, cachés y "
+                       "límites; el balanceador debe usar sesiones persistentes",
+                       options["workers"])
+
+    if options["asgi"]:
+        serve_asgi(options)
+    else:
+        serve_wsgi(options)
+
+
+if __name__ == "__main__":
+    main()
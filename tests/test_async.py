@@ -0,0 +1,52 @@
+"""
+Pruebas del chatbot asíncrono (hades_async): la E/S de disco no se ejecuta
+en el bucle de eventos y los envoltorios síncronos reutilizan su bucle.
+"""
+
+import asyncio
+import threading
+
+from config import CHATBOT_CONFIG
+from hades_async import create_async_hades_instance
+
+
+async def callback(query, **kwargs):
+    return f"respuesta: {query}"
+
+
+def test_disk_io_runs_off_the_event_loop(tmp_path):
+    config = {**CHATBOT_CONFIG,
+              "cache": {"enabled": True, "path": str(tmp_path / "cache.db")}}
+    hades = create_async_hades_instance(llm_callback=callback, config=config)
+    threads = []
+    for name in ("_prepare", "_record", "_remember"):
+        method = getattr(hades, name)
+
+        def traced(*args, _method=method, **kwargs):
+            threads.append(threading.get_ident())
+            return _method(*args, **kwargs)
+
+        setattr(hades, name, traced)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        await hades.ahandle_query("python listas")
+        await hades.ahandle_query("python listas")
+        return loop_thread
+
+    loop_thread = asyncio.run(main())
+    assert threads and loop_thread not in threads
+
+
+def test_sync_wrappers_reuse_the_thread_loop():
+    loops = set()
+
+    async def tracking(query, **kwargs):
+        loops.add(id(asyncio.get_running_loop()))
+        return "ok"
+
+    hades = create_async_hades_instance(llm_callback=tracking)
+    for i in range(3):
+        hades.handle_query(f"python tema {i}")
+    hades.handle_batch(["python a", "python b"])
+    assert len(loops) == 1
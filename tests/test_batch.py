@@ -0,0 +1,87 @@
+"""
+Pruebas del procesamiento por lotes (hades_batch): errores del LLM en un
+campo aparte y reanudación que reintenta las líneas fallidas.
+"""
+
+import json
+
+from config import CHATBOT_CONFIG
+from hades_batch import count_completed, run_batch
+from hades_chatbot import create_hades_instance
+
+
+class FlakyProvider:
+    """Callback de LLM que falla mientras ``down`` es True."""
+
+    model = "fake-model"
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def __call__(self, user_query: str, **kwargs) -> str:
+        self.calls += 1
+        if self.down and "docker" in user_query:
+            raise ConnectionError("proveedor caído")
+        return f"respuesta: {user_query}"
+
+
+def make_hades(provider):
+    config = {**CHATBOT_CONFIG, "cache": {"enabled": False},
+              "semantic_cache": {"enabled": False}}
+    return create_hades_instance(llm_callback=provider, config=config)
+
+
+def write_input(path, queries):
+    path.write_text("".join(json.dumps({"question": query}) + "\n" for query in queries),
+                    encoding="utf-8")
+
+
+def read_output(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+QUERIES = ["python listas", "docker volúmenes", "python dicts", "docker redes", "git rebase"]
+
+
+def test_failures_are_written_as_errors(tmp_path):
+    source, target = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(source, QUERIES)
+    provider = FlakyProvider()
+    provider.down = True
+
+    run_batch(make_hades(provider), str(source), str(target), chunk_size=2)
+
+    lines = read_output(target)
+    assert [line["question"] for line in lines] == QUERIES
+    for line in lines:
+        if "docker" in line["question"]:
+            assert "response" not in line and "caído" in line["error"]
+        else:
+            assert "error" not in line and line["response"].startswith("respuesta")
+    assert count_completed(str(target)) == (5, 2)
+
+
+def test_resume_retries_failed_lines(tmp_path):
+    source, target = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(source, QUERIES)
+    provider = FlakyProvider()
+    provider.down = True
+    hades = make_hades(provider)
+    run_batch(hades, str(source), str(target), chunk_size=2)
+
+    # Una ejecución interrumpida a mitad de la última línea
+    write_input(source, QUERIES + ["sql joins"])
+    with open(target, "a", encoding="utf-8") as f:
+        f.write('{"question": "sql jo')
+
+    provider.down = False
+    provider.calls = 0
+    processed = run_batch(hades, str(source), str(target), chunk_size=1)
+
+    lines = read_output(target)
+    assert [line["question"] for line in lines] == QUERIES + ["sql joins"]
+    assert all("error" not in line and line["response"] for line in lines)
+    # Solo se repiten las dos líneas fallidas y la que faltaba
+    assert provider.calls == processed == 3
+    assert count_completed(str(target)) == (6, 0)
@@ -0,0 +1,104 @@
+"""
+Pruebas de las cachés (hades_cache): normalización de las claves (usada
+también por el single-flight), persistencia en SQLite y caché semántica.
+"""
+
+import pytest
+
+from hades_cache import ResponseCache, SemanticCache, normalize_query
+
+
+@pytest.mark.parametrize("first, second", [
+    ("¿Cómo optimizo una consulta SQL?", "como optimizo  una consulta sql"),
+    ("¿Qué es Python?", "que es python"),
+    ("(hola) ...", "Hola"),
+    ("¿Qué es C#?", "que es c#"),
+])
+def test_same_key(first, second):
+    assert normalize_query(first) == normalize_query(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("¿Qué es C#?", "¿Qué es C?"),
+    ("¿Qué es C++?", "¿Qué es C?"),
+    ("¿Qué es F#?", "¿Qué es F?"),
+    ("¿Qué es .NET?", "¿Qué es NET?"),
+    ("git push --force", "git push force"),
+])
+def test_significant_symbols(first, second):
+    assert normalize_query(first) != normalize_query(second)
+
+
+@pytest.fixture
+def semantic():
+    pytest.importorskip("numpy")
+    return SemanticCache(threshold=0.85, max_entries=8, dimensions=1024)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("optimizar query SQL", "cómo hago más rápida una consulta SQL"),
+    ("¿Cómo optimizo una consulta SQL?", "optimizar consultas sql"),
+    ("how do I make my SQL query faster", "optimize sql queries"),
+    ("cómo borrar una rama de git", "eliminar rama git"),
+])
+def test_semantic_paraphrases_hit(semantic, stored, asked):
+    semantic.put(stored, "respuesta", "modelo")
+    assert semantic.get(asked, "modelo") == "respuesta"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Django 4 migraciones y modelos con relaciones",
+     "Django 5 migraciones y modelos con relaciones"),
+    ("novedades de python 3.12", "novedades de python 3.13"),
+    ("leer un archivo en python", "leer un archivo en java"),
+    ("¿Qué es C#?", "¿Qué es C++?"),
+])
+def test_semantic_different_questions_miss(semantic, stored, asked):
+    semantic.put(stored, "respuesta", "modelo")
+    assert semantic.get(asked, "modelo") is None
+
+
+def test_semantic_versions_must_match_exactly(semantic):
+    semantic.put("Django 4 migraciones", "d4", "modelo")
+    semantic.put("Django 5 migraciones", "d5", "modelo")
+    assert semantic.get("migraciones en django 4", "modelo") == "d4"
+    assert semantic.get("migraciones en django 5", "modelo") == "d5"
+    assert semantic.get("migraciones en django", "modelo") is None
+
+
+def test_semantic_namespaces_and_expiration():
+    pytest.importorskip("numpy")
+    now = [1000.0]
+    semantic = SemanticCache(ttl_seconds=60, clock=lambda: now[0])
+    semantic.put("optimizar query SQL", "respuesta", "modelo-a")
+    assert semantic.get("optimizar query SQL", "modelo-b") is None
+    assert semantic.get("optimizar query SQL", "modelo-a") == "respuesta"
+    now[0] += 61
+    assert semantic.get("optimizar query SQL", "modelo-a") is None
+
+
+def test_persistent_cache_writes_behind_and_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path=path)
+    key = cache.make_key("¿Qué es Python?", "modelo")
+    cache.put(key, "un lenguaje")
+    assert cache.get(key) == "un lenguaje"
+    cache.flush()
+    cache.close()
+
+    reopened = ResponseCache(path=path)
+    assert reopened.get(key) == "un lenguaje"
+    reopened.clear()
+    assert reopened.get(key) is None
+    reopened.close()
+    assert ResponseCache(path=path).get(key) is None
+
+
+def test_cache_expiration_and_lru():
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    for name in ("a", "b", "c"):
+        cache.put(name, name.upper())
+    assert cache.get("a") is None and cache.get("c") == "C"
+    now[0] += 11
+    assert cache.get("c") is None
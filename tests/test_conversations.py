@@ -0,0 +1,123 @@
+"""
+Pruebas del registro de conversaciones (hades_conversations): lectura
+paginada, reinicios, recuperación de líneas incompletas, límite de sesiones
+e índice compartido entre procesos.
+"""
+
+import gc
+import json
+import threading
+import time
+
+import pytest
+
+import hades_conversations
+from hades_conversations import ConversationLog
+
+
+@pytest.fixture
+def open_log(tmp_path):
+    logs = []
+
+    def factory(**options):
+        log = ConversationLog(str(tmp_path / "log.jsonl"), fsync_interval=0, **options)
+        logs.append(log)
+        return log
+
+    yield factory
+    for log in logs:
+        log.close()
+
+
+def test_append_and_read_pages(open_log):
+    log = open_log()
+    for i in range(5):
+        log.append("s1", f"pregunta {i}", f"respuesta {i}")
+    log.append("s2", "otra", "sesión")
+    log.flush()
+
+    total, records = log.read("s1", offset=1, limit=2)
+    assert total == 5
+    assert [record["query"] for record in records] == ["pregunta 1", "pregunta 2"]
+    assert [record["query"] for record in log.tail("s1", 2)] == ["pregunta 3", "pregunta 4"]
+    assert log.count("s2") == 1
+
+
+def test_reset_survives_reopening(open_log):
+    log = open_log()
+    log.append("s1", "antes", "del reinicio")
+    log.reset("s1")
+    log.append("s1", "después", "del reinicio")
+    log.flush()
+    log.close()
+
+    reopened = open_log()
+    assert [record["query"] for record in reopened.read("s1")[1]] == ["después"]
+
+
+def test_crash_remnant_is_truncated(tmp_path, open_log):
+    path = tmp_path / "log.jsonl"
+    complete = json.dumps({"session_id": "s1", "ts": 1.0, "query": "q", "response": "r"})
+    path.write_bytes(complete.encode() + b"\n" + b'{"session_id": "s1", "ts"')
+
+    log = open_log()
+    assert log.count("s1") == 1
+    assert path.read_bytes() == complete.encode() + b"\n"
+    log.append("s1", "nueva", "línea")
+    log.flush()
+    assert log.count("s1") == 2
+
+
+@pytest.mark.skipif(hades_conversations.fcntl is None, reason="requiere fcntl")
+def test_line_being_written_by_another_process_is_kept(tmp_path, open_log):
+    fcntl = hades_conversations.fcntl
+    path = tmp_path / "log.jsonl"
+    line = json.dumps({"session_id": "s1", "ts": 1.0, "query": "q", "response": "r"}) + "\n"
+    writer = open(path, "ab", buffering=0)
+    # Otro escritor con el bloqueo compartido, a mitad de su línea
+    fcntl.flock(writer.fileno(), fcntl.LOCK_SH)
+    writer.write(line[:20].encode())
+
+    def finish():
+        time.sleep(0.2)
+        writer.write(line[20:].encode())
+        fcntl.flock(writer.fileno(), fcntl.LOCK_UN)
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    log = open_log()
+    thread.join()
+    writer.close()
+    assert path.read_text() == line
+    assert log.count("s1") == 1
+
+
+def test_index_keeps_the_most_recent_sessions(open_log):
+    log = open_log(max_sessions=2)
+    log.append("s1", "q", "r")
+    log.append("s2", "q", "r")
+    log.append("s1", "q", "r")
+    log.append("s3", "q", "r")
+    log.flush()
+    assert log.count("s2") == 0
+    assert log.count("s1") == 2 and log.count("s3") == 1
+    assert log.stats()["evicted"] == 1
+
+
+def test_other_processes_appends_are_indexed(open_log):
+    first = open_log()
+    second = open_log()
+    first.append("s1", "desde", "el primero")
+    first.flush()
+    second.append("s1", "desde", "el segundo")
+    second.flush()
+    assert first.count("s1") == second.count("s1") == 2
+
+
+def test_closed_logs_are_not_kept_alive(tmp_path):
+    log = ConversationLog(str(tmp_path / "log.jsonl"))
+    log.close()
+    before = len(hades_conversations._logs)
+    del log
+    gc.collect()
+    assert len(hades_conversations._logs) == before - 1
@@ -0,0 +1,70 @@
+"""
+Pruebas del clasificador de temas (hades_matcher): flexiones de las
+palabras clave genéricas, nombres exactos, términos compuestos, saludos y
+textos largos.
+"""
+
+import pytest
+
+from hades_matcher import GREETING, LANGUAGE, TECHNOLOGY, TOPIC_MATCHER, TopicMatcher
+
+
+@pytest.mark.parametrize("query, term", [
+    ("debugging my app", "debug"),
+    ("tengo errores al compilar", "error"),
+    ("las funciones de orden superior", "función"),
+    ("las compilaciones fallan", "compilación"),
+    ("diseño de APIs REST", "api"),
+    ("tests unitarios", "test"),
+    ("lo deployed ayer", "deploy"),
+    ("como funcion recursiva", "función"),
+    ("python tips", "python"),
+    ("I love Rust", "rust"),
+])
+def test_topic_terms(query, term):
+    match = TOPIC_MATCHER.classify(query)
+    assert match is not None and match.term == term
+
+
+@pytest.mark.parametrize("query", [
+    "What is going on with the weather?",
+    "She goes to the market",
+    "My rusted bike",
+    "swifter horses",
+    "springs in the mountain",
+    "expressed feelings",
+    "¿Qué tiempo hará mañana?",
+])
+def test_everyday_prose_is_out_of_topic(query):
+    assert TOPIC_MATCHER.classify(query) is None
+
+
+def test_names_are_exact_tokens_even_in_keywords():
+    matcher = TopicMatcher(greetings=(), keywords=("error", "spring"))
+    assert matcher.classify("errores").term == "error"
+    assert matcher.classify("springs") is None
+
+
+@pytest.mark.parametrize("query, kind, term", [
+    ("uso Node.js en el backend", TECHNOLOGY, "node.js"),
+    ("¿Qué es C#?", LANGUAGE, "c#"),
+    ("templates en C++", LANGUAGE, "c++"),
+])
+def test_compound_terms(query, kind, term):
+    match = TOPIC_MATCHER.classify(query)
+    assert (match.kind, match.term) == (kind, term)
+
+
+def test_greeting_only_at_the_start():
+    assert TOPIC_MATCHER.classify("Hola, ¿cómo uso Python?").kind == GREETING
+    assert TOPIC_MATCHER.classify("Hola, ¿qué tal?").kind == GREETING
+    late = "x " * 40 + "hola, error en python"
+    assert TOPIC_MATCHER.classify(late).kind != GREETING
+    assert TOPIC_MATCHER.classify("Hola", include_greetings=False) is None
+
+
+def test_long_text_finds_term_in_the_middle():
+    text = "lorem ipsum " * 2000 + " docker " + "dolor sit " * 2000
+    match = TOPIC_MATCHER.classify(text)
+    assert match is not None and match.term == "docker"
+    assert text[match.start:match.end].lower() == "docker"
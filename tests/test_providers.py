@@ -0,0 +1,96 @@
+"""
+Pruebas del uso de tokens por consulta (hades_providers): los tokens de la
+llamada al LLM, incluidos los leídos de la caché de prompts, llegan a los
+metadatos de la respuesta y al span de la petición.
+"""
+
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from benchmark import FakeLLMHandler
+from config import CHATBOT_CONFIG
+from hades_async import create_async_hades_instance
+from hades_chatbot import create_hades_instance
+from hades_providers import create_async_llm_integration, create_llm_integration
+from hades_tracing import Tracer
+
+USAGE = {"prompt_tokens": 100, "cached_tokens": 64, "cache_creation_tokens": 0,
+         "completion_tokens": 3}
+
+CONFIG = {**CHATBOT_CONFIG, "cache": {"enabled": False},
+          "semantic_cache": {"enabled": False}}
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    handler = type("Handler", (FakeLLMHandler,), {
+        "latency": 0, "token_delay": 0, "tokens": 3, "cached_tokens": 64})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+@pytest.fixture
+def provider_env(monkeypatch, base_url):
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+def test_usage_reaches_the_response_metadata(provider_env):
+    callback = create_llm_integration("openai", api_key="usage-sync", config=CONFIG)
+    hades = create_hades_instance(llm_callback=callback, config=CONFIG)
+
+    metadata = {}
+    hades.handle_query("python listas por comprensión", metadata=metadata)
+    assert metadata["usage"] == USAGE
+
+    metadata = {}
+    chunks = list(hades.handle_query_stream("python generadores", metadata=metadata))
+    assert "".join(chunks).startswith("token")
+    assert metadata["usage"] == USAGE
+
+
+def test_usage_reaches_the_request_span(provider_env):
+    callback = create_llm_integration("openai", api_key="usage-span", config=CONFIG)
+    hades = create_hades_instance(llm_callback=callback, config=CONFIG)
+    exporter = ListExporter()
+
+    with Tracer(1.0, exporter).trace("POST /api/chat", "req-1"):
+        hades.handle_query("python decoradores")
+
+    spans = {span.name: span for span in exporter.traces[0].spans}
+    assert {name: spans["llm"].attributes[name] for name in USAGE} == USAGE
+
+
+def test_callbacks_without_usage_leave_no_metadata():
+    hades = create_hades_instance(llm_callback=lambda query, **kwargs: "respuesta",
+                                  config=CONFIG)
+    metadata = {}
+    hades.handle_query("python listas", metadata=metadata)
+    assert "usage" not in metadata
+
+
+def test_async_usage_reaches_the_response_metadata(provider_env):
+    callback = create_async_llm_integration("openai", api_key="usage-async", config=CONFIG)
+    hades = create_async_hades_instance(llm_callback=callback, config=CONFIG)
+
+    metadata = {}
+    hades.handle_query("python asyncio", metadata=metadata)
+    assert metadata["usage"] == USAGE
+
+    metadata = {}
+    list(hades.handle_query_stream("python corrutinas", metadata=metadata))
+    assert metadata["usage"] == USAGE
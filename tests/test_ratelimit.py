@@ -0,0 +1,159 @@
+"""
+Pruebas del control de admisión (hades_ratelimit): token buckets,
+Retry-After, identificación de clientes, límite de concurrencia y la
+respuesta 429 del servidor.
+"""
+
+import asyncio
+import logging
+
+import pytest
+
+from config import CHATBOT_CONFIG
+from hades_ratelimit import (
+    AsyncConcurrencyLimiter, ConcurrencyLimiter, MemoryBucketBackend, RateLimiter,
+    RedisBucketBackend, create_concurrency_limiter, create_rate_limiter, get_client_id,
+    hash_api_key,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_a_burst_and_refills():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=0.5, burst=3, backend=MemoryBucketBackend(clock=clock))
+    assert [limiter.check("ip:1")[0] for _ in range(4)] == [True, True, True, False]
+
+    allowed, retry_after = limiter.check("ip:1")
+    assert not allowed and retry_after == 2.0
+    clock.now += 2
+    assert limiter.check("ip:1") == (True, 0.0)
+    assert limiter.stats()["rejected"] == 2
+
+
+def test_clients_have_separate_buckets():
+    limiter = RateLimiter(rate=1, burst=1, backend=MemoryBucketBackend(clock=FakeClock()))
+    assert limiter.check("ip:1")[0]
+    assert not limiter.check("ip:1")[0]
+    assert limiter.check("ip:2")[0]
+
+
+def test_cost_is_capped_at_the_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1, burst=5, backend=MemoryBucketBackend(clock=clock))
+    # Un lote más grande que la ráfaga no queda rechazado para siempre
+    assert limiter.check("ip:1", cost=50)[0]
+    allowed, retry_after = limiter.check("ip:1", cost=2)
+    assert not allowed and retry_after == 2.0
+
+
+def test_backend_forgets_the_oldest_clients():
+    backend = MemoryBucketBackend(max_keys=2, clock=FakeClock())
+    backend.take("a", 1, 1)
+    backend.take("b", 1, 1)
+    backend.take("c", 1, 1)
+    # "a" se olvidó y vuelve con el bucket lleno
+    assert backend.take("a", 1, 1) == (True, 0)
+    assert backend.take("c", 1, 1) == (False, 0)
+
+
+def test_async_check_uses_the_memory_backend():
+    limiter = RateLimiter(rate=1, burst=1, backend=MemoryBucketBackend(clock=FakeClock()))
+    assert asyncio.run(limiter.acheck("ip:1")) == (True, 0.0)
+    assert asyncio.run(limiter.acheck("ip:1")) == (False, 1.0)
+
+
+def test_limits_are_disabled_by_default():
+    assert create_rate_limiter(CHATBOT_CONFIG) is None
+    assert create_concurrency_limiter(CHATBOT_CONFIG) is None
+    assert create_rate_limiter({}) is None
+
+
+def test_redis_outage_falls_back_to_memory(caplog):
+    pytest.importorskip("redis")
+    backend = RedisBucketBackend("redis://127.0.0.1:1/0",
+                                 fallback=MemoryBucketBackend(clock=FakeClock()))
+    limiter = RateLimiter(rate=1, burst=2, backend=backend)
+    with caplog.at_level(logging.WARNING, logger="hades.ratelimit"):
+        results = [limiter.check("ip:1")[0] for _ in range(3)]
+        assert asyncio.run(limiter.acheck("ip:1"))[0] is False
+    # Sigue limitando, ahora por proceso, y avisa una sola vez
+    assert results == [True, True, False]
+    assert limiter.stats()["backend_errors"] == 4
+    assert len([r for r in caplog.records if "Redis no responde" in r.getMessage()]) == 1
+
+
+def test_only_known_api_keys_identify_a_client():
+    known = frozenset({hash_api_key("clave-buena")})
+    headers = {"x-api-key": "clave-buena"}
+    assert get_client_id(headers, "10.0.0.1", api_keys=known) == "key:" + hash_api_key("clave-buena")
+    assert get_client_id({"authorization": "Bearer clave-buena"}, "10.0.0.1",
+                         api_keys=known).startswith("key:")
+    assert get_client_id({"x-api-key": "inventada"}, "10.0.0.1", api_keys=known) == "ip:10.0.0.1"
+    assert get_client_id(headers, "10.0.0.1") == "ip:10.0.0.1"
+
+
+def test_forwarded_for_needs_a_trusted_proxy():
+    headers = {"x-forwarded-for": "1.2.3.4, 10.0.0.1"}
+    assert get_client_id(headers, "10.0.0.1") == "ip:10.0.0.1"
+    assert get_client_id(headers, "10.0.0.1", trust_proxy=True) == "ip:1.2.3.4"
+
+
+def test_concurrency_limiter_rejects_when_the_queue_is_full():
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=0, queue_timeout=0.01)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+    limiter.release()
+    assert limiter.stats()["rejected"] == 1 and limiter.stats()["in_flight"] == 0
+
+
+def test_concurrency_limiter_times_out_in_the_queue():
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=0.01)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    assert limiter.stats()["waiting"] == 0
+
+
+def test_async_concurrency_limiter():
+    async def main():
+        limiter = AsyncConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=1)
+        assert await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not await limiter.acquire()  # la cola ya está llena
+        limiter.release()
+        assert await waiter
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(main())
+    assert stats["rejected"] == 1 and stats["in_flight"] == 0
+
+
+def test_server_answers_429_with_retry_after():
+    from app import create_app
+
+    config = {**CHATBOT_CONFIG, "hot_reload": {"enabled": False},
+              "rate_limit": {**CHATBOT_CONFIG["rate_limit"], "enabled": True,
+                             "rate": 0.5, "burst": 2}}
+    client = create_app(config, warmup=False).test_client()
+    statuses = [client.post("/api/chat", json={"message": "hola"}).status_code
+                for _ in range(2)]
+    assert statuses == [200, 200]
+
+    response = client.post("/api/chat", json={"message": "hola"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert response.get_json()["success"] is False
+    # Otro cliente no se ve afectado
+    other = client.post("/api/chat", json={"message": "hola"},
+                        environ_base={"REMOTE_ADDR": "10.9.9.9"})
+    assert other.status_code == 200
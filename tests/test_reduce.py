@@ -0,0 +1,77 @@
+"""
+Pruebas de la reducción de consultas largas (hades_reduce): espacios,
+bloques repetidos y recorte por principio y final.
+"""
+
+from hades_reduce import InputReducer, RepeatCollapser
+
+
+def words(text):
+    """Contador de tokens determinista: una palabra, un token."""
+    return len(text.split())
+
+
+def test_short_queries_are_untouched():
+    text = "línea con espacios   \n\n\n\notra"
+    reduction = InputReducer(min_chars=2000).reduce(text)
+    assert reduction.text == text
+    assert reduction.original_tokens == reduction.reduced_tokens
+
+
+def test_whitespace_is_squeezed():
+    text = "\n\nprimera   \n\n\n\nsegunda\t\n\n"
+    reduction = InputReducer(min_chars=0).reduce(text)
+    assert reduction.text == "primera\n\nsegunda"
+
+
+def test_repeated_lines_ignore_timestamps_and_addresses():
+    lines = [f"2024-01-01 10:00:{i:02d} WARN reintento en 0x{i:04x}" for i in range(30)]
+    text = "\n".join(["Traceback:"] + lines + ["ValueError: boom"])
+    reduction = InputReducer(min_chars=0).reduce(text)
+    assert reduction.text.splitlines() == [
+        "Traceback:",
+        lines[0],
+        "[… la línea anterior se repite 29 veces más]",
+        "ValueError: boom",
+    ]
+    assert reduction.collapsed_lines == 29
+    assert reduction.info()["reduced_chars"] == len(reduction.text)
+
+
+def test_repeated_blocks_are_collapsed():
+    frame = ["  File a.py, line 1", "  File b.py, line 2"]
+    text = "\n".join(["inicio"] + frame * 10 + ["fin"])
+    reduction = InputReducer(min_chars=0).reduce(text)
+    assert reduction.text.splitlines() == [
+        "inicio", *frame, "[… las 2 líneas anteriores se repiten 9 veces más]", "fin",
+    ]
+    assert reduction.collapsed_lines == 18
+
+
+def test_few_repeats_are_kept():
+    assert list(RepeatCollapser(min_repeats=3).process(["a", "a", "b"])) == ["a", "a", "b"]
+    assert list(RepeatCollapser(min_repeats=3).process(["a", "a", "a", "b"])) == [
+        "a", "[… la línea anterior se repite 2 veces más]", "b",
+    ]
+
+
+def test_long_queries_keep_head_and_tail():
+    lines = [f"línea distinta número {i}" for i in range(200)]
+    text = "\n".join(["pregunta inicial"] + lines + ["error final"])
+    reducer = InputReducer(min_chars=0, max_tokens=100, counter=words)
+    reduction = reducer.reduce(text)
+
+    result = reduction.text.splitlines()
+    assert result[0] == "pregunta inicial" and result[-1] == "error final"
+    assert reduction.omitted_lines > 0
+    assert f"se omitieron {reduction.omitted_lines} líneas" in reduction.text
+    assert reduction.reduced_tokens <= 100
+
+
+def test_single_huge_line_keeps_both_ends():
+    text = "inicio " + "x" * 10000 + " final"
+    reduction = InputReducer(min_chars=0, max_tokens=100, counter=lambda s: len(s) // 4).reduce(text)
+    assert reduction.text.startswith("inicio")
+    assert reduction.text.endswith("final")
+    assert " … " in reduction.text
+    assert len(reduction.text) < 500
@@ -0,0 +1,258 @@
+"""
+Pruebas de la política de resiliencia (hades_resilience) contra un
+proveedor falso: reintentos, plazo, circuit breaker y hedging.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from hades_resilience import (
+    AsyncResilientCallback, CircuitBreaker, CircuitOpenError, DeadlineExceededError,
+    ResilientCallback,
+)
+
+
+class ProviderError(Exception):
+    """Error HTTP del proveedor, como los de los SDK."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeProvider:
+    """
+    Callback de LLM con un guion de resultados, uno por llamada.
+
+    Cada elemento es una respuesta (str), un código HTTP de error (int) o
+    una tupla (segundos, respuesta) para responder con retraso. Cuando el
+    guion se agota se repite el último elemento.
+    """
+
+    model = "fake-model"
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            return self.script.pop(0) if len(self.script) > 1 else self.script[0]
+
+    @staticmethod
+    def _result(outcome):
+        if isinstance(outcome, int):
+            raise ProviderError(outcome)
+        return outcome
+
+    def __call__(self, user_query: str, **kwargs) -> str:
+        outcome = self._next()
+        if isinstance(outcome, tuple):
+            delay, outcome = outcome
+            time.sleep(delay)
+        return self._result(outcome)
+
+
+class AsyncFakeProvider(FakeProvider):
+    async def __call__(self, user_query: str, **kwargs) -> str:
+        outcome = self._next()
+        if isinstance(outcome, tuple):
+            delay, outcome = outcome
+            await asyncio.sleep(delay)
+        return self._result(outcome)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def resilient(provider, **options):
+    options.setdefault("timeout", None)
+    options.setdefault("backoff_base", 0)
+    cls = AsyncResilientCallback if isinstance(provider, AsyncFakeProvider) else ResilientCallback
+    return cls(provider, **options)
+
+
+# ---------------------------------------------------------------------------
+# Reintentos
+# ---------------------------------------------------------------------------
+
+def test_retries_transient_errors_until_success():
+    provider = FakeProvider(503, 429, "ok")
+    callback = resilient(provider, max_retries=2)
+
+    assert callback("hola") == "ok"
+    assert provider.calls == 3
+    assert callback.stats()["retries"] == 2
+    assert callback.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_gives_up_after_max_retries():
+    provider = FakeProvider(503)
+    callback = resilient(provider, max_retries=2, failure_threshold=10)
+
+    with pytest.raises(ProviderError):
+        callback("hola")
+    assert provider.calls == 3
+    assert callback.stats()["failures"] == 1
+
+
+def test_does_not_retry_client_errors():
+    provider = FakeProvider(400)
+    callback = resilient(provider, max_retries=2)
+
+    with pytest.raises(ProviderError):
+        callback("hola")
+    assert provider.calls == 1
+    assert callback.stats()["retries"] == 0
+
+
+def test_async_retries_transient_errors():
+    provider = AsyncFakeProvider(500, "ok")
+    callback = resilient(provider, max_retries=1)
+
+    assert asyncio.run(callback("hola")) == "ok"
+    assert provider.calls == 2
+
+
+# ---------------------------------------------------------------------------
+# Plazo
+# ---------------------------------------------------------------------------
+
+def test_deadline_bounds_a_hung_provider():
+    provider = FakeProvider((2, "tarde"))
+    callback = resilient(provider, timeout=0.1, max_retries=2)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        callback("hola")
+    assert time.monotonic() - started < 1
+    # Sin tiempo restante no se reintenta
+    assert provider.calls == 1
+    assert callback.stats()["timeouts"] == 1
+
+
+def test_async_deadline_bounds_a_hung_provider():
+    provider = AsyncFakeProvider((2, "tarde"))
+    callback = resilient(provider, timeout=0.1, max_retries=2)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(callback("hola"))
+    assert time.monotonic() - started < 1
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = FakeClock()
+    provider = FakeProvider(503, 503, "ok")
+    callback = resilient(provider, max_retries=0, failure_threshold=2,
+                         reset_timeout=30, clock=clock)
+
+    for _ in range(2):
+        with pytest.raises(ProviderError):
+            callback("hola")
+    assert callback.breaker.state == CircuitBreaker.OPEN
+
+    # Abierto: falla sin llamar al proveedor
+    with pytest.raises(CircuitOpenError):
+        callback("hola")
+    assert provider.calls == 2
+    assert callback.stats()["circuit_rejections"] == 1
+
+    # Pasado reset_timeout se deja pasar una petición de prueba
+    clock.now += 31
+    assert callback("hola") == "ok"
+    assert callback.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_reopens_when_the_trial_fails():
+    clock = FakeClock()
+    provider = FakeProvider(503)
+    callback = resilient(provider, max_retries=0, failure_threshold=1,
+                         reset_timeout=30, clock=clock)
+
+    with pytest.raises(ProviderError):
+        callback("hola")
+    clock.now += 31
+    with pytest.raises(ProviderError):
+        callback("hola")
+    assert callback.breaker.state == CircuitBreaker.OPEN
+    assert callback.breaker.opened == 2
+
+
+def test_client_errors_leave_the_breaker_untouched():
+    clock = FakeClock()
+    provider = FakeProvider(503, 400, 400, "ok")
+    callback = resilient(provider, max_retries=0, failure_threshold=1,
+                         reset_timeout=30, clock=clock)
+
+    with pytest.raises(ProviderError):
+        callback("hola")
+    clock.now += 31
+
+    # Un 400 en la petición de prueba no cierra el circuito...
+    with pytest.raises(ProviderError):
+        callback("hola")
+    assert callback.breaker.state == CircuitBreaker.HALF_OPEN
+    # ...pero tampoco bloquea la siguiente prueba
+    with pytest.raises(ProviderError):
+        callback("hola")
+    assert callback("hola") == "ok"
+    assert callback.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_do_not_reset_the_failure_count():
+    provider = FakeProvider(503, 400, 503)
+    callback = resilient(provider, max_retries=0, failure_threshold=2)
+
+    for _ in range(3):
+        with pytest.raises(ProviderError):
+            callback("hola")
+    assert callback.breaker.state == CircuitBreaker.OPEN
+
+
+# ---------------------------------------------------------------------------
+# Hedging
+# ---------------------------------------------------------------------------
+
+def test_hedged_request_wins_over_a_slow_one():
+    provider = FakeProvider((1, "lenta"), "rápida")
+    callback = resilient(provider, timeout=5, hedge_delay=0.05)
+
+    started = time.monotonic()
+    assert callback("hola") == "rápida"
+    assert time.monotonic() - started < 0.5
+    assert provider.calls == 2
+    assert callback.stats()["hedges"] == 1
+
+
+def test_no_hedge_when_the_first_request_is_fast():
+    provider = FakeProvider("rápida")
+    callback = resilient(provider, timeout=5, hedge_delay=0.5)
+
+    assert callback("hola") == "rápida"
+    assert provider.calls == 1
+    assert callback.stats()["hedges"] == 0
+
+
+def test_async_hedged_request_wins_over_a_slow_one():
+    provider = AsyncFakeProvider((1, "lenta"), "rápida")
+    callback = resilient(provider, timeout=5, hedge_delay=0.05)
+
+    started = time.monotonic()
+    assert asyncio.run(callback("hola")) == "rápida"
+    assert time.monotonic() - started < 0.5
+    assert provider.calls == 2
@@ -0,0 +1,175 @@
+"""
+Pruebas del planificador de llamadas al LLM (hades_scheduler): prioridad
+estricta entre clases, reparto justo entre tenants y descarte de las
+llamadas cuyo plazo vence en la cola.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from hades_resilience import DeadlineExceededError
+from hades_scheduler import (
+    AsyncPriorityScheduler, BACKGROUND, BATCH, INTERACTIVE, PriorityScheduler, scheduling,
+)
+
+
+class GatedProvider:
+    """Callback de LLM que registra el orden de las llamadas y retiene "bloqueo"."""
+
+    model = "fake-model"
+
+    def __init__(self):
+        self.order = []
+        self.gate = threading.Event()
+
+    def __call__(self, user_query: str, **kwargs) -> str:
+        self.order.append(user_query)
+        if user_query == "bloqueo":
+            self.gate.wait(5)
+        return f"respuesta: {user_query}"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def queued(scheduler) -> int:
+    return sum(queue["depth"] for queue in scheduler.stats()["queues"].values())
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "la condición no se cumplió a tiempo"
+        time.sleep(0.001)
+
+
+class Harness:
+    """Ocupa el único hueco con "bloqueo" y encola llamadas en un orden fijo."""
+
+    def __init__(self, **options):
+        self.provider = GatedProvider()
+        self.scheduler = PriorityScheduler(self.provider, max_concurrency=1, **options)
+        self.threads = []
+        self.errors = {}
+        self.submit("bloqueo", queue=False)
+        wait_until(lambda: self.provider.order == ["bloqueo"])
+
+    def submit(self, query, priority=INTERACTIVE, tenant="default", timeout=None,
+               queue=True):
+        def call():
+            with scheduling(priority, tenant, timeout, clock=self.scheduler._clock):
+                try:
+                    self.scheduler(query)
+                except Exception as e:
+                    self.errors[query] = e
+
+        depth = queued(self.scheduler)
+        thread = threading.Thread(target=call)
+        thread.start()
+        self.threads.append(thread)
+        if queue:
+            # Se espera a que la llamada esté en la cola para fijar el orden
+            wait_until(lambda: queued(self.scheduler) == depth + 1)
+
+    def finish(self) -> list:
+        self.provider.gate.set()
+        for thread in self.threads:
+            thread.join(5)
+        return self.provider.order[1:]
+
+
+def test_higher_priority_classes_go_first():
+    harness = Harness()
+    harness.submit("fondo", BACKGROUND)
+    harness.submit("lote", BATCH)
+    harness.submit("usuario", INTERACTIVE)
+    assert harness.finish() == ["usuario", "lote", "fondo"]
+
+
+def test_tenants_share_a_class_fairly():
+    harness = Harness()
+    for i in range(3):
+        harness.submit(f"a{i}", BATCH, tenant="a")
+    harness.submit("b0", BATCH, tenant="b")
+    assert harness.finish() == ["a0", "b0", "a1", "a2"]
+
+
+def test_tenant_weights():
+    harness = Harness(tenant_weights={"grande": 2.0})
+    for i in range(4):
+        harness.submit(f"grande{i}", BATCH, tenant="grande")
+    for i in range(2):
+        harness.submit(f"pequeño{i}", BATCH, tenant="pequeño")
+    assert harness.finish() == ["grande0", "grande1", "pequeño0", "grande2",
+                                "grande3", "pequeño1"]
+
+
+def test_expired_calls_are_dropped_without_calling_the_provider():
+    clock = FakeClock()
+    harness = Harness(clock=clock)
+    harness.submit("caducada", timeout=1)
+    harness.submit("vigente")
+    clock.now += 2
+    assert harness.finish() == ["vigente"]
+    assert isinstance(harness.errors["caducada"], DeadlineExceededError)
+    assert harness.scheduler.stats()["dropped"] == 1
+
+
+def test_waiting_past_the_deadline_raises():
+    harness = Harness()
+    harness.submit("impaciente", timeout=0.05)
+    harness.threads[-1].join(5)
+    assert isinstance(harness.errors["impaciente"], DeadlineExceededError)
+    assert harness.finish() == []
+    stats = harness.scheduler.stats()
+    assert stats["dropped"] == 1 and stats["in_flight"] == 0
+
+
+def test_class_timeouts_apply_without_an_explicit_one():
+    clock = FakeClock()
+    harness = Harness(clock=clock, timeouts={BACKGROUND: 1})
+    harness.submit("fondo", BACKGROUND)
+    harness.submit("lote", BATCH)
+    clock.now += 2
+    assert harness.finish() == ["lote"]
+    assert isinstance(harness.errors["fondo"], DeadlineExceededError)
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        with scheduling("urgente"):
+            pass
+
+
+def test_async_scheduler_orders_by_priority():
+    order = []
+
+    async def provider(user_query, **kwargs):
+        order.append(user_query)
+        await asyncio.sleep(0.01)
+        return user_query
+
+    async def call(scheduler, query, priority):
+        with scheduling(priority):
+            return await scheduler(query)
+
+    async def main():
+        scheduler = AsyncPriorityScheduler(provider, max_concurrency=1)
+        first = asyncio.ensure_future(call(scheduler, "primera", INTERACTIVE))
+        await asyncio.sleep(0)
+        rest = [asyncio.ensure_future(call(scheduler, query, priority))
+                for query, priority in (("fondo", BACKGROUND), ("usuario", INTERACTIVE))]
+        await asyncio.gather(first, *rest)
+        return scheduler.stats()
+
+    stats = asyncio.run(main())
+    assert order == ["primera", "usuario", "fondo"]
+    assert stats["in_flight"] == 0
@@ -0,0 +1,114 @@
+"""
+Pruebas de la agrupación de consultas en curso (hades_singleflight): una
+sola llamada por clave, errores compartidos y liberación de la clave.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from hades_singleflight import SingleFlight
+
+
+def run_concurrently(flight, key, func, callers):
+    """Lanza ``callers`` hilos con la misma clave; retorna resultados y errores."""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, func))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def wait_for_duplicates(flight, count):
+    while flight.stats()["duplicates"] < count:
+        threading.Event().wait(0.001)
+
+
+def test_concurrent_callers_share_one_call():
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        return "respuesta"
+
+    flight = SingleFlight()
+    threads, results, errors = run_concurrently(flight, "python listas", func, 5)
+    wait_for_duplicates(flight, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["respuesta"] * 5 and not errors
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "duplicates": 4}
+
+
+def test_errors_reach_every_caller_and_release_the_key():
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ConnectionError("proveedor caído")
+
+    flight = SingleFlight()
+    threads, results, errors = run_concurrently(flight, "clave", failing, 3)
+    wait_for_duplicates(flight, 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert not results and len(errors) == 3
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    # La clave se libera: la siguiente llamada vuelve al proveedor
+    assert flight.do("clave", lambda: "recuperado") == "recuperado"
+    assert flight.stats()["leaders"] == 2
+
+
+def test_different_keys_are_not_grouped():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: "uno") == "uno"
+    assert flight.do("b", lambda: "dos") == "dos"
+    assert flight.stats()["duplicates"] == 0
+
+
+def test_async_callers_share_one_call():
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "respuesta"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.ado("clave", func) for _ in range(4)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(calls) == 1 and results == ["respuesta"] * 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_leader_fails_the_waiters():
+    async def main():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.ado("clave", lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.ado("clave", lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(RuntimeError):
+            await waiter
+        return flight
+
+    assert asyncio.run(main()).stats()["in_flight"] == 0
@@ -0,0 +1,57 @@
+"""
+Pruebas de las instantáneas de configuración (hades_snapshot): una consulta
+usa la misma instantánea de principio a fin aunque haya una recarga.
+"""
+
+import asyncio
+
+from hades_async import create_async_hades_instance
+from hades_snapshot import current_snapshot, pinned, reload_snapshot
+
+
+def test_pinned_function_keeps_its_snapshot():
+    @pinned
+    def handler():
+        before = current_snapshot()
+        reload_snapshot()
+        return before is current_snapshot()
+
+    assert handler()
+
+
+def test_pinned_generator_keeps_its_snapshot():
+    @pinned
+    def handler():
+        for _ in range(3):
+            yield current_snapshot().version
+
+    versions = []
+    for version in handler():
+        versions.append(version)
+        reload_snapshot()
+    assert len(set(versions)) == 1
+    assert current_snapshot().version > versions[0]
+
+
+def test_sync_stream_wrapper_keeps_its_snapshot_across_chunks():
+    async def callback(query, **kwargs):
+        return "respuesta"
+
+    async def stream(query, **kwargs):
+        for _ in range(3):
+            await asyncio.sleep(0)
+            yield f"{current_snapshot().version} "
+
+    callback.stream = stream
+    hades = create_async_hades_instance(llm_callback=callback)
+
+    chunks = []
+    for chunk in hades.handle_query_stream("python generadores"):
+        chunks.append(chunk)
+        reload_snapshot()
+    assert len(chunks) == 3 and len(set(chunks)) == 1
+
+    # Cerrar el stream a medias cancela la tarea sin dejarla pendiente
+    partial = hades.handle_query_stream("python corrutinas")
+    next(partial)
+    partial.close()
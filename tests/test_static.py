@@ -0,0 +1,83 @@
+"""
+Pruebas de los archivos estáticos (hades_static): ETag y 304, variantes
+comprimidas, nombres con huella y archivos no permitidos.
+"""
+
+import gzip
+
+import pytest
+
+from hades_static import StaticAssets, choose_encoding, compress_response
+
+CSS = "body { color: #333; }\n" * 200
+
+
+@pytest.fixture
+def assets(tmp_path):
+    (tmp_path / "index.html").write_text(
+        '<link rel="stylesheet" href="/style.css"><script src="app.js"></script>',
+        encoding="utf-8")
+    (tmp_path / "style.css").write_text(CSS, encoding="utf-8")
+    (tmp_path / "config.py").write_text("SECRETO = 1", encoding="utf-8")
+    return StaticAssets(str(tmp_path), use_brotli=False)
+
+
+def headers_of(response) -> dict:
+    return dict(response[1])
+
+
+def test_etag_revalidation_returns_304(assets):
+    status, headers, body = assets.respond("/style.css")
+    assert status == 200 and body.decode() == CSS
+    etag = dict(headers)["ETag"]
+
+    status, headers, body = assets.respond("/style.css", if_none_match=etag)
+    assert status == 304 and body == b""
+    assert dict(headers)["ETag"] == etag
+    assert assets.respond("/style.css", if_none_match=f"W/{etag}")[0] == 304
+    assert assets.respond("/style.css", if_none_match='"otra"')[0] == 200
+    assert assets.stats()["not_modified"] == 2
+
+
+def test_each_encoding_has_its_own_etag(assets):
+    plain = headers_of(assets.respond("/style.css"))
+    status, headers, body = assets.respond("/style.css", accept_encoding="gzip, deflate")
+    headers = dict(headers)
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).decode() == CSS
+    assert headers["ETag"] != plain["ETag"]
+    assert headers["Vary"] == "Accept-Encoding"
+    # La ETag de la variante sin comprimir también valida la comprimida
+    assert assets.respond("/style.css", accept_encoding="gzip",
+                          if_none_match=plain["ETag"])[0] == 304
+
+
+def test_html_points_to_fingerprinted_names(assets):
+    status, headers, body = assets.respond("/")
+    url = assets.url_for("style.css")
+    assert url != "/style.css" and url.lstrip("/").encode() in body
+    assert dict(headers)["Cache-Control"] == "no-cache"
+
+    status, headers, _ = assets.respond(url)
+    assert status == 200 and "immutable" in dict(headers)["Cache-Control"]
+    assert headers_of(assets.respond("/style.css"))["Cache-Control"] == "no-cache"
+
+
+def test_only_frontend_files_are_served(assets):
+    assert assets.respond("/config.py") is None
+    assert assets.respond("/../style.css") is None
+    assert assets.respond("/app.js") is None  # referenciado pero inexistente
+
+
+def test_choose_encoding_honours_quality():
+    assert choose_encoding("gzip;q=0, br", ("br", "gzip")) == "br"
+    assert choose_encoding("gzip;q=0", ("gzip",)) is None
+    assert choose_encoding("*", ("gzip",)) == "gzip"
+    assert choose_encoding("", ("gzip",)) is None
+
+
+def test_compress_response_skips_small_bodies():
+    assert compress_response(b"{}", "gzip") == (b"{}", None)
+    body = b'{"respuesta": "' + b"x" * 4096 + b'"}'
+    compressed, encoding = compress_response(body, "gzip")
+    assert encoding in ("gzip", "br") and len(compressed) < len(body)